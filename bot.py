@@ -3,16 +3,13 @@ import os
 import re
 import socket
 import logging
-from telegram import Update
-from telegram.ext import ApplicationBuilder,JobQueue
-from utils.http import close_http_session
-from handlers.commands import register_commands
-from handlers.callbacks import register_callbacks
-from handlers.messages import register_messages
-from utils.startup import startup_tasks
-from utils.config import BOT_TOKEN
-from handlers.dl.mtproto_uploader import warmup_mtproto_uploader,shutdown_mtproto_uploader
-from handlers.dl.pyrogram_uploader import warmup_pyrogram_uploader,shutdown_pyrogram_uploader
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Handler, database and PTB imports live inside the functions below: worker
+# pools use the spawn start method, which re-imports this file as __mp_main__
+# in every child process.
 
 BOT_USERNAME=None
 LOCAL_BOT_API_HOST=os.getenv("LOCAL_BOT_API_HOST","127.0.0.1")
@@ -141,6 +138,11 @@ def _local_bot_api_available(host:str,port:int,timeout:float=1.0)->bool:
 
 async def post_init(app):
     global BOT_USERNAME
+    from utils.startup import startup_tasks
+    from utils.commands import set_bot_username
+    from handlers.dl.mtproto_uploader import warmup_mtproto_uploader
+    from handlers.dl.pyrogram_uploader import warmup_pyrogram_uploader
+    from handlers.dl.extractor import warmup_extractor
     try:
         await app.bot.delete_webhook(drop_pending_updates=True)
     except Exception:
@@ -148,6 +150,7 @@ async def post_init(app):
     try:
         me=await app.bot.get_me()
         BOT_USERNAME=(me.username or "").lower()
+        set_bot_username(BOT_USERNAME)
         if BOT_USERNAME:
             log.info("✓ Bot username loaded: @%s",BOT_USERNAME)
         else:
@@ -162,6 +165,10 @@ async def post_init(app):
         await warmup_pyrogram_uploader(app)
     except Exception:
         log.exception("Failed to warmup Pyrogram uploader")
+    try:
+        await warmup_extractor()
+    except Exception:
+        log.exception("Failed to warmup yt-dlp engine")
     try:
         await app.bot.set_my_commands(BOT_COMMANDS)
         log.info("✓ Bot commands set")
@@ -177,6 +184,14 @@ async def post_init(app):
     log.info("✓ Startup tasks executed")
 
 async def post_shutdown(app):
+    from utils.http import close_http_session
+    from handlers.dl.mtproto_uploader import shutdown_mtproto_uploader
+    from handlers.dl.pyrogram_uploader import shutdown_pyrogram_uploader
+    from handlers.dl.extractor import shutdown_extractor
+    from handlers.image_jobs import shutdown_image_jobs
+    from handlers.broadcast import shutdown_broadcasts
+    from database import db
+    from database.write_behind import shutdown_write_behind
     try:
         await shutdown_mtproto_uploader(app)
     except Exception:
@@ -185,10 +200,31 @@ async def post_shutdown(app):
         await shutdown_pyrogram_uploader(app)
     except Exception:
         log.exception("Failed to shutdown Pyrogram uploader")
+    try:
+        shutdown_extractor()
+    except Exception:
+        log.exception("Failed to shutdown yt-dlp engine")
+    try:
+        shutdown_image_jobs()
+    except Exception:
+        log.exception("Failed to shutdown image workers")
     await close_http_session()
     log.info("HTTP session closed")
+    try:
+        await shutdown_broadcasts()
+    except Exception:
+        log.exception("Failed to pause broadcasts")
+    try:
+        await shutdown_write_behind()
+    except Exception:
+        log.exception("Failed to flush write-behind buffers")
+    db.DB_EXECUTOR.shutdown(wait=True)
+    db.close_all_connections()
+    log.info("Database connections closed")
 
 def _build_application():
+    from telegram.ext import ApplicationBuilder,JobQueue
+    from utils.config import BOT_TOKEN
     builder=(
         ApplicationBuilder()
         .token(BOT_TOKEN)
@@ -214,6 +250,10 @@ def _build_application():
     return builder.build()
 
 def main():
+    from telegram import Update
+    from handlers.commands import register_commands
+    from handlers.callbacks import register_callbacks
+    from handlers.messages import register_messages
     setup_logger()
     log.info("Initializing bot")
     app=_build_application()
@@ -1,37 +1,64 @@
 import time
 import logging
 
-from database.db import db_session
+from database.db import db_session, register_schema, ensure_schema, run_db
 from handlers.asupan.constants import ASUPAN_DB_PATH
 from handlers.asupan import state
 
 log = logging.getLogger(__name__)
 
 
-def _asupan_db_init():
-    with db_session(ASUPAN_DB_PATH) as con:
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS asupan_groups (
-                source_file TEXT NOT NULL,
-                chat_id INTEGER NOT NULL,
-                added_at REAL NOT NULL,
-                PRIMARY KEY (source_file, chat_id)
-            )
-            """
+def _asupan_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS asupan_groups (
+            source_file TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            added_at REAL NOT NULL,
+            PRIMARY KEY (source_file, chat_id)
         )
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS asupan_autodel (
-                source_file TEXT NOT NULL,
-                chat_id INTEGER NOT NULL,
-                enabled INTEGER NOT NULL,
-                updated_at REAL NOT NULL,
-                PRIMARY KEY (source_file, chat_id)
-            )
-            """
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS asupan_autodel (
+            source_file TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            enabled INTEGER NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (source_file, chat_id)
         )
-        con.commit()
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS asupan_pool (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyword TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            file_unique_id TEXT,
+            video_id TEXT,
+            added_at REAL NOT NULL
+        )
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_asupan_pool_keyword ON asupan_pool(keyword, id)")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS asupan_keyword_stats (
+            keyword TEXT PRIMARY KEY,
+            requests INTEGER NOT NULL,
+            last_at REAL NOT NULL
+        )
+        """
+    )
+
+
+register_schema(ASUPAN_DB_PATH, _asupan_schema)
+
+
+def _asupan_db_init():
+    ensure_schema(ASUPAN_DB_PATH)
 
 
 def _db_load_enabled(table: str) -> set[int]:
@@ -165,6 +192,81 @@ def is_autodel_enabled(chat_id: int) -> bool:
     return chat_id in state.AUTODEL_ENABLED_CHATS
 
 
+def _db_pool_load() -> dict[str, list[dict]]:
+    pools: dict[str, list[dict]] = {}
+    with db_session(ASUPAN_DB_PATH) as con:
+        cur = con.execute(
+            "SELECT keyword, file_id, file_unique_id, video_id FROM asupan_pool ORDER BY id"
+        )
+        for keyword, file_id, file_unique_id, video_id in cur.fetchall():
+            pools.setdefault(keyword, []).append(
+                {"file_id": file_id, "file_unique_id": file_unique_id, "video_id": video_id}
+            )
+    return pools
+
+
+def _db_pool_add(keyword: str, item: dict):
+    with db_session(ASUPAN_DB_PATH) as con:
+        con.execute(
+            """
+            INSERT INTO asupan_pool (keyword, file_id, file_unique_id, video_id, added_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (keyword, item["file_id"], item.get("file_unique_id"), item.get("video_id"), time.time()),
+        )
+        con.commit()
+
+
+def _db_pool_remove(keyword: str, file_id: str):
+    with db_session(ASUPAN_DB_PATH) as con:
+        con.execute("DELETE FROM asupan_pool WHERE keyword=? AND file_id=?", (keyword, file_id))
+        con.commit()
+
+
+def _db_keyword_hit(keyword: str):
+    with db_session(ASUPAN_DB_PATH) as con:
+        con.execute(
+            """
+            INSERT INTO asupan_keyword_stats (keyword, requests, last_at)
+            VALUES (?, 1, ?)
+            ON CONFLICT(keyword) DO UPDATE SET
+              requests=requests + 1,
+              last_at=excluded.last_at
+            """,
+            (keyword, time.time()),
+        )
+        con.commit()
+
+
+def _db_top_keywords(limit: int, since: float) -> list[str]:
+    with db_session(ASUPAN_DB_PATH) as con:
+        cur = con.execute(
+            "SELECT keyword FROM asupan_keyword_stats WHERE last_at >= ? ORDER BY requests DESC LIMIT ?",
+            (since, int(limit)),
+        )
+        return [r[0] for r in cur.fetchall()]
+
+
+async def load_asupan_pool() -> dict[str, list[dict]]:
+    return await run_db(_db_pool_load)
+
+
+async def add_to_asupan_pool(keyword: str, item: dict):
+    await run_db(_db_pool_add, keyword, item)
+
+
+async def remove_from_asupan_pool(keyword: str, file_id: str):
+    await run_db(_db_pool_remove, keyword, file_id)
+
+
+async def record_asupan_keyword(keyword: str):
+    await run_db(_db_keyword_hit, keyword)
+
+
+async def top_asupan_keywords(limit: int, since: float = 0) -> list[str]:
+    return await run_db(_db_top_keywords, limit, since)
+
+
 def init_asupan_storage():
     try:
         _asupan_db_init()
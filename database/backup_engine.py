@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import zipfile
+import tempfile
+from dataclasses import dataclass, field
+
+log = logging.getLogger(__name__)
+
+BACKUP_STATE_DIR = ".backup"
+BACKUP_MANIFEST_NAME = "MANIFEST.json"
+BACKUP_PART_SIZE = int(os.getenv("BACKUP_PART_SIZE", str(45 * 1024 * 1024)))
+BACKUP_FULL_EVERY = max(1, int(os.getenv("BACKUP_FULL_EVERY", "4")))
+BACKUP_SQLITE_PAGES = int(os.getenv("BACKUP_SQLITE_PAGES", "1024"))
+BACKUP_COMPRESS_LEVEL = int(os.getenv("BACKUP_COMPRESS_LEVEL", "6"))
+CHUNK_SIZE = 1024 * 1024
+
+_SQLITE_HEADER = b"SQLite format 3\x00"
+_SKIP_SUFFIXES = ("-wal", "-shm", "-journal")
+
+
+@dataclass
+class BackupResult:
+    kind: str
+    volumes: list[str]
+    manifest: dict
+    changed: list[str] = field(default_factory=list)
+    workdir: str = ""
+
+    def cleanup(self):
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def _state_path(data_dir: str) -> str:
+    return os.path.join(data_dir, BACKUP_STATE_DIR, "manifest.json")
+
+
+def load_last_manifest(data_dir: str) -> dict | None:
+    try:
+        with open(_state_path(data_dir), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def save_last_manifest(data_dir: str, manifest: dict):
+    path = _state_path(data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def is_sqlite_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(_SQLITE_HEADER)) == _SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _iter_data_files(data_dir: str):
+    for root, dirs, files in os.walk(data_dir):
+        if os.path.abspath(root) == os.path.abspath(data_dir):
+            dirs[:] = [d for d in dirs if d != BACKUP_STATE_DIR]
+        for name in files:
+            if name.endswith(_SKIP_SUFFIXES) or name.endswith(".tmp"):
+                continue
+            full_path = os.path.join(root, name)
+            yield full_path, os.path.relpath(full_path, data_dir).replace(os.sep, "/")
+
+
+def _snapshot_sqlite(src_path: str, dst_path: str):
+    """
+    Consistent copy of a live (WAL) database through the online backup API.
+    """
+    src = sqlite3.connect(f"file:{src_path}?mode=ro", uri=True, timeout=30)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst, pages=BACKUP_SQLITE_PAGES)
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+
+
+def _snapshot(data_dir: str, stage_dir: str) -> dict[str, dict]:
+    """
+    Copies every data file into stage_dir (SQLite through the backup API,
+    the rest byte for byte), so hashing and zipping read a stable copy even
+    while the bot keeps writing.
+    """
+    files = {}
+    for full_path, rel_path in _iter_data_files(data_dir):
+        sqlite = is_sqlite_file(full_path)
+        source = os.path.join(stage_dir, rel_path)
+        os.makedirs(os.path.dirname(source), exist_ok=True)
+        try:
+            if sqlite:
+                try:
+                    _snapshot_sqlite(full_path, source)
+                except sqlite3.Error as e:
+                    log.warning("SQLite snapshot failed, copying raw file | file=%s err=%r", rel_path, e)
+                    shutil.copyfile(full_path, source)
+            else:
+                shutil.copyfile(full_path, source)
+            files[rel_path] = {
+                "sha256": file_sha256(source),
+                "size": os.path.getsize(source),
+                "sqlite": sqlite,
+                "source": source,
+            }
+        except OSError as e:
+            log.warning("Backup skipped vanished file | file=%s err=%r", rel_path, e)
+    return files
+
+
+def _write_volumes(out_dir: str, stem: str, files: dict[str, dict], names: list[str], manifest: dict) -> list[str]:
+    volumes = []
+    z = None
+
+    def open_volume():
+        path = os.path.join(out_dir, f"{stem}.part{len(volumes) + 1}.zip")
+        return zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=BACKUP_COMPRESS_LEVEL)
+
+    def close_volume(volume):
+        volume.writestr(BACKUP_MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1))
+        volume.close()
+        volumes.append(volume.filename)
+
+    for name in names:
+        if z is None:
+            z = open_volume()
+        z.write(files[name]["source"], name)
+        if z.fp.tell() >= BACKUP_PART_SIZE:
+            close_volume(z)
+            z = None
+    if z is not None or not volumes:
+        close_volume(z or open_volume())
+    if len(volumes) == 1:
+        single = os.path.join(out_dir, f"{stem}.zip")
+        os.replace(volumes[0], single)
+        volumes[0] = single
+    return volumes
+
+
+def build_backup(data_dir: str, stem: str, full: bool | None = None) -> BackupResult:
+    """
+    Snapshots data_dir into one or more zip volumes of at most roughly
+    BACKUP_PART_SIZE each. SQLite files go through the backup API; other files
+    are copied into the staging dir first. Incremental backups only carry
+    files whose checksum changed since the last manifest, but every volume's
+    MANIFEST.json lists the full file set so a restore can verify what it
+    doesn't receive.
+    Blocking: run it in a worker thread.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    started = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="backup_")
+    try:
+        stage_dir = os.path.join(workdir, "stage")
+        os.makedirs(stage_dir)
+        files = _snapshot(data_dir, stage_dir)
+        previous = load_last_manifest(data_dir)
+        if full is None:
+            full = not previous or int(previous.get("since_full", 0)) + 1 >= BACKUP_FULL_EVERY
+        old_files = (previous or {}).get("files") or {}
+        if full:
+            changed = sorted(files)
+        else:
+            changed = sorted(n for n, meta in files.items() if (old_files.get(n) or {}).get("sha256") != meta["sha256"])
+        included = set(changed)
+        manifest = {
+            "version": 1,
+            "id": stem,
+            "kind": "full" if full else "incremental",
+            "base": None if full else (previous or {}).get("id"),
+            "created_at": time.time(),
+            "since_full": 0 if full else int((previous or {}).get("since_full", 0)) + 1,
+            "files": {
+                n: {"sha256": m["sha256"], "size": m["size"], "sqlite": m["sqlite"], "included": n in included}
+                for n, m in files.items()
+            },
+        }
+        volumes = []
+        if full or changed:
+            volumes = _write_volumes(workdir, stem, files, changed, manifest)
+        log.info(
+            "Backup built | kind=%s files=%s changed=%s volumes=%s size=%s took=%.1fs",
+            manifest["kind"], len(files), len(changed), len(volumes),
+            sum(os.path.getsize(v) for v in volumes), time.perf_counter() - started,
+        )
+        return BackupResult(manifest["kind"], volumes, manifest, changed, workdir)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+
+@dataclass
+class RestorePlan:
+    stage_dir: str
+    files: list[str]
+    manifest: dict | None
+    mismatched: list[str] = field(default_factory=list)
+
+    def cleanup(self):
+        shutil.rmtree(self.stage_dir, ignore_errors=True)
+
+
+def _read_manifest(z: zipfile.ZipFile) -> dict | None:
+    try:
+        with z.open(BACKUP_MANIFEST_NAME) as f:
+            data = json.load(f)
+    except KeyError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("files"), dict):
+        raise ValueError("Manifest backup tidak valid")
+    return data
+
+
+def _copy_member(z: zipfile.ZipFile, member: zipfile.ZipInfo, target_path: str) -> str:
+    digest = hashlib.sha256()
+    with z.open(member, "r") as src, open(target_path, "wb") as dst:
+        for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    return digest.hexdigest()
+
+
+def _fold_and_check(path: str, rel_path: str):
+    """
+    Folds any staged -wal/-journal side file into the database, switches it
+    to a self-contained rollback journal and runs quick_check on the result.
+    """
+    con = sqlite3.connect(path)
+    try:
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        con.execute("PRAGMA journal_mode=DELETE")
+        ok = con.execute("PRAGMA quick_check").fetchone()
+    except sqlite3.Error as e:
+        raise ValueError(f"Database rusak: {rel_path} ({e})") from e
+    finally:
+        con.close()
+    if not ok or ok[0] != "ok":
+        raise ValueError(f"Database rusak: {rel_path}")
+
+
+def stage_restore(zip_path: str, data_dir: str) -> RestorePlan:
+    """
+    Extracts an archive into a staging directory next to data_dir, streaming
+    each member in CHUNK_SIZE blocks. Checksums are verified against
+    MANIFEST.json when present. WAL/SHM/journal members (raw copies in older
+    archives) are staged beside their database and folded in by a checkpoint,
+    then every staged SQLite file must pass quick_check, so nothing in
+    data_dir is touched unless the whole archive is good.
+    Blocking: run it in a worker thread.
+    """
+    state_dir = os.path.join(data_dir, BACKUP_STATE_DIR)
+    os.makedirs(state_dir, exist_ok=True)
+    stage_dir = tempfile.mkdtemp(prefix="restore_", dir=state_dir)
+    stage_root = os.path.abspath(stage_dir)
+    staged = []
+    side_files = []
+    try:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            manifest = _read_manifest(z)
+            expected = (manifest or {}).get("files") or {}
+            for member in z.infolist():
+                name = member.filename
+                if not name or name == BACKUP_MANIFEST_NAME or member.is_dir():
+                    continue
+                target_path = os.path.abspath(os.path.join(stage_root, name))
+                if os.path.commonpath([stage_root, target_path]) != stage_root:
+                    raise ValueError(f"Unsafe path in zip: {name}")
+                rel_path = os.path.relpath(target_path, stage_root).replace(os.sep, "/")
+                if rel_path.split("/")[0] == BACKUP_STATE_DIR:
+                    continue
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                sha256 = _copy_member(z, member, target_path)
+                if rel_path.endswith(_SKIP_SUFFIXES):
+                    side_files.append(target_path)
+                    continue
+                meta = expected.get(rel_path)
+                if manifest is not None and (not meta or meta.get("sha256") != sha256):
+                    raise ValueError(f"Checksum mismatch: {rel_path}")
+                staged.append(rel_path)
+        for rel_path in staged:
+            target_path = os.path.join(stage_root, rel_path)
+            if is_sqlite_file(target_path):
+                _fold_and_check(target_path, rel_path)
+        for path in side_files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        mismatched = []
+        for rel_path, meta in expected.items():
+            if rel_path in staged:
+                continue
+            local = os.path.join(data_dir, rel_path)
+            if not os.path.exists(local):
+                mismatched.append(rel_path)
+            elif not meta.get("sqlite") and file_sha256(local) != meta.get("sha256"):
+                mismatched.append(rel_path)
+        return RestorePlan(stage_dir, staged, manifest, mismatched)
+    except Exception:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        raise
+
+
+def apply_restore(plan: RestorePlan, data_dir: str):
+    """
+    Moves staged files over data_dir with os.replace (atomic per file, same
+    filesystem). Stale WAL/SHM side files are removed first so SQLite never
+    replays an old log onto a restored database. Callers must have closed
+    every connection to the affected databases.
+    """
+    missing = [p for p in plan.files if not os.path.isfile(os.path.join(plan.stage_dir, p))]
+    if missing:
+        raise FileNotFoundError(f"Staged restore incomplete: {', '.join(missing)}")
+    for rel_path in plan.files:
+        target = os.path.join(data_dir, rel_path)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        for suffix in _SKIP_SUFFIXES:
+            try:
+                os.remove(target + suffix)
+            except FileNotFoundError:
+                pass
+        os.replace(os.path.join(plan.stage_dir, rel_path), target)
+    try:
+        os.remove(_state_path(data_dir))
+    except FileNotFoundError:
+        pass
+    plan.cleanup()
@@ -1,42 +1,37 @@
 import os
-import sqlite3
 import time
 import logging
-from contextlib import closing
+from database.db import db_session,register_schema
 
 log=logging.getLogger(__name__)
 DB_PATH=os.getenv("BLACKLIST_DB_PATH","data/blacklist.sqlite3")
 _USER_CACHE=None
 _GROUP_CACHE=None
 
-def _db():
-    os.makedirs(os.path.dirname(DB_PATH) or ".",exist_ok=True)
-    con=sqlite3.connect(DB_PATH)
-    con.execute("PRAGMA journal_mode=WAL;")
-    con.execute("PRAGMA synchronous=NORMAL;")
-    return con
+def _blacklist_schema(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS blacklisted_users (
+            user_id INTEGER PRIMARY KEY,
+            reason TEXT,
+            added_by INTEGER,
+            added_at INTEGER
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS blacklisted_groups (
+            group_id INTEGER PRIMARY KEY,
+            title TEXT,
+            reason TEXT,
+            added_by INTEGER,
+            added_at INTEGER
+        )
+    """)
+
+register_schema(DB_PATH,_blacklist_schema)
 
 def init():
     global _USER_CACHE,_GROUP_CACHE
-    with closing(_db()) as con:
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS blacklisted_users (
-                user_id INTEGER PRIMARY KEY,
-                reason TEXT,
-                added_by INTEGER,
-                added_at INTEGER
-            )
-        """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS blacklisted_groups (
-                group_id INTEGER PRIMARY KEY,
-                title TEXT,
-                reason TEXT,
-                added_by INTEGER,
-                added_at INTEGER
-            )
-        """)
-        con.commit()
+    with db_session(DB_PATH) as con:
         user_rows=con.execute("SELECT user_id FROM blacklisted_users").fetchall()
         group_rows=con.execute("SELECT group_id FROM blacklisted_groups").fetchall()
     _USER_CACHE={int(r[0]) for r in user_rows}
@@ -57,7 +52,7 @@ def add_user(user_id:int,reason:str|None=None,added_by:int|None=None):
     reason=(reason or "").strip()
     added_by=int(added_by or 0)
     added_at=int(time.time())
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         con.execute(
             "INSERT OR REPLACE INTO blacklisted_users(user_id,reason,added_by,added_at) VALUES(?,?,?,?)",
             (user_id,reason,added_by,added_at)
@@ -69,7 +64,7 @@ def add_user(user_id:int,reason:str|None=None,added_by:int|None=None):
 def remove_user(user_id:int)->bool:
     _ensure()
     user_id=int(user_id)
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         cur=con.execute("DELETE FROM blacklisted_users WHERE user_id=?",(user_id,))
         con.commit()
     removed=cur.rowcount>0
@@ -80,7 +75,7 @@ def remove_user(user_id:int)->bool:
 
 def get_user(user_id:int):
     _ensure()
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         row=con.execute(
             "SELECT user_id,reason,added_by,added_at FROM blacklisted_users WHERE user_id=?",
             (int(user_id),)
@@ -91,7 +86,7 @@ def get_user(user_id:int):
 
 def list_users(limit:int=50):
     _ensure()
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         rows=con.execute(
             "SELECT user_id,reason,added_by,added_at FROM blacklisted_users ORDER BY added_at DESC LIMIT ?",
             (int(limit),)
@@ -109,7 +104,7 @@ def add_group(group_id:int,title:str|None=None,reason:str|None=None,added_by:int
     reason=(reason or "").strip()
     added_by=int(added_by or 0)
     added_at=int(time.time())
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         con.execute(
             "INSERT OR REPLACE INTO blacklisted_groups(group_id,title,reason,added_by,added_at) VALUES(?,?,?,?,?)",
             (group_id,title,reason,added_by,added_at)
@@ -121,7 +116,7 @@ def add_group(group_id:int,title:str|None=None,reason:str|None=None,added_by:int
 def remove_group(group_id:int)->bool:
     _ensure()
     group_id=int(group_id)
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         cur=con.execute("DELETE FROM blacklisted_groups WHERE group_id=?",(group_id,))
         con.commit()
     removed=cur.rowcount>0
@@ -132,7 +127,7 @@ def remove_group(group_id:int)->bool:
 
 def get_group(group_id:int):
     _ensure()
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         row=con.execute(
             "SELECT group_id,title,reason,added_by,added_at FROM blacklisted_groups WHERE group_id=?",
             (int(group_id),)
@@ -151,7 +146,7 @@ def get_group(group_id:int):
 
 def list_groups(limit:int=50):
     _ensure()
-    with closing(_db()) as con:
+    with db_session(DB_PATH) as con:
         rows=con.execute(
             "SELECT group_id,title,reason,added_by,added_at FROM blacklisted_groups ORDER BY added_at DESC LIMIT ?",
             (int(limit),)
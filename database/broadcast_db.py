@@ -0,0 +1,142 @@
+import json
+import time
+
+from database.db import db_session, register_schema
+from database.groups_db import BROADCAST_DB
+
+def _broadcast_jobs_schema(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            bid TEXT PRIMARY KEY,
+            mode TEXT NOT NULL,
+            payload_json TEXT NOT NULL,
+            status_chat_id INTEGER NOT NULL,
+            status_msg_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            bid TEXT NOT NULL,
+            chat_id INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (bid, chat_id)
+        )
+    """)
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_state ON broadcast_deliveries(bid, state)"
+    )
+
+register_schema(BROADCAST_DB, _broadcast_jobs_schema)
+
+def create_job(bid: str, mode: str, payload: dict, status_chat_id: int, status_msg_id: int, targets: list[int]):
+    now = time.time()
+    with db_session(BROADCAST_DB) as con:
+        try:
+            con.execute("BEGIN")
+            con.execute(
+                """
+                INSERT INTO broadcast_jobs (bid, mode, payload_json, status_chat_id, status_msg_id, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, 'running', ?, ?)
+                """,
+                (bid, mode, json.dumps(payload, ensure_ascii=False), int(status_chat_id), int(status_msg_id), now, now),
+            )
+            con.executemany(
+                "INSERT OR IGNORE INTO broadcast_deliveries (bid, chat_id, state, updated_at) VALUES (?, ?, 'pending', ?)",
+                [(bid, int(cid), now) for cid in targets],
+            )
+            con.execute("COMMIT")
+        except Exception:
+            try:
+                con.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+
+def get_job(bid: str) -> dict | None:
+    with db_session(BROADCAST_DB) as con:
+        row = con.execute(
+            """
+            SELECT bid, mode, payload_json, status_chat_id, status_msg_id, status, created_at
+            FROM broadcast_jobs WHERE bid=?
+            """,
+            (bid,),
+        ).fetchone()
+    if not row:
+        return None
+    keys = ("bid", "mode", "payload", "status_chat_id", "status_msg_id", "status", "created_at")
+    job = dict(zip(keys, row))
+    job["payload"] = json.loads(job["payload"] or "{}")
+    return job
+
+def running_jobs() -> list[str]:
+    with db_session(BROADCAST_DB) as con:
+        rows = con.execute(
+            "SELECT bid FROM broadcast_jobs WHERE status='running' ORDER BY created_at ASC"
+        ).fetchall()
+        return [str(r[0]) for r in rows]
+
+def pending_targets(bid: str) -> list[int]:
+    with db_session(BROADCAST_DB) as con:
+        rows = con.execute(
+            "SELECT chat_id FROM broadcast_deliveries WHERE bid=? AND state='pending'",
+            (bid,),
+        ).fetchall()
+        return [int(r[0]) for r in rows]
+
+def job_counts(bid: str) -> dict:
+    with db_session(BROADCAST_DB) as con:
+        rows = con.execute(
+            "SELECT state, COUNT(*) FROM broadcast_deliveries WHERE bid=? GROUP BY state",
+            (bid,),
+        ).fetchall()
+    counts = {"pending": 0, "sent": 0, "failed": 0}
+    for state, n in rows:
+        counts[str(state)] = int(n)
+    return counts
+
+def record_results(bid: str, results: list[tuple[int, str, str | None]]):
+    """
+    Stores delivery outcomes as (chat_id, state, error) and refreshes the job's
+    updated_at in the same transaction.
+    """
+    if not results:
+        return
+    now = time.time()
+    with db_session(BROADCAST_DB) as con:
+        try:
+            con.execute("BEGIN")
+            con.executemany(
+                "UPDATE broadcast_deliveries SET state=?, error=?, updated_at=? WHERE bid=? AND chat_id=?",
+                [(state, error, now, bid, int(cid)) for cid, state, error in results],
+            )
+            con.execute("UPDATE broadcast_jobs SET updated_at=? WHERE bid=?", (now, bid))
+            con.execute("COMMIT")
+        except Exception:
+            try:
+                con.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+
+def finish_job(bid: str, status: str = "done"):
+    with db_session(BROADCAST_DB) as con:
+        con.execute(
+            "UPDATE broadcast_jobs SET status=?, updated_at=? WHERE bid=?",
+            (status, time.time(), bid),
+        )
+        con.commit()
+
+def disable_targets(chat_ids: list[int]):
+    if not chat_ids:
+        return
+    now = time.time()
+    params = [(now, int(cid)) for cid in chat_ids]
+    with db_session(BROADCAST_DB) as con:
+        con.executemany("UPDATE broadcast_users SET enabled=0, updated_at=? WHERE chat_id=?", params)
+        con.executemany("UPDATE broadcast_groups SET enabled=0, updated_at=? WHERE chat_id=?", params)
+        con.commit()
@@ -1,42 +1,44 @@
 import time
-import asyncio
 import logging
 
-from database.db import db_session
+from database.db import db_session, register_schema, ensure_schema, run_db
 
 log = logging.getLogger(__name__)
 
 CACA_DB_PATH = "data/caca.sqlite3"
 _MODE_CACHE: dict[int, str] = {}
 
-def _caca_db_init():
-    with db_session(CACA_DB_PATH) as con:
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS caca_mode (
-                user_id INTEGER PRIMARY KEY,
-                mode TEXT NOT NULL,
-                updated_at REAL NOT NULL
-            )
-            """
+def _caca_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS caca_mode (
+            user_id INTEGER PRIMARY KEY,
+            mode TEXT NOT NULL,
+            updated_at REAL NOT NULL
         )
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS caca_groups (
-                chat_id INTEGER PRIMARY KEY,
-                added_at REAL NOT NULL
-            )
-            """
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS caca_groups (
+            chat_id INTEGER PRIMARY KEY,
+            added_at REAL NOT NULL
         )
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS caca_approved (
-                user_id INTEGER PRIMARY KEY,
-                added_at REAL NOT NULL
-            )
-            """
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS caca_approved (
+            user_id INTEGER PRIMARY KEY,
+            added_at REAL NOT NULL
         )
-        con.commit()
+        """
+    )
+
+register_schema(CACA_DB_PATH, _caca_schema)
+
+def _caca_db_init():
+    ensure_schema(CACA_DB_PATH)
 
 def _caca_db_load_modes() -> dict[int, str]:
     with db_session(CACA_DB_PATH) as con:
@@ -148,13 +150,13 @@ def _caca_db_remove_group(chat_id: int):
         con.commit()
 
 async def init():
-    await asyncio.to_thread(_caca_db_init)
+    await run_db(_caca_db_init)
     await reload_modes()
 
 async def reload_modes():
     global _MODE_CACHE
     try:
-        _MODE_CACHE = await asyncio.to_thread(_caca_db_load_modes)
+        _MODE_CACHE = await run_db(_caca_db_load_modes)
         log.info("Loaded Caca modes: %s users", len(_MODE_CACHE))
     except Exception as e:
         _MODE_CACHE = {}
@@ -167,26 +169,26 @@ async def set_mode(user_id: int, mode: str):
     user_id = int(user_id)
     mode = str(mode)
     _MODE_CACHE[user_id] = mode
-    await asyncio.to_thread(_caca_db_upsert_mode, user_id, mode)
+    await run_db(_caca_db_upsert_mode, user_id, mode)
 
 async def remove_mode(user_id: int):
     user_id = int(user_id)
     _MODE_CACHE.pop(user_id, None)
-    await asyncio.to_thread(_caca_db_remove_mode, user_id)
+    await run_db(_caca_db_remove_mode, user_id)
 
 async def load_groups() -> set[int]:
     try:
-        groups = await asyncio.to_thread(_caca_db_load_groups)
+        groups = await run_db(_caca_db_load_groups)
         return groups
     except Exception as e:
         log.warning("Failed to load Caca groups | err=%r", e)
         return set()
 
 async def save_groups(groups: set[int]):
-    await asyncio.to_thread(_caca_db_save_groups, groups)
+    await run_db(_caca_db_save_groups, groups)
 
 async def add_group(chat_id: int):
-    await asyncio.to_thread(_caca_db_add_group, chat_id)
+    await run_db(_caca_db_add_group, chat_id)
 
 async def remove_group(chat_id: int):
-    await asyncio.to_thread(_caca_db_remove_group, chat_id)
\ No newline at end of file
+    await run_db(_caca_db_remove_group, chat_id)
\ No newline at end of file
@@ -1,36 +1,165 @@
 import sqlite3
 import os
+import asyncio
 import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Generator
+from typing import Callable, Generator
 
 log = logging.getLogger(__name__)
 
-def get_connection(db_path: str) -> sqlite3.Connection:
-    """
-    Creates a connection to the SQLite database with standard performance settings.
-    Ensures the directory for db_path exists.
-    """
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "10"))
+
+_LOCAL = threading.local()
+_LOCK = threading.RLock()
+_OPEN: list[tuple[threading.Thread, sqlite3.Connection]] = []
+_GENERATION = 0
+_SCHEMAS: dict[str, list[Callable[[sqlite3.Connection], None]]] = {}
+_MIGRATED: set[str] = set()
+_MIGRATING: set[str] = set()
+
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+def _key(db_path: str) -> str:
+    return os.path.abspath(db_path)
+
+def _open(db_path: str) -> sqlite3.Connection:
     db_dir = os.path.dirname(db_path)
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
 
-    con = sqlite3.connect(db_path)
+    con = sqlite3.connect(
+        db_path,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE,
+        check_same_thread=False,
+    )
     try:
         con.execute("PRAGMA journal_mode=WAL;")
         con.execute("PRAGMA synchronous=NORMAL;")
     except sqlite3.Error as e:
         log.warning(f"Failed to set PRAGMA for {db_path}: {e}")
+    with _LOCK:
+        _OPEN.append((threading.current_thread(), con))
+    return con
+
+def _close(conns):
+    for con in conns:
+        try:
+            con.close()
+        except sqlite3.Error as e:
+            log.debug(f"Failed to close connection: {e}")
+
+def _drop_stale(conns: dict):
+    stale = set(map(id, conns.values()))
+    with _LOCK:
+        _OPEN[:] = [item for item in _OPEN if id(item[1]) not in stale]
+    _close(conns.values())
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Returns the long-lived connection for db_path owned by the calling thread.
+    The connection is opened once per thread with the standard PRAGMAs and is
+    never closed by callers; use close_all_connections() to drop it.
+    After close_all_connections() the thread closes its stale connections
+    here, on its next use outside an open db_session.
+    """
+    conns = getattr(_LOCAL, "conns", None)
+    if conns is None or (
+        getattr(_LOCAL, "generation", -1) != _GENERATION
+        and not any(getattr(_LOCAL, "depth", {}).values())
+    ):
+        if conns:
+            _drop_stale(conns)
+        conns = _LOCAL.conns = {}
+        _LOCAL.generation = _GENERATION
+    key = _key(db_path)
+    con = conns.get(key)
+    if con is None:
+        con = conns[key] = _open(db_path)
     return con
 
 @contextmanager
 def db_session(db_path: str) -> Generator[sqlite3.Connection, None, None]:
     """
-    Context manager for database connections.
-    Closes the connection automatically.
+    Context manager over the thread's shared connection.
+    Work left uncommitted by the outermost session is rolled back, matching
+    the old open/close-per-call behaviour.
     """
+    ensure_schema(db_path)
     con = get_connection(db_path)
+    depth = getattr(_LOCAL, "depth", {})
+    _LOCAL.depth = depth
+    key = _key(db_path)
+    depth[key] = depth.get(key, 0) + 1
     try:
         yield con
     finally:
-        con.close()
+        depth[key] -= 1
+        if depth[key] == 0 and con.in_transaction:
+            con.rollback()
+
+def _schema_ident(init: Callable) -> tuple:
+    owner = getattr(init, "__self__", None)
+    return init.__module__, init.__qualname__, getattr(owner, "table", None)
+
+def register_schema(db_path: str, init: Callable[[sqlite3.Connection], None]):
+    """
+    Registers a schema/migration callback for db_path.
+    Callbacks run once per process, either from migrate_all() at startup or
+    lazily on the first session for that database. Registering a callback
+    with the same module and name again (e.g. after /reload) replaces it.
+    """
+    inits = _SCHEMAS.setdefault(_key(db_path), [])
+    ident = _schema_ident(init)
+    inits[:] = [f for f in inits if _schema_ident(f) != ident]
+    inits.append(init)
+
+def ensure_schema(db_path: str):
+    key = _key(db_path)
+    if key in _MIGRATED:
+        return
+    with _LOCK:
+        if key in _MIGRATED or key in _MIGRATING:
+            return
+        _MIGRATING.add(key)
+        try:
+            con = get_connection(db_path)
+            for init in _SCHEMAS.get(key, []):
+                init(con)
+                con.commit()
+            _MIGRATED.add(key)
+        finally:
+            _MIGRATING.discard(key)
+
+def migrate_all() -> int:
+    for key in list(_SCHEMAS):
+        ensure_schema(key)
+    return len(_SCHEMAS)
+
+async def run_db(fn: Callable, *args, **kwargs):
+    """
+    Runs a blocking database call on the dedicated DB executor thread.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(DB_EXECUTOR, functools.partial(fn, *args, **kwargs))
+
+def close_all_connections(reset_schema: bool = False):
+    """
+    Invalidates every cached connection, e.g. after database files were
+    replaced. Connections owned by the calling thread or by threads that have
+    exited are closed now; other threads may be mid-query, so they close their
+    own on their next get_connection() and reopen lazily.
+    """
+    global _GENERATION
+    me = threading.current_thread()
+    with _LOCK:
+        _GENERATION += 1
+        closable = [con for owner, con in _OPEN if owner is me or not owner.is_alive()]
+        _OPEN[:] = [(owner, con) for owner, con in _OPEN if owner is not me and owner.is_alive()]
+        if reset_schema:
+            _MIGRATED.clear()
+    _close(closable)
@@ -1,67 +1,75 @@
-import os
 import time
-import sqlite3
 from utils.config import OWNER_ID
 from database.premium import is_premium
+from database.db import db_session, register_schema, ensure_schema
 from handlers.dl.constants import AUTO_DL_DB
 
-def _auto_dl_db_init():
-    os.makedirs("data", exist_ok=True)
-    con = sqlite3.connect(AUTO_DL_DB)
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS auto_dl_groups (
-                chat_id INTEGER PRIMARY KEY,
-                enabled INTEGER NOT NULL DEFAULT 1,
-                updated_at REAL NOT NULL
-            )
-            """
+def _auto_dl_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS auto_dl_groups (
+            chat_id INTEGER PRIMARY KEY,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            updated_at REAL NOT NULL
         )
-        con.commit()
-    finally:
-        con.close()
+        """
+    )
 
-def _auto_dl_db():
-    _auto_dl_db_init()
-    return sqlite3.connect(AUTO_DL_DB)
+register_schema(AUTO_DL_DB, _auto_dl_schema)
 
-def load_auto_dl() -> set[int]:
-    con = _auto_dl_db()
-    try:
+def _auto_dl_db_init():
+    ensure_schema(AUTO_DL_DB)
+
+_AUTO_DL_CACHE: set[int] | None = None
+
+def _load_auto_dl_db() -> set[int]:
+    with db_session(AUTO_DL_DB) as con:
         cur = con.execute("SELECT chat_id FROM auto_dl_groups WHERE enabled=1")
         return {int(r[0]) for r in cur.fetchall() if r and r[0] is not None}
-    finally:
-        con.close()
+
+def invalidate_auto_dl():
+    global _AUTO_DL_CACHE
+    _AUTO_DL_CACHE = None
+
+def _auto_dl_groups() -> set[int]:
+    global _AUTO_DL_CACHE
+    if _AUTO_DL_CACHE is None:
+        _AUTO_DL_CACHE = _load_auto_dl_db()
+    return _AUTO_DL_CACHE
+
+def load_auto_dl() -> set[int]:
+    return set(_auto_dl_groups())
+
+def is_auto_dl_enabled(chat_id: int) -> bool:
+    return int(chat_id) in _auto_dl_groups()
 
 def save_auto_dl(groups: set[int]):
-    con = _auto_dl_db()
-    try:
-        now = time.time()
-        con.execute("BEGIN")
-        con.execute("UPDATE auto_dl_groups SET enabled=0, updated_at=?", (float(now),))
-        if groups:
-            con.executemany(
-                """
-                INSERT INTO auto_dl_groups (chat_id, enabled, updated_at)
-                VALUES (?, 1, ?)
-                ON CONFLICT(chat_id) DO UPDATE SET
-                  enabled=1,
-                  updated_at=excluded.updated_at
-                """,
-                [(int(cid), float(now)) for cid in groups],
-            )
-        con.execute("COMMIT")
-    except Exception:
+    global _AUTO_DL_CACHE
+    invalidate_auto_dl()
+    with db_session(AUTO_DL_DB) as con:
         try:
-            con.execute("ROLLBACK")
+            now = time.time()
+            con.execute("BEGIN")
+            con.execute("UPDATE auto_dl_groups SET enabled=0, updated_at=?", (float(now),))
+            if groups:
+                con.executemany(
+                    """
+                    INSERT INTO auto_dl_groups (chat_id, enabled, updated_at)
+                    VALUES (?, 1, ?)
+                    ON CONFLICT(chat_id) DO UPDATE SET
+                      enabled=1,
+                      updated_at=excluded.updated_at
+                    """,
+                    [(int(cid), float(now)) for cid in groups],
+                )
+            con.execute("COMMIT")
         except Exception:
-            pass
-        raise
-    finally:
-        con.close()
+            try:
+                con.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+    _AUTO_DL_CACHE = {int(cid) for cid in groups}
 
 def extract_domain(url: str) -> str:
     import re
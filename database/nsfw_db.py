@@ -2,23 +2,28 @@ import os
 import time
 import sqlite3
 
-from database.db import db_session
+from database.db import db_session, register_schema, ensure_schema
 
 NSFW_DB = "data/nsfw.sqlite3"
 
 
-def nsfw_db_init():
-    with db_session(NSFW_DB) as con:
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS nsfw_groups (
-                chat_id INTEGER PRIMARY KEY,
-                enabled INTEGER NOT NULL DEFAULT 1,
-                updated_at REAL NOT NULL
-            )
-            """
+def _nsfw_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS nsfw_groups (
+            chat_id INTEGER PRIMARY KEY,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            updated_at REAL NOT NULL
         )
-        con.commit()
+        """
+    )
+
+
+register_schema(NSFW_DB, _nsfw_schema)
+
+
+def nsfw_db_init():
+    ensure_schema(NSFW_DB)
 
 
 def is_nsfw_allowed(chat_id: int, chat_type: str) -> bool:
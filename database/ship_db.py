@@ -1,63 +1,148 @@
 import os
 import time
-import sqlite3
+import random
 
-SHIP_DB = "data/ship.sqlite3"
+from database import write_behind
+from database.db import db_session, register_schema, run_db
 
-def _ship_db_init():
-    os.makedirs("data", exist_ok=True)
-    con = sqlite3.connect(SHIP_DB)
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                chat_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                updated_at REAL NOT NULL,
-                PRIMARY KEY (chat_id, user_id)
-            )
-            """
+SHIP_DB = "data/ship.sqlite3"
+SHIP_ACTIVE_DAYS = float(os.getenv("SHIP_ACTIVE_DAYS", "30"))
+
+_ACTIVE: dict[int, dict[int, tuple[str, float]]] = {}
+
+def _ship_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (chat_id, user_id)
         )
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ship_state (
-                chat_id INTEGER PRIMARY KEY,
-                last_time INTEGER NOT NULL
-            )
-            """
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_users_updated ON users(updated_at)")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ship_state (
+            chat_id INTEGER PRIMARY KEY,
+            last_time INTEGER NOT NULL
         )
-        con.commit()
-    finally:
-        con.close()
+        """
+    )
+
 
+register_schema(SHIP_DB, _ship_schema)
+
+_USERS = write_behind.buffer("ship_users", SHIP_DB, """
+    INSERT INTO users (chat_id, user_id, name, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(chat_id, user_id) DO UPDATE SET
+      name=excluded.name,
+      updated_at=excluded.updated_at
+""")
+_GONE = write_behind.buffer("ship_users_gone", SHIP_DB, """
+    DELETE FROM users WHERE chat_id=? AND user_id=?
+""")
 
-def _db():
-    _ship_db_init()
-    return sqlite3.connect(SHIP_DB)
 
 def add_user(chat_id: int, user):
     if not user or user.is_bot:
         return
 
-    con = _db()
-    try:
-        now = time.time()
-        con.execute(
-            """
-            INSERT INTO users (chat_id, user_id, name, updated_at)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(chat_id, user_id) DO UPDATE SET
-              name=excluded.name,
-              updated_at=excluded.updated_at
-            """,
-            (int(chat_id), int(user.id), str(user.first_name or ""), float(now)),
+    name = str(user.first_name or "")
+    now = float(time.time())
+    pool = _ACTIVE.get(int(chat_id))
+    if pool is not None:
+        pool[int(user.id)] = (name, now)
+    _GONE.discard((int(chat_id), int(user.id)))
+    _USERS.put(
+        (int(chat_id), int(user.id)),
+        name,
+        (int(chat_id), int(user.id), name, now),
+    )
+
+
+def remove_user(chat_id: int, user_id: int):
+    """
+    Drops a user from the index right away; the row DELETE goes out with the
+    next write-behind flush.
+    """
+    key = (int(chat_id), int(user_id))
+    pool = _ACTIVE.get(key[0])
+    if pool is not None:
+        pool.pop(key[1], None)
+    _USERS.discard(key)
+    _GONE.put(key, 1, key)
+
+
+def _active_since() -> float:
+    return time.time() - SHIP_ACTIVE_DAYS * 86400
+
+
+def _load_active(chat_id: int, since: float) -> list[tuple]:
+    with db_session(SHIP_DB) as con:
+        cur = con.execute(
+            "SELECT user_id, name, updated_at FROM users WHERE chat_id=? AND updated_at>=?",
+            (int(chat_id), since),
         )
+        return cur.fetchall()
+
+
+async def _active_pool(chat_id: int) -> dict[int, tuple[str, float]]:
+    """
+    Per-chat index of users seen within SHIP_ACTIVE_DAYS, loaded from the
+    table on first use and kept current by add_user/remove_user.
+    """
+    cid = int(chat_id)
+    pool = _ACTIVE.get(cid)
+    if pool is not None:
+        return pool
+    rows = await run_db(_load_active, cid, _active_since())
+    pool = _ACTIVE.get(cid)
+    if pool is not None:
+        return pool
+    pool = {
+        int(uid): (str(name), float(ts))
+        for (uid, name, ts) in rows
+        if uid is not None and (cid, int(uid)) not in _GONE.pending
+    }
+    for (c, uid), params in _USERS.pending_items():
+        if c == cid:
+            pool[uid] = (params[2], params[3])
+    _ACTIVE[cid] = pool
+    return pool
+
+
+async def sample_active_users(chat_id: int, k: int, exclude=()) -> list[dict]:
+    """
+    Picks k distinct recently active users without any API calls.
+    Returns fewer than k when the chat doesn't have enough.
+    """
+    pool = await _active_pool(chat_id)
+    since = _active_since()
+    skip = {int(u) for u in exclude}
+    candidates = [uid for uid, (_, ts) in pool.items() if ts >= since and uid not in skip]
+    picked = random.sample(candidates, min(k, len(candidates)))
+    return [{"id": uid, "name": pool[uid][0]} for uid in picked]
+
+
+def trim_active_pools() -> int:
+    since = _active_since()
+    removed = 0
+    for pool in _ACTIVE.values():
+        for uid in [u for u, (_, ts) in pool.items() if ts < since]:
+            pool.pop(uid, None)
+            removed += 1
+    return removed
+
+
+def prune_inactive_users() -> int:
+    with db_session(SHIP_DB) as con:
+        cur = con.execute("DELETE FROM users WHERE updated_at<?", (_active_since(),))
         con.commit()
-    finally:
-        con.close()
+        return int(cur.rowcount or 0)
 
 
 def _ship_state_has_updated_at(con) -> bool:
@@ -70,21 +155,17 @@ def _ship_state_has_updated_at(con) -> bool:
 
 
 def get_ship_last_time(chat_id: int) -> int:
-    con = _db()
-    try:
+    with db_session(SHIP_DB) as con:
         cur = con.execute(
             "SELECT last_time FROM ship_state WHERE chat_id=?",
             (int(chat_id),),
         )
         row = cur.fetchone()
         return int(row[0]) if row and row[0] is not None else 0
-    finally:
-        con.close()
 
 
 def set_ship_last_time(chat_id: int, last_time: int):
-    con = _db()
-    try:
+    with db_session(SHIP_DB) as con:
         now_ts = time.time()
         has_updated_at = _ship_state_has_updated_at(con)
 
@@ -111,19 +192,3 @@ def set_ship_last_time(chat_id: int, last_time: int):
             )
 
         con.commit()
-    finally:
-        con.close()
-
-
-def get_users_pool(chat_id: int) -> list[dict]:
-    con = _db()
-    try:
-        cur = con.execute(
-            "SELECT user_id, name FROM users WHERE chat_id=?",
-            (int(chat_id),),
-        )
-        rows = cur.fetchall()
-        return [{"id": int(uid), "name": str(name)} for (uid, name) in rows if uid is not None]
-    finally:
-        con.close()
-        
\ No newline at end of file
@@ -1,6 +1,5 @@
-import os
 import time
-import sqlite3
+from database.db import db_session, register_schema, ensure_schema
 
 USER_SETTINGS_DB = "data/user_settings.sqlite3"
 
@@ -12,41 +11,45 @@ DEFAULT_SETTINGS = {
     "music_format": "flac",
 }
 
-def _connect():
-    os.makedirs("data", exist_ok=True)
-    con = sqlite3.connect(USER_SETTINGS_DB)
-    con.execute("PRAGMA journal_mode=WAL;")
-    con.execute("PRAGMA synchronous=NORMAL;")
-    return con
+def _user_settings_schema(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS user_settings (
+            user_id INTEGER PRIMARY KEY,
+            force_autodl INTEGER NOT NULL DEFAULT 0,
+            autodl_format TEXT NOT NULL DEFAULT 'ask',
+            youtube_resolution INTEGER NOT NULL DEFAULT 0,
+            youtube_download_engine TEXT NOT NULL DEFAULT 'sonzai',
+            music_format TEXT NOT NULL DEFAULT 'flac',
+            updated_at REAL NOT NULL
+        )
+    """)
+    try:
+        cols = [row[1] for row in con.execute("PRAGMA table_info(user_settings)").fetchall()]
+        if "youtube_download_engine" not in cols:
+            con.execute("ALTER TABLE user_settings ADD COLUMN youtube_download_engine TEXT NOT NULL DEFAULT 'sonzai'")
+    except Exception:
+        pass
+
+register_schema(USER_SETTINGS_DB, _user_settings_schema)
+
+_SETTINGS_CACHE: dict[int, dict] = {}
 
 def init_user_settings_db():
-    con = _connect()
-    try:
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS user_settings (
-                user_id INTEGER PRIMARY KEY,
-                force_autodl INTEGER NOT NULL DEFAULT 0,
-                autodl_format TEXT NOT NULL DEFAULT 'ask',
-                youtube_resolution INTEGER NOT NULL DEFAULT 0,
-                youtube_download_engine TEXT NOT NULL DEFAULT 'sonzai',
-                music_format TEXT NOT NULL DEFAULT 'flac',
-                updated_at REAL NOT NULL
-            )
-        """)
-        try:
-            cols = [row[1] for row in con.execute("PRAGMA table_info(user_settings)").fetchall()]
-            if "youtube_download_engine" not in cols:
-                con.execute("ALTER TABLE user_settings ADD COLUMN youtube_download_engine TEXT NOT NULL DEFAULT 'sonzai'")
-        except Exception:
-            pass
-        con.commit()
-    finally:
-        con.close()
+    ensure_schema(USER_SETTINGS_DB)
+
+def invalidate_user_settings(user_id: int | None = None):
+    if user_id is None:
+        _SETTINGS_CACHE.clear()
+    else:
+        _SETTINGS_CACHE.pop(int(user_id), None)
+
+def _cache_update(user_id: int, key: str, value):
+    cached = _SETTINGS_CACHE.get(int(user_id))
+    if cached is not None:
+        cached[key] = value
 
 def _ensure_user(user_id: int):
-    init_user_settings_db()
-    con = _connect()
-    try:
+    with db_session(USER_SETTINGS_DB) as con:
         now = float(time.time())
         con.execute("""
             INSERT OR IGNORE INTO user_settings
@@ -62,59 +65,56 @@ def _ensure_user(user_id: int):
             now,
         ))
         con.commit()
-    finally:
-        con.close()
 
 def get_user_settings(user_id: int) -> dict:
-    _ensure_user(user_id)
-    con = _connect()
-    try:
+    cached = _SETTINGS_CACHE.get(int(user_id))
+    if cached is not None:
+        return dict(cached)
+    with db_session(USER_SETTINGS_DB) as con:
         row = con.execute("""
             SELECT force_autodl, autodl_format, youtube_resolution, youtube_download_engine, music_format
             FROM user_settings
             WHERE user_id=?
             LIMIT 1
         """, (int(user_id),)).fetchone()
-        if not row:
-            return dict(DEFAULT_SETTINGS)
-        return {
+    if not row:
+        _ensure_user(user_id)
+        settings = dict(DEFAULT_SETTINGS)
+    else:
+        settings = {
             "force_autodl": int(row[0] or 0),
             "autodl_format": str(row[1] or "ask"),
             "youtube_resolution": int(row[2] or 0),
             "youtube_download_engine": str(row[3] or "sonzai"),
             "music_format": str(row[4] or "flac"),
         }
-    finally:
-        con.close()
+    _SETTINGS_CACHE[int(user_id)] = settings
+    return dict(settings)
 
 def set_force_autodl(user_id: int, enabled: bool):
     _ensure_user(user_id)
-    con = _connect()
-    try:
+    with db_session(USER_SETTINGS_DB) as con:
         con.execute("""
             UPDATE user_settings
             SET force_autodl=?, updated_at=?
             WHERE user_id=?
         """, (1 if enabled else 0, float(time.time()), int(user_id)))
         con.commit()
-    finally:
-        con.close()
+    _cache_update(user_id, "force_autodl", 1 if enabled else 0)
 
 def set_autodl_format(user_id: int, value: str):
     value = str(value or "ask").lower().strip()
     if value not in ("ask", "video", "mp3"):
         value = "ask"
     _ensure_user(user_id)
-    con = _connect()
-    try:
+    with db_session(USER_SETTINGS_DB) as con:
         con.execute("""
             UPDATE user_settings
             SET autodl_format=?, updated_at=?
             WHERE user_id=?
         """, (value, float(time.time()), int(user_id)))
         con.commit()
-    finally:
-        con.close()
+    _cache_update(user_id, "autodl_format", value)
 
 def set_youtube_resolution(user_id: int, value: int):
     try:
@@ -124,45 +124,39 @@ def set_youtube_resolution(user_id: int, value: int):
     if value not in (0, 360, 480, 720, 1080):
         value = 0
     _ensure_user(user_id)
-    con = _connect()
-    try:
+    with db_session(USER_SETTINGS_DB) as con:
         con.execute("""
             UPDATE user_settings
             SET youtube_resolution=?, updated_at=?
             WHERE user_id=?
         """, (value, float(time.time()), int(user_id)))
         con.commit()
-    finally:
-        con.close()
+    _cache_update(user_id, "youtube_resolution", value)
 
 def set_youtube_download_engine(user_id: int, value: str):
     value = str(value or "sonzai").lower().strip()
     if value not in ("sonzai", "ytdlp"):
         value = "sonzai"
     _ensure_user(user_id)
-    con = _connect()
-    try:
+    with db_session(USER_SETTINGS_DB) as con:
         con.execute("""
             UPDATE user_settings
             SET youtube_download_engine=?, updated_at=?
             WHERE user_id=?
         """, (value, float(time.time()), int(user_id)))
         con.commit()
-    finally:
-        con.close()
+    _cache_update(user_id, "youtube_download_engine", value)
 
 def set_music_format(user_id: int, value: str):
     value = str(value or "flac").lower().strip()
     if value not in ("flac", "mp3"):
         value = "flac"
     _ensure_user(user_id)
-    con = _connect()
-    try:
+    with db_session(USER_SETTINGS_DB) as con:
         con.execute("""
             UPDATE user_settings
             SET music_format=?, updated_at=?
             WHERE user_id=?
         """, (value, float(time.time()), int(user_id)))
         con.commit()
-    finally:
-        con.close()
\ No newline at end of file
+    _cache_update(user_id, "music_format", value)
@@ -0,0 +1,215 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Hashable
+
+from database.db import db_session, run_db
+
+log = logging.getLogger(__name__)
+
+WRITE_BEHIND_INTERVAL = float(os.getenv("DB_WRITE_BEHIND_INTERVAL", "5"))
+WRITE_BEHIND_MAX_ROWS = int(os.getenv("DB_WRITE_BEHIND_MAX_ROWS", "500"))
+WRITE_BEHIND_TOUCH = int(os.getenv("DB_WRITE_BEHIND_TOUCH", "3600"))
+WRITE_BEHIND_MEMO_MAX = int(os.getenv("DB_WRITE_BEHIND_MEMO_MAX", "200000"))
+
+_BUFFERS: list["UpsertBuffer"] = globals().get("_BUFFERS") or []
+_WAKE: asyncio.Event | None = None
+_TASK: asyncio.Task | None = None
+_STOPPING = False
+_STATS = {"queued": 0, "skipped": 0, "flushed_rows": 0, "flushes": 0, "failures": 0}
+
+
+class UpsertBuffer:
+    """
+    Deduplicating buffer of upserts for one statement.
+    Rows are keyed; a newer put for the same key replaces the pending one, and
+    a row whose signature matches what was last flushed is skipped until
+    WRITE_BEHIND_TOUCH seconds have passed.
+    """
+
+    def __init__(self, name: str, db_path: str, sql: str):
+        self.name = name
+        self.db_path = db_path
+        self.sql = sql
+        self.pending: dict[Hashable, tuple] = {}
+        self.flushed: dict[Hashable, tuple] = {}
+
+    def put(self, key: Hashable, sig, params: tuple) -> bool:
+        if key not in self.pending:
+            last = self.flushed.get(key)
+            if last and last[0] == sig and time.time() - last[1] < WRITE_BEHIND_TOUCH:
+                _STATS["skipped"] += 1
+                return False
+        self.pending[key] = (sig, params)
+        _STATS["queued"] += 1
+        _schedule()
+        return True
+
+    def discard(self, key: Hashable):
+        self.pending.pop(key, None)
+        self.flushed.pop(key, None)
+
+    def pending_items(self) -> list[tuple]:
+        return [(key, params) for key, (_, params) in self.pending.items()]
+
+    def _take(self) -> dict:
+        rows, self.pending = self.pending, {}
+        return rows
+
+    def _restore(self, rows: dict):
+        for key, row in rows.items():
+            self.pending.setdefault(key, row)
+
+    def _remember(self, rows: dict):
+        now = time.time()
+        for key, (sig, _) in rows.items():
+            self.flushed.pop(key, None)
+            self.flushed[key] = (sig, now)
+        overflow = len(self.flushed) - WRITE_BEHIND_MEMO_MAX
+        if overflow > 0:
+            for key in list(self.flushed)[:overflow]:
+                self.flushed.pop(key, None)
+
+
+def buffer(name: str, db_path: str, sql: str) -> UpsertBuffer:
+    """
+    Creates (or, when a module is reloaded, replaces) the buffer called
+    `name`. Rows still pending in the old buffer carry over.
+    """
+    buf = UpsertBuffer(name, db_path, sql)
+    for i, old in enumerate(_BUFFERS):
+        if old.name == name and old.db_path == db_path:
+            buf.pending.update(old.pending)
+            if old.sql == sql:
+                buf.flushed.update(old.flushed)
+            _BUFFERS[i] = buf
+            return buf
+    _BUFFERS.append(buf)
+    return buf
+
+
+def pending_count() -> int:
+    return sum(len(buf.pending) for buf in _BUFFERS)
+
+
+def get_stats() -> dict:
+    return {**_STATS, "pending": pending_count()}
+
+
+def _schedule():
+    global _WAKE, _TASK
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if _WAKE is None:
+        _WAKE = asyncio.Event()
+    if not _STOPPING and (_TASK is None or _TASK.done()):
+        _TASK = loop.create_task(_flush_loop())
+    if pending_count() >= WRITE_BEHIND_MAX_ROWS:
+        _WAKE.set()
+
+
+def _write_sync(batches: list[tuple[UpsertBuffer, dict]]):
+    by_db: dict[str, list[tuple[UpsertBuffer, dict]]] = {}
+    for buf, rows in batches:
+        by_db.setdefault(buf.db_path, []).append((buf, rows))
+    failed = []
+    for db_path, items in by_db.items():
+        try:
+            with db_session(db_path) as con:
+                try:
+                    con.execute("BEGIN")
+                    for buf, rows in items:
+                        con.executemany(buf.sql, [params for _, params in rows.values()])
+                    con.execute("COMMIT")
+                except Exception:
+                    try:
+                        con.execute("ROLLBACK")
+                    except Exception:
+                        pass
+                    raise
+        except Exception as e:
+            log.warning("Write-behind flush failed | db=%s err=%r", db_path, e)
+            failed.append(db_path)
+    return failed
+
+
+async def flush() -> int:
+    batches = [(buf, buf._take()) for buf in _BUFFERS if buf.pending]
+    if not batches:
+        return 0
+    try:
+        failed = set(await run_db(_write_sync, batches))
+    except BaseException:
+        for buf, rows in batches:
+            buf._restore(rows)
+        raise
+    written = 0
+    for buf, rows in batches:
+        if buf.db_path in failed:
+            buf._restore(rows)
+            continue
+        buf._remember(rows)
+        written += len(rows)
+    _STATS["flushes"] += 1
+    _STATS["flushed_rows"] += written
+    if failed:
+        _STATS["failures"] += 1
+    return written
+
+
+async def _flush_loop():
+    while not _STOPPING:
+        try:
+            await asyncio.wait_for(_WAKE.wait(), timeout=WRITE_BEHIND_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _WAKE.clear()
+        try:
+            await flush()
+        except Exception as e:
+            log.warning("Write-behind flush loop error | err=%r", e)
+
+
+async def _drain() -> int:
+    global _TASK
+    task, _TASK = _TASK, None
+    if task is not None:
+        _WAKE.set()
+        try:
+            await asyncio.wait_for(task, timeout=30)
+        except Exception as e:
+            log.warning("Write-behind flush loop did not stop cleanly | err=%r", e)
+    for attempt in range(3):
+        await flush()
+        if not pending_count():
+            break
+        await asyncio.sleep(0.5 * (attempt + 1))
+    return pending_count()
+
+
+async def drain_write_behind():
+    """
+    Stops the flush loop and writes out every pending row, then lets the
+    next put start a fresh loop. Used before /reload replaces the buffers.
+    """
+    global _STOPPING
+    _STOPPING = True
+    try:
+        left = await _drain()
+    finally:
+        _STOPPING = False
+    if left:
+        log.warning("Write-behind drain left %s rows unflushed", left)
+
+
+async def shutdown_write_behind():
+    global _STOPPING
+    _STOPPING = True
+    left = await _drain()
+    if left:
+        log.error("Write-behind shutdown left %s rows unflushed", left)
+    else:
+        log.info("Write-behind buffers flushed")
@@ -1,6 +1,5 @@
 import html
 import json
-import aiohttp
 import asyncio
 import logging
 
@@ -8,11 +7,12 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from handlers.join import require_join_or_block
-from utils.http import get_http_session
+from utils.providers import provider
 from utils.config import NEOXR_API_KEY
 
 log = logging.getLogger(__name__)
 BASE_URL = "https://api.neoxr.eu/api"
+NEOXR = provider("neoxr", describe=lambda status, body: f"HTTP {status}: {body[:500]}")
 MAX_TEXT_LENGTH = 4000
 
 def esc(text) -> str:
@@ -41,13 +41,10 @@ async def neoxr_get(endpoint: str, params: dict | None = None, timeout: int = 30
         return False, "NEOXR_API_KEY is not set in .env"
     params = dict(params or {})
     params["apikey"] = NEOXR_API_KEY
-    session = await get_http_session()
     url = f"{BASE_URL}/{endpoint.lstrip('/')}"
     try:
-        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        async with NEOXR.request("GET", url, params=params, timeout=timeout) as resp:
             raw = await resp.text()
-            if resp.status != 200:
-                return False, f"HTTP {resp.status}: {raw[:500]}"
             try:
                 return True, json.loads(raw)
             except Exception:
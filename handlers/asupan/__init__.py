@@ -5,6 +5,7 @@ from .commands import (
     autodel_cmd,
     send_asupan_once,
 )
+from .cache import start_asupan_prefetch, asupan_pool_stats
 
 from database.asupan_db import (
     init_asupan_storage,
@@ -20,7 +21,8 @@ __all__ = [
     "asupann_cmd",
     "autodel_cmd",
     "send_asupan_once",
-    "send_asupan_once",
+    "start_asupan_prefetch",
+    "asupan_pool_stats",
     "load_asupan_groups",
     "load_autodel_group",
 ]
\ No newline at end of file
@@ -1,6 +1,7 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from utils.config import OWNER_ID
+from utils.chat_members import get_member
 
 
 async def is_admin_or_owner(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
@@ -13,7 +14,7 @@ async def is_admin_or_owner(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if chat.type not in ("group", "supergroup"):
         return False
     try:
-        member = await context.bot.get_chat_member(chat.id, user.id)
+        member = await get_member(context.bot, chat.id, user.id)
         return member.status in ("administrator", "creator")
     except Exception:
         return False
\ No newline at end of file
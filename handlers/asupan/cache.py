@@ -1,75 +1,280 @@
+import time
 import asyncio
+from collections import OrderedDict
 from utils.config import LOG_CHAT_ID
-from .constants import ASUPAN_PREFETCH_SIZE, log
-from .fetcher import fetch_asupan_tikwm
+from .constants import (
+    ASUPAN_POOL_LOW,
+    ASUPAN_POOL_HIGH,
+    ASUPAN_KEYWORD_POOL_HIGH,
+    ASUPAN_WARM_CONCURRENCY,
+    ASUPAN_WARM_KEYWORDS,
+    ASUPAN_WARM_INTERVAL,
+    ASUPAN_WARM_WINDOW,
+    ASUPAN_UPLOAD_INTERVAL,
+    ASUPAN_SERVED_MEMORY,
+    log,
+)
+from .fetcher import fetch_asupan_video
 from . import state
+from database.asupan_db import (
+    load_asupan_pool,
+    add_to_asupan_pool,
+    remove_from_asupan_pool,
+    record_asupan_keyword,
+    top_asupan_keywords,
+)
 
+_WARM_SEM = asyncio.Semaphore(ASUPAN_WARM_CONCURRENCY)
+_UPLOAD_LOCK = asyncio.Lock()
+_UPLOAD_NEXT = 0.0
 
-async def warm_keyword_asupan_cache(bot, keyword: str):
-    kw = keyword.lower().strip()
-    cache = state.ASUPAN_KEYWORD_CACHE.setdefault(kw, [])
-    if len(cache) >= ASUPAN_PREFETCH_SIZE:
+
+def _background(coro):
+    task = asyncio.create_task(coro)
+    task.add_done_callback(lambda t: t.cancelled() or not t.exception() or log.warning(f"[ASUPAN POOL] {t.exception()}"))
+    return task
+
+
+def _pool_key(keyword: str | None) -> str:
+    return (keyword or "").lower().strip()
+
+
+def _pool_high(key: str) -> int:
+    return ASUPAN_POOL_HIGH if not key else ASUPAN_KEYWORD_POOL_HIGH
+
+
+def _served(chat_id: int) -> OrderedDict:
+    return state.ASUPAN_SERVED.setdefault(chat_id, OrderedDict())
+
+
+def _mark_served(chat_id: int | None, item: dict):
+    if chat_id is None or not item.get("file_unique_id"):
         return
+    served = _served(chat_id)
+    served[item["file_unique_id"]] = time.time()
+    served.move_to_end(item["file_unique_id"])
+    while len(served) > ASUPAN_SERVED_MEMORY:
+        served.popitem(last=False)
+
+
+async def _upload_gate():
+    global _UPLOAD_NEXT
+    async with _UPLOAD_LOCK:
+        wait = _UPLOAD_NEXT - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        _UPLOAD_NEXT = time.monotonic() + ASUPAN_UPLOAD_INTERVAL
+
+
+def _video_key(video: dict) -> str:
+    return str(video.get("video_id") or video.get("id") or "")
+
+
+async def _upload(bot, keyword: str | None, exclude: set[str] | None = None) -> dict:
+    return await _upload_video(bot, await fetch_asupan_video(keyword, exclude))
+
+
+async def _upload_video(bot, video: dict) -> dict:
+    await _upload_gate()
+    msg = await bot.send_video(
+        chat_id=LOG_CHAT_ID,
+        video=video["play"],
+        disable_notification=True,
+    )
     try:
-        while len(cache) < ASUPAN_PREFETCH_SIZE:
-            url = await fetch_asupan_tikwm(kw)
-            msg = await bot.send_video(
-                chat_id=LOG_CHAT_ID,
-                video=url,
-                disable_notification=True,
-            )
-            cache.append({"file_id": msg.video.file_id})
-            await msg.delete()
-            await asyncio.sleep(1.1)
+        await msg.delete()
     except Exception as e:
-        log.warning(f"[ASUPAN KEYWORD PREFETCH] {kw}: {e}")
+        log.debug(f"[ASUPAN PREFETCH] delete failed: {e}")
+    return {
+        "file_id": msg.video.file_id,
+        "file_unique_id": msg.video.file_unique_id,
+        "video_id": _video_key(video),
+    }
 
-async def warm_asupan_cache(bot):
-    if state.ASUPAN_FETCHING or not LOG_CHAT_ID:
+
+async def ensure_pool_loaded():
+    if state.ASUPAN_POOL_LOADED:
         return
-    state.ASUPAN_FETCHING = True
+    state.ASUPAN_POOL_LOADED = True
     try:
-        while len(state.ASUPAN_CACHE) < ASUPAN_PREFETCH_SIZE:
+        loaded = await load_asupan_pool()
+        for key, items in loaded.items():
+            state.ASUPAN_POOL.setdefault(key, []).extend(items)
+        log.info(f"[ASUPAN POOL] Loaded {sum(len(v) for v in loaded.values())} videos for {len(loaded)} keywords")
+    except Exception as e:
+        log.warning(f"[ASUPAN POOL] Load failed: {e}")
+
+
+def _fresh(pool: list[dict], chat_id: int | None) -> int:
+    served = state.ASUPAN_SERVED.get(chat_id) or {}
+    return sum(1 for i in pool if i.get("file_unique_id") not in served)
+
+
+def _evict(key: str, pool: list[dict], chat_id: int | None):
+    """
+    Trims the pool back to its high watermark, dropping the items this chat
+    has already seen first and then those served to the most chats.
+    """
+    overflow = len(pool) - _pool_high(key)
+    if overflow <= 0:
+        return
+    mine = state.ASUPAN_SERVED.get(chat_id) or {}
+
+    def seen(item: dict):
+        uid = item.get("file_unique_id")
+        return uid in mine, sum(1 for served in state.ASUPAN_SERVED.values() if uid in served)
+
+    for item in sorted(pool, key=seen, reverse=True)[:overflow]:
+        pool.remove(item)
+        state.ASUPAN_STATS["evictions"] += 1
+        _background(remove_from_asupan_pool(key, item["file_id"]))
+
+
+async def refill_pool(bot, keyword: str | None = None, chat_id: int | None = None):
+    """
+    Tops the pool for keyword up to its high watermark with uploads running in
+    parallel, bounded by ASUPAN_WARM_CONCURRENCY across all keywords. With a
+    chat_id, only items that chat hasn't been served count towards the mark,
+    and the surplus is evicted afterwards.
+    """
+    key = _pool_key(keyword)
+    if not LOG_CHAT_ID or key in state.ASUPAN_REFILLING:
+        return
+    state.ASUPAN_REFILLING.add(key)
+    try:
+        await ensure_pool_loaded()
+        pool = state.ASUPAN_POOL.setdefault(key, [])
+        need = _pool_high(key) - _fresh(pool, chat_id)
+        if need <= 0:
+            return
+        reserved: set[str] = set()
+
+        def known() -> set[str]:
+            return {i.get("video_id") for i in pool if i.get("video_id")} | reserved
+
+        async def one():
+            async with _WARM_SEM:
+                video = await fetch_asupan_video(key or None, known())
+                vid = _video_key(video)
+                if vid and vid in known():
+                    state.ASUPAN_STATS["dedup_skips"] += 1
+                    return
+                if vid:
+                    reserved.add(vid)
+                try:
+                    item = await _upload_video(bot, video)
+                finally:
+                    reserved.discard(vid)
+            pool.append(item)
+            state.ASUPAN_STATS["uploads"] += 1
+            await add_to_asupan_pool(key, item)
+
+        results = await asyncio.gather(*(one() for _ in range(need)), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            state.ASUPAN_STATS["upload_errors"] += len(errors)
+            log.warning(f"[ASUPAN PREFETCH] {key or '*'}: {len(errors)}/{need} failed, last={errors[-1]}")
+        _evict(key, pool, chat_id)
+    finally:
+        state.ASUPAN_REFILLING.discard(key)
+
+
+def schedule_refill(bot, keyword: str | None = None, force: bool = False, chat_id: int | None = None):
+    key = _pool_key(keyword)
+    if not force and _fresh(state.ASUPAN_POOL.get(key) or [], chat_id) > ASUPAN_POOL_LOW:
+        return None
+    if key in state.ASUPAN_REFILLING:
+        return None
+    return _background(refill_pool(bot, keyword, chat_id))
+
+
+async def warm_keyword_asupan_cache(bot, keyword: str):
+    await refill_pool(bot, keyword)
+
+
+async def warm_asupan_cache(bot):
+    await refill_pool(bot, None)
+
+
+def _take(key: str, chat_id: int | None) -> dict | None:
+    pool = state.ASUPAN_POOL.get(key) or []
+    served = state.ASUPAN_SERVED.get(chat_id) or {}
+    for idx, item in enumerate(pool):
+        if item.get("file_unique_id") in served:
+            state.ASUPAN_STATS["dedup_skips"] += 1
+            continue
+        return pool.pop(idx)
+    return None
+
+
+async def get_asupan_fast(bot, keyword: str | None = None, chat_id: int | None = None):
+    """
+    Serves from the prefetched pool when possible, skipping videos this chat
+    already got, and falls back to a direct fetch + upload on a miss. The pool
+    is refilled in the background once this chat has ASUPAN_POOL_LOW or fewer
+    unseen items left in it.
+    """
+    await ensure_pool_loaded()
+    key = _pool_key(keyword)
+    _background(record_asupan_keyword(key))
+    item = _take(key, chat_id)
+    if item:
+        state.ASUPAN_STATS["hits"] += 1
+        _background(remove_from_asupan_pool(key, item["file_id"]))
+    else:
+        state.ASUPAN_STATS["misses"] += 1
+        item = await _upload(bot, key or None, set())
+    _mark_served(chat_id, item)
+    schedule_refill(bot, keyword, chat_id=chat_id)
+    return item
+
+
+def asupan_pool_stats() -> dict:
+    hits = state.ASUPAN_STATS["hits"]
+    misses = state.ASUPAN_STATS["misses"]
+    total = hits + misses
+    return {
+        **state.ASUPAN_STATS,
+        "hit_ratio": (hits / total) if total else 0.0,
+        "pools": {k or "*": len(v) for k, v in state.ASUPAN_POOL.items() if v},
+        "refilling": sorted(k or "*" for k in state.ASUPAN_REFILLING),
+    }
+
+
+async def asupan_prefetch_loop(app):
+    await asyncio.sleep(5)
+    try:
+        while True:
             try:
-                url = await fetch_asupan_tikwm(None)
-
-                msg = await bot.send_video(
-                    chat_id=LOG_CHAT_ID,
-                    video=url,
-                    disable_notification=True,
-                )
-                state.ASUPAN_CACHE.append({"file_id": msg.video.file_id})
-                await msg.delete()
-                await asyncio.sleep(1.1)
-            except Exception as e:
-                log.warning(f"[ASUPAN PREFETCH] {e}")
-                break
+                keywords = [""]
+                since = time.time() - ASUPAN_WARM_WINDOW
+                for kw in await top_asupan_keywords(ASUPAN_WARM_KEYWORDS + 1, since):
+                    if kw not in keywords:
+                        keywords.append(kw)
+                keywords = keywords[:ASUPAN_WARM_KEYWORDS + 1]
+                tasks = [schedule_refill(app.bot, kw or None) for kw in keywords]
+                tasks = [t for t in tasks if t]
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    log.info(f"[ASUPAN PREFETCH] Warmed {len(tasks)} pools | stats={asupan_pool_stats()}")
+            except Exception:
+                log.exception("[ASUPAN PREFETCH] Warm cycle failed")
+            await asyncio.sleep(ASUPAN_WARM_INTERVAL)
+    except asyncio.CancelledError:
+        log.info("[ASUPAN PREFETCH] Loop cancelled")
+        raise
     finally:
-        state.ASUPAN_FETCHING = False
-
-async def get_asupan_fast(bot, keyword: str | None = None):
-    if keyword is None:
-        if state.ASUPAN_CACHE:
-            return state.ASUPAN_CACHE.pop(0)
-        url = await fetch_asupan_tikwm(None)
-        msg = await bot.send_video(
-            chat_id=LOG_CHAT_ID,
-            video=url,
-            disable_notification=True,
-        )
-        file_id = msg.video.file_id
-        await msg.delete()
-        return {"file_id": file_id}
-    kw = keyword.lower().strip()
-    cache = state.ASUPAN_KEYWORD_CACHE.get(kw)
-    if cache:
-        return cache.pop(0)
-    url = await fetch_asupan_tikwm(kw)
-    msg = await bot.send_video(
-        chat_id=LOG_CHAT_ID,
-        video=url,
-        disable_notification=True,
-    )
-    file_id = msg.video.file_id
-    await msg.delete()
-    return {"file_id": file_id}
\ No newline at end of file
+        if app.bot_data.get("asupan_prefetch_task") is asyncio.current_task():
+            app.bot_data.pop("asupan_prefetch_task", None)
+
+
+def start_asupan_prefetch(app):
+    existing = app.bot_data.get("asupan_prefetch_task")
+    if existing and not existing.done():
+        return existing
+    if not LOG_CHAT_ID:
+        log.warning("[ASUPAN PREFETCH] Skipped: LOG_CHAT_ID kosong")
+        return None
+    task = asyncio.create_task(asupan_prefetch_loop(app))
+    app.bot_data["asupan_prefetch_task"] = task
+    return task
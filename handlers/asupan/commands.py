@@ -8,7 +8,7 @@ from . import state
 from .auth import is_admin_or_owner
 from database.asupan_db import save_asupan_groups, save_autodel_groups, is_asupan_enabled, is_autodel_enabled
 from .keyboards import asupan_keyboard
-from .cache import get_asupan_fast, warm_asupan_cache, warm_keyword_asupan_cache
+from .cache import get_asupan_fast, asupan_pool_stats
 from .jobs import reset_asupan_delete_job, clear_asupan_delete_job, should_use_autodel
 from .constants import ASUPAN_COOLDOWN_SEC, log
 
@@ -26,7 +26,8 @@ async def asupann_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "• <code>/asupann enable</code>\n"
             "• <code>/asupann disable</code>\n"
             "• <code>/asupann status</code>\n"
-            "• <code>/asupann list</code>",
+            "• <code>/asupann list</code>\n"
+            "• <code>/asupann pool</code>",
             parse_mode="HTML",
         )
     sub = context.args[0].lower()
@@ -68,6 +69,21 @@ async def asupann_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except Exception:
                 lines.append(f"• <code>{cid}</code>")
         return await update.message.reply_text("\n".join(lines), parse_mode="HTML")
+    if sub == "pool":
+        if user.id not in OWNER_ID:
+            return
+        stats = asupan_pool_stats()
+        pools = ", ".join(f"{html.escape(k)}={v}" for k, v in sorted(stats["pools"].items())) or "-"
+        return await update.message.reply_text(
+            "<b>Asupan Pool</b>\n\n"
+            f"Hit ratio: <b>{stats['hit_ratio'] * 100:.1f}%</b> "
+            f"({stats['hits']} hit / {stats['misses']} miss)\n"
+            f"Uploads: {stats['uploads']} (errors {stats['upload_errors']})\n"
+            f"TikWM calls: {stats['api_calls']}\n"
+            f"Dedup skips: {stats['dedup_skips']}\n"
+            f"Pools: {pools}",
+            parse_mode="HTML",
+        )
 
 async def autodel_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -137,7 +153,7 @@ async def asupan_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyword = " ".join(context.args).strip() if context.args else None
     msg = await update.message.reply_text("😋 Searching asupan...")
     try:
-        data = await get_asupan_fast(context.bot, keyword)
+        data = await get_asupan_fast(context.bot, keyword, chat.id)
         sent = await chat.send_video(
             video=data["file_id"],
             reply_to_message_id=update.message.message_id,
@@ -147,9 +163,6 @@ async def asupan_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if should_use_autodel(chat):
             reset_asupan_delete_job(context, chat.id, sent.message_id, update.message.message_id)
         await msg.delete()
-        context.application.create_task(warm_asupan_cache(context.bot))
-        if keyword:
-            context.application.create_task(warm_keyword_asupan_cache(context.bot, keyword))
     except Exception as e:
         await msg.edit_text(f"❌ Gagal: {e}")
 
@@ -180,7 +193,7 @@ async def asupan_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         msg_id = q.message.message_id
         keyword = state.ASUPAN_MESSAGE_KEYWORD.get(msg_id)
         clear_asupan_delete_job(msg_id)
-        data = await get_asupan_fast(context.bot, keyword)
+        data = await get_asupan_fast(context.bot, keyword, q.message.chat_id)
         await q.message.edit_media(
             media=InputMediaVideo(media=data["file_id"]),
             reply_markup=asupan_keyboard(owner_id),
@@ -189,10 +202,6 @@ async def asupan_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if should_use_autodel(q.message.chat):
             reset_asupan_delete_job(context, q.message.chat_id, msg_id, reply_to)
         state.ASUPAN_MESSAGE_KEYWORD[msg_id] = keyword
-        if keyword:
-            context.application.create_task(warm_keyword_asupan_cache(context.bot, keyword))
-        else:
-            context.application.create_task(warm_asupan_cache(context.bot))
     except Exception:
         await q.answer("❌ Gagal ambil asupan", show_alert=True)
 
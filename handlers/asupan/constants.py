@@ -1,3 +1,4 @@
+import os
 import logging
 
 log = logging.getLogger(__name__)
@@ -5,6 +6,19 @@ log = logging.getLogger(__name__)
 ASUPAN_DB_PATH = "data/asupan.sqlite3"
 
 ASUPAN_PREFETCH_SIZE = 5
+ASUPAN_POOL_LOW = int(os.getenv("ASUPAN_POOL_LOW", "3"))
+ASUPAN_POOL_HIGH = int(os.getenv("ASUPAN_POOL_HIGH", "10"))
+ASUPAN_KEYWORD_POOL_HIGH = int(os.getenv("ASUPAN_KEYWORD_POOL_HIGH", str(ASUPAN_PREFETCH_SIZE)))
+ASUPAN_WARM_CONCURRENCY = max(1, int(os.getenv("ASUPAN_WARM_CONCURRENCY", "3")))
+ASUPAN_WARM_KEYWORDS = int(os.getenv("ASUPAN_WARM_KEYWORDS", "5"))
+ASUPAN_WARM_INTERVAL = int(os.getenv("ASUPAN_WARM_INTERVAL", "300"))
+ASUPAN_WARM_WINDOW = int(os.getenv("ASUPAN_WARM_WINDOW", str(7 * 24 * 60 * 60)))
+ASUPAN_UPLOAD_INTERVAL = float(os.getenv("ASUPAN_UPLOAD_INTERVAL", "1.1"))
+ASUPAN_SERVED_MEMORY = int(os.getenv("ASUPAN_SERVED_MEMORY", "200"))
+ASUPAN_TIKWM_PAGE_SIZE = int(os.getenv("ASUPAN_TIKWM_PAGE_SIZE", "20"))
+ASUPAN_TIKWM_INTERVAL = float(os.getenv("ASUPAN_TIKWM_INTERVAL", "1.1"))
+ASUPAN_CANDIDATE_TTL = int(os.getenv("ASUPAN_CANDIDATE_TTL", str(60 * 60)))
+ASUPAN_SEEN_MEMORY = int(os.getenv("ASUPAN_SEEN_MEMORY", "1000"))
 ASUPAN_AUTO_DELETE_SEC = 300
 ASUPAN_COOLDOWN_SEC = 5
 
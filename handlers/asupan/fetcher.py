@@ -1,33 +1,124 @@
+import time
 import random
+import asyncio
 import aiohttp
+from collections import deque
 from utils.http import get_http_session
-from .constants import DEFAULT_ASUPAN_KEYWORDS
+from .constants import (
+    DEFAULT_ASUPAN_KEYWORDS,
+    ASUPAN_TIKWM_PAGE_SIZE,
+    ASUPAN_TIKWM_INTERVAL,
+    ASUPAN_CANDIDATE_TTL,
+    ASUPAN_SEEN_MEMORY,
+    log,
+)
+from . import state
 
+_API_LOCK = asyncio.Lock()
+_API_NEXT = 0.0
+_FILL_LOCKS: dict[str, asyncio.Lock] = {}
+
+
+def _video_id(video: dict) -> str:
+    return str(video.get("video_id") or video.get("id") or "")
 
-async def fetch_asupan_tikwm(keyword: str | None = None):
-    query = keyword.strip() if keyword else random.choice(DEFAULT_ASUPAN_KEYWORDS)
 
+async def fetch_asupan_page(query: str, cursor: int = 0) -> tuple[list[dict], int, bool]:
+    """
+    One TikWM search page: (videos, next_cursor, has_more). Calls are spaced
+    ASUPAN_TIKWM_INTERVAL apart to stay under the free API rate limit.
+    """
+    global _API_NEXT
     api_url = "https://www.tikwm.com/api/feed/search"
     payload = {
         "keywords": query,
-        "count": 20,
-        "cursor": 0,
+        "count": ASUPAN_TIKWM_PAGE_SIZE,
+        "cursor": cursor,
         "region": "ID",
     }
 
-    session = await get_http_session()
-    async with session.post(
-        api_url,
-        json=payload,
-        timeout=aiohttp.ClientTimeout(total=15),
-    ) as r:
-        data = await r.json()
+    async with _API_LOCK:
+        wait = _API_NEXT - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        _API_NEXT = time.monotonic() + ASUPAN_TIKWM_INTERVAL
+        state.ASUPAN_STATS["api_calls"] += 1
+        session = await get_http_session()
+        async with session.post(
+            api_url,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=15),
+        ) as r:
+            data = await r.json()
 
     if data.get("code") != 0:
         raise RuntimeError(f"TikWM API error: {data.get('msg')}")
 
-    videos = data.get("data", {}).get("videos") or []
-    if not videos:
-        raise RuntimeError("Asupan kosong")
+    page = data.get("data") or {}
+    videos = page.get("videos") or []
+    try:
+        next_cursor = int(page.get("cursor") or 0)
+    except (TypeError, ValueError):
+        next_cursor = 0
+    has_more = bool(page.get("hasMore")) and next_cursor > cursor
+    return videos, next_cursor, has_more
+
+
+def _seen(query: str) -> dict:
+    return state.ASUPAN_SEEN.setdefault(query, {})
+
+
+def _remember(query: str, video_id: str):
+    seen = _seen(query)
+    seen[video_id] = time.time()
+    while len(seen) > ASUPAN_SEEN_MEMORY:
+        seen.pop(next(iter(seen)))
 
-    return random.choice(videos)["play"]
\ No newline at end of file
+
+async def _fill_candidates(key: str, keyword: str | None):
+    query = keyword.strip() if keyword else random.choice(DEFAULT_ASUPAN_KEYWORDS)
+    seen_key = query.lower()
+    cursor = state.ASUPAN_CURSORS.get(seen_key, 0)
+    videos, next_cursor, has_more = await fetch_asupan_page(query, cursor)
+    state.ASUPAN_CURSORS[seen_key] = next_cursor if has_more else 0
+    queue = state.ASUPAN_CANDIDATES.setdefault(key, deque())
+    now = time.time()
+    added = 0
+    for video in videos:
+        vid = _video_id(video)
+        if not video.get("play") or (vid and vid in _seen(seen_key)):
+            continue
+        if vid:
+            _remember(seen_key, vid)
+        queue.append((now, video))
+        added += 1
+    if not added and videos:
+        # every result was seen before: start over from the first page next time
+        state.ASUPAN_CURSORS[seen_key] = 0
+        queue.extend((now, v) for v in videos if v.get("play"))
+    log.debug(f"[ASUPAN FETCH] {query!r} cursor={cursor} got={len(videos)} queued={added}")
+
+
+async def fetch_asupan_video(keyword: str | None = None, exclude: set[str] | None = None) -> dict:
+    """
+    Next unseen video for keyword from the queued search results, fetching the
+    next page for that keyword only when the queue is empty.
+    """
+    key = (keyword or "").lower().strip()
+    queue = state.ASUPAN_CANDIDATES.setdefault(key, deque())
+    for attempt in range(2):
+        cutoff = time.time() - ASUPAN_CANDIDATE_TTL
+        while queue:
+            queued_at, video = queue.popleft()
+            if queued_at < cutoff or _video_id(video) in (exclude or ()):
+                continue
+            return video
+        lock = _FILL_LOCKS.setdefault(key, asyncio.Lock())
+        async with lock:
+            if not queue:
+                await _fill_candidates(key, keyword)
+    raise RuntimeError("Asupan kosong")
+
+
+async def fetch_asupan_tikwm(keyword: str | None = None):
+    return (await fetch_asupan_video(keyword))["play"]
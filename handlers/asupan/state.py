@@ -1,7 +1,12 @@
-ASUPAN_CACHE = []
-ASUPAN_KEYWORD_CACHE = {}
+ASUPAN_POOL = {}
+ASUPAN_POOL_LOADED = False
+ASUPAN_REFILLING = set()
+ASUPAN_SERVED = {}
+ASUPAN_CANDIDATES = {}
+ASUPAN_CURSORS = {}
+ASUPAN_SEEN = {}
+ASUPAN_STATS = {"hits": 0, "misses": 0, "uploads": 0, "upload_errors": 0, "dedup_skips": 0, "api_calls": 0, "evictions": 0}
 ASUPAN_MESSAGE_KEYWORD = {}
-ASUPAN_FETCHING = False
 ASUPAN_ENABLED_CHATS = set()
 AUTODEL_ENABLED_CHATS = set()
 ASUPAN_DELETE_JOBS = {}
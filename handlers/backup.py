@@ -1,9 +1,7 @@
 import os
-import zipfile
 import tempfile
 import html
 import asyncio
-import sqlite3
 import logging
 from datetime import datetime
 
@@ -11,6 +9,15 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from utils.config import OWNER_ID, LOG_CHAT_ID
+from database.db import get_connection, register_schema, ensure_schema, close_all_connections, run_db
+from database.backup_engine import (
+    BackupResult,
+    RestorePlan,
+    build_backup,
+    save_last_manifest,
+    stage_restore,
+    apply_restore,
+)
 
 log = logging.getLogger(__name__)
 
@@ -38,30 +45,32 @@ def _ensure_data_dir():
     os.makedirs(DATA_DIR, exist_ok=True)
 
 
+def _settings_schema(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    db.execute(
+        "INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)",
+        ("auto_backup", "0")
+    )
+
+
+register_schema(DB_PATH, _settings_schema)
+
+
 def _get_db():
-    _ensure_data_dir()
-    return sqlite3.connect(DB_PATH, timeout=30)
+    ensure_schema(DB_PATH)
+    return get_connection(DB_PATH)
 
 
 def _init_db():
-    with _get_db() as db:
-        db.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            )
-        """)
-        cur = db.execute("SELECT value FROM settings WHERE key = ?", ("auto_backup",))
-        if not cur.fetchone():
-            db.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ("auto_backup", "0")
-            )
-        db.commit()
+    ensure_schema(DB_PATH)
 
 
 def _get_setting(key: str, default: str = "0") -> str:
-    _init_db()
     with _get_db() as db:
         cur = db.execute("SELECT value FROM settings WHERE key = ?", (key,))
         row = cur.fetchone()
@@ -69,7 +78,6 @@ def _get_setting(key: str, default: str = "0") -> str:
 
 
 def _set_setting(key: str, value: str):
-    _init_db()
     with _get_db() as db:
         db.execute(
             "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
@@ -78,44 +86,10 @@ def _set_setting(key: str, value: str):
         db.commit()
 
 
-def _zip_data(zip_path: str):
-    _ensure_data_dir()
-
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
-        for root, _, files in os.walk(DATA_DIR):
-            for f in files:
-                full_path = os.path.join(root, f)
-
-                if os.path.abspath(full_path) == os.path.abspath(zip_path):
-                    continue
-
-                rel_path = os.path.relpath(full_path, DATA_DIR)
-                z.write(full_path, rel_path)
-
-
-def _safe_extract_zip(zip_path: str, extract_to: str):
-    _ensure_data_dir()
-    extract_root = os.path.abspath(extract_to)
-
-    with zipfile.ZipFile(zip_path, "r") as z:
-        for member in z.infolist():
-            member_name = member.filename
-
-            if not member_name:
-                continue
-
-            target_path = os.path.abspath(os.path.join(extract_root, member_name))
-
-            if os.path.commonpath([extract_root, target_path]) != extract_root:
-                raise ValueError(f"Unsafe path in zip: {member_name}")
-
-            if member.is_dir():
-                os.makedirs(target_path, exist_ok=True)
-                continue
-
-            os.makedirs(os.path.dirname(target_path), exist_ok=True)
-            with z.open(member, "r") as src, open(target_path, "wb") as dst:
-                dst.write(src.read())
+def _apply_restore(plan: RestorePlan):
+    close_all_connections(reset_schema=True)
+    apply_restore(plan, DATA_DIR)
+    close_all_connections(reset_schema=True)
 
 
 async def _reload_runtime_state(app) -> list[str]:
@@ -167,38 +141,66 @@ async def _reload_runtime_state(app) -> list[str]:
         log.exception("Failed to reload premium runtime state after restore")
         errors.append("premium")
 
+    try:
+        from database.download_db import invalidate_auto_dl
+        from database.user_settings_db import invalidate_user_settings
+
+        invalidate_auto_dl()
+        invalidate_user_settings()
+        log.info("✓ Download settings cache reset")
+    except Exception:
+        log.exception("Failed to reset download settings cache after restore")
+        errors.append("download_settings")
+
+    try:
+        from utils import caca_memory, gemini_memory, groq_memory
+
+        await caca_memory.init()
+        await gemini_memory.init()
+        await groq_memory.init()
+        log.info("✓ AI reply index rebuilt")
+    except Exception:
+        log.exception("Failed to rebuild AI reply index after restore")
+        errors.append("ai_memory")
+
     return errors
 
 
-async def run_backup(bot):
+async def run_backup(bot, full: bool | None = None) -> BackupResult:
     if not LOG_CHAT_ID:
         raise ValueError("LOG_CHAT_ID kosong")
 
-    now = datetime.now().strftime("%d-%m-%Y_%H-%M")
-    filename = f"backup_data_{now}.zip"
-    zip_path = None
+    _ensure_data_dir()
+    stem = f"backup_data_{datetime.now().strftime('%d-%m-%Y_%H-%M')}"
+    result = await asyncio.to_thread(build_backup, DATA_DIR, stem, full)
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
-            zip_path = tmp.name
+        total = len(result.volumes)
+        for idx, path in enumerate(result.volumes, start=1):
+            filename = os.path.basename(path)
+            part = f" {idx}/{total}" if total > 1 else ""
+            with open(path, "rb") as f:
+                await bot.send_document(
+                    chat_id=LOG_CHAT_ID,
+                    document=f,
+                    filename=filename,
+                    caption=(
+                        f"Auto backup ({result.kind}{part})\n"
+                        f"<code>{filename}</code>\n"
+                        f"Files: {len(result.changed)}/{len(result.manifest['files'])}"
+                    ),
+                    parse_mode="HTML",
+                    read_timeout=300,
+                    write_timeout=300,
+                )
 
-        _zip_data(zip_path)
+        if result.volumes:
+            await asyncio.to_thread(save_last_manifest, DATA_DIR, result.manifest)
 
-        with open(zip_path, "rb") as f:
-            await bot.send_document(
-                chat_id=LOG_CHAT_ID,
-                document=f,
-                filename=filename,
-                caption=f"Auto backup\n<code>{filename}</code>",
-                parse_mode="HTML"
-            )
+        return result
 
     finally:
-        if zip_path and os.path.exists(zip_path):
-            try:
-                os.remove(zip_path)
-            except OSError as e:
-                log.warning(f"Failed to remove temp backup file: {e}")
+        await asyncio.to_thread(result.cleanup)
 
 
 async def auto_backup_loop(app):
@@ -210,8 +212,11 @@ async def auto_backup_loop(app):
                 enabled = _get_setting("auto_backup", "0") == "1"
 
                 if enabled:
-                    await run_backup(app.bot)
-                    log.info("✓ Auto backup sent")
+                    result = await run_backup(app.bot)
+                    log.info(
+                        "✓ Auto backup done | kind=%s files=%s parts=%s",
+                        result.kind, len(result.changed), len(result.volumes),
+                    )
 
             except Exception:
                 log.exception("Auto backup failed")
@@ -264,11 +269,18 @@ async def backup_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not _is_owner(user.id):
         return
 
+    full = bool(context.args) and context.args[0].lower() == "full"
     status = await msg.reply_text("Creating backup...")
 
     try:
-        await run_backup(context.bot)
-        await status.edit_text("Backup sent to log chat.")
+        result = await run_backup(context.bot, full=True if full else None)
+        if not result.volumes:
+            await status.edit_text("No changes since the last backup.")
+        else:
+            await status.edit_text(
+                f"{result.kind.capitalize()} backup sent to log chat "
+                f"({len(result.changed)} files, {len(result.volumes)} part(s))."
+            )
 
     except Exception as e:
         await status.edit_text(
@@ -299,6 +311,7 @@ async def restore_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     status = await msg.reply_text("Downloading and restoring...")
     zip_path = None
+    plan = None
 
     try:
         tg_file = await doc.get_file()
@@ -308,20 +321,38 @@ async def restore_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         await tg_file.download_to_drive(zip_path)
 
-        _safe_extract_zip(zip_path, DATA_DIR)
+        await status.edit_text("Verifying archive...")
+        _ensure_data_dir()
+        plan = await asyncio.to_thread(stage_restore, zip_path, DATA_DIR)
+
+        restored = len(plan.files)
+        mismatched = plan.mismatched
+        await run_db(_apply_restore, plan)
+        plan = None
 
         await status.edit_text("Restore extracted. Reloading runtime state...")
 
         reload_errors = await _reload_runtime_state(context.application)
 
+        note = ""
+        if mismatched:
+            note = (
+                f"\n\n{len(mismatched)} file(s) differ from the backup manifest "
+                "(restore the base backup first):\n"
+                f"<code>{html.escape(', '.join(mismatched[:10]))}</code>"
+            )
+
         if reload_errors:
             await status.edit_text(
-                "Restore completed with partial reload issues.\n\n"
-                f"<code>{html.escape(', '.join(reload_errors))}</code>",
+                f"Restore completed ({restored} files) with partial reload issues.\n\n"
+                f"<code>{html.escape(', '.join(reload_errors))}</code>" + note,
                 parse_mode="HTML"
             )
         else:
-            await status.edit_text("Restore completed and runtime state reloaded.")
+            await status.edit_text(
+                f"Restore completed ({restored} files) and runtime state reloaded." + note,
+                parse_mode="HTML"
+            )
 
         if LOG_CHAT_ID:
             await context.bot.send_message(
@@ -340,6 +371,8 @@ async def restore_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
     finally:
+        if plan:
+            await asyncio.to_thread(plan.cleanup)
         if zip_path and os.path.exists(zip_path):
             try:
                 os.remove(zip_path)
@@ -4,6 +4,7 @@ import re
 from telegram import Update
 from telegram.ext import ContextTypes,ApplicationHandlerStop
 from utils.config import OWNER_ID
+from utils.commands import COMMANDS
 from database.blacklist_db import (
     is_blacklisted,add_user,remove_user,get_user,list_users,
     is_group_blacklisted,add_group,remove_group,get_group,list_groups
@@ -22,7 +23,6 @@ GROUP_BLACKLIST_TEXT=(
     "To prevent spam, this bot has been disabled in this group.\n"
     "Please contact {owners} to reactivate it."
 )
-_CMD_RE=re.compile(r"^/([A-Za-z0-9_]{1,32})(?:@([A-Za-z0-9_]{5,32}))?(?:\s|$)")
 _USER_RE=re.compile(r"^@?[A-Za-z0-9_]{5,32}$")
 _GROUP_LINK_RE=re.compile(r"^(?:https?://)?t\.me/(?:c/)?([^/?#\s]+)",re.I)
 _OWNER_MENTION_CACHE={}
@@ -35,27 +35,6 @@ def _owner_ids():
 def _is_owner(user_id:int)->bool:
     return int(user_id) in _owner_ids()
 
-def _extract_command(text:str):
-    m=_CMD_RE.match(text or "")
-    if not m:
-        return None,None
-    return m.group(1).lower(),(m.group(2) or "").lower()
-
-def _registered_commands(context):
-    cmds=set()
-    for handlers in context.application.handlers.values():
-        for h in handlers:
-            commands=getattr(h,"commands",None)
-            if commands:
-                cmds.update(str(c).lower() for c in commands)
-    return cmds
-
-async def _is_for_this_bot(context,mention:str)->bool:
-    if not mention:
-        return True
-    me=await context.bot.get_me()
-    return mention==str(me.username or "").lower()
-
 async def _owner_mention(context,owner_id:int):
     if owner_id in _OWNER_MENTION_CACHE:
         return _OWNER_MENTION_CACHE[owner_id]
@@ -208,9 +187,7 @@ async def blacklist_message_gate(update:Update,context:ContextTypes.DEFAULT_TYPE
     chat=update.effective_chat
     if not msg or not user or _is_owner(user.id):
         return
-    text=msg.text or msg.caption or ""
-    cmd,mention=_extract_command(text)
-    is_bot_cmd=cmd and await _is_for_this_bot(context,mention) and cmd in _registered_commands(context)
+    is_bot_cmd=COMMANDS.match(msg.text or msg.caption or "") is not None
     if chat and chat.type in ("group","supergroup") and is_group_blacklisted(chat.id):
         if is_bot_cmd:
             await reply_in_topic(msg,await _group_blacklist_text(context),parse_mode="HTML",disable_web_page_preview=True,reply_to_message_id=msg.message_id)
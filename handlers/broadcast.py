@@ -1,65 +1,100 @@
 import os
 import time
 import uuid
-import sqlite3
 import asyncio
+import logging
 
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes
-from telegram.error import RetryAfter
+from telegram.error import RetryAfter, Forbidden, BadRequest, NetworkError, TimedOut
 from utils.config import OWNER_ID
+from database.db import db_session, run_db
+from database.groups_db import BROADCAST_DB, _db_init
+from database import broadcast_db
+from handlers.collector import forget_targets
+
+log = logging.getLogger(__name__)
+
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+BROADCAST_BURST = max(1, int(os.getenv("BROADCAST_BURST", "5")))
+BROADCAST_WORKERS = max(1, int(os.getenv("BROADCAST_WORKERS", "16")))
+BROADCAST_USER_INTERVAL = float(os.getenv("BROADCAST_USER_INTERVAL", "1"))
+BROADCAST_GROUP_INTERVAL = float(os.getenv("BROADCAST_GROUP_INTERVAL", "3"))
+BROADCAST_MAX_ATTEMPTS = max(1, int(os.getenv("BROADCAST_MAX_ATTEMPTS", "3")))
+BROADCAST_FLUSH_INTERVAL = float(os.getenv("BROADCAST_FLUSH_INTERVAL", "2"))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+
+BROADCAST_MEDIA = ("photo", "animation", "video", "document", "audio", "voice")
+
+_DISABLE_ERRORS = (
+    "bot was blocked",
+    "chat not found",
+    "user is deactivated",
+    "bot was kicked",
+    "bot is not a member",
+    "peer_id_invalid",
+)
+
+# httpx failures that happen before the request is written, so a retry
+# cannot deliver the message twice.
+_UNSENT_ERRORS = ("ConnectError", "ConnectTimeout", "PoolTimeout")
 
-BROADCAST_DB = "data/broadcast.sqlite3"
 BROADCAST_PENDING = {}
-
-
-def _db_init():
-    os.makedirs("data", exist_ok=True)
-    con = sqlite3.connect(BROADCAST_DB)
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS broadcast_users (
-                chat_id INTEGER PRIMARY KEY,
-                enabled INTEGER NOT NULL DEFAULT 1,
-                updated_at REAL NOT NULL
-            )
-        """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS broadcast_groups (
-                chat_id INTEGER PRIMARY KEY,
-                enabled INTEGER NOT NULL DEFAULT 1,
-                updated_at REAL NOT NULL
-            )
-        """)
-        con.commit()
-    finally:
-        con.close()
+_RUNNING: dict[str, asyncio.Task] = {}
+_CHAT_NEXT: dict[int, float] = {}
+
+
+class TokenBucket:
+    """
+    Async token bucket shared by all broadcast senders.
+    pause() empties the bucket for a flood-wait so every sender backs off.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(0.1, float(rate))
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+BROADCAST_BUCKET = TokenBucket(BROADCAST_RATE, BROADCAST_BURST)
 
 
 def _get_user_targets() -> list[int]:
-    _db_init()
-    con = sqlite3.connect(BROADCAST_DB)
-    try:
+    with db_session(BROADCAST_DB) as con:
         rows = con.execute(
             "SELECT chat_id FROM broadcast_users WHERE enabled=1"
         ).fetchall()
         return [int(r[0]) for r in rows if r and r[0] is not None]
-    finally:
-        con.close()
 
 
 def _get_group_targets() -> list[int]:
-    _db_init()
-    con = sqlite3.connect(BROADCAST_DB)
-    try:
+    with db_session(BROADCAST_DB) as con:
         rows = con.execute(
             "SELECT chat_id FROM broadcast_groups WHERE enabled=1"
         ).fetchall()
         return [int(r[0]) for r in rows if r and r[0] is not None]
-    finally:
-        con.close()
 
 
 def _get_targets(mode: str) -> list[int]:
@@ -111,20 +146,27 @@ def _extract_broadcast_text(msg) -> str:
     return raw_text
 
 
+def _media_ref(msg) -> tuple[str, str] | None:
+    if not msg:
+        return None
+    if msg.photo:
+        return "photo", msg.photo[-1].file_id
+    for kind in BROADCAST_MEDIA[1:]:
+        media = getattr(msg, kind, None)
+        if media:
+            return kind, media.file_id
+    return None
+
+
 def _extract_broadcast_payload(msg):
     text = _extract_broadcast_text(msg)
 
-    if msg.photo:
-        return {
-            "kind": "photo",
-            "file_id": msg.photo[-1].file_id,
-            "text": text,
-        }
-
-    if msg.reply_to_message and msg.reply_to_message.photo:
+    ref = _media_ref(msg) or _media_ref(msg.reply_to_message)
+    if ref:
+        kind, file_id = ref
         return {
-            "kind": "photo",
-            "file_id": msg.reply_to_message.photo[-1].file_id,
+            "kind": kind,
+            "file_id": file_id,
             "text": text,
         }
 
@@ -138,13 +180,13 @@ async def _send_payload(bot, chat_id: int, payload: dict):
     kind = payload.get("kind", "text")
     text = payload.get("text", "") or ""
 
-    if kind == "photo":
-        await bot.send_photo(
+    if kind in BROADCAST_MEDIA:
+        await getattr(bot, f"send_{kind}")(
             chat_id=chat_id,
-            photo=payload["file_id"],
             caption=text or None,
             parse_mode="HTML",
             disable_notification=True,
+            **{kind: payload["file_id"]},
         )
         return
 
@@ -157,45 +199,37 @@ async def _send_payload(bot, chat_id: int, payload: dict):
     )
 
 
-async def _edit_preview_message(message, payload: dict, mode: str | None = None, finished: tuple[int, int] | None = None):
+async def _edit_preview_message(message, payload: dict, mode: str | None = None):
     kind = payload.get("kind", "text")
     text = payload.get("text", "") or ""
 
     header = "<b>Broadcast Preview</b>"
     if mode:
         header = "<b>Broadcast started...</b>"
-    if finished:
-        sent, failed = finished
-        header = (
-            "<b>Broadcast finished</b>\n\n"
-            f"<b>Target:</b> {_mode_label(mode)}\n"
-            f"Sent: <b>{sent}</b>\n"
-            f"Failed: <b>{failed}</b>"
-        )
 
-    if kind == "photo":
+    if kind in BROADCAST_MEDIA:
         caption_parts = [header]
-        if mode and not finished:
+        if mode:
             caption_parts.append(f"<b>Target:</b> {_mode_label(mode)}")
         if text:
             caption_parts.append(text)
-        if not mode and not finished:
+        if not mode:
             caption_parts.append("<i>This message has not been sent yet.</i>\n<i>Select target below.</i>")
         caption = "\n\n".join(caption_parts)
 
         await message.edit_caption(
             caption=caption,
             parse_mode="HTML",
-            reply_markup=None if mode or finished else _broadcast_keyboard(payload["bid"]),
+            reply_markup=None if mode else _broadcast_keyboard(payload["bid"]),
         )
         return
 
     text_parts = [header]
-    if mode and not finished:
+    if mode:
         text_parts.append(f"<b>Target:</b> {_mode_label(mode)}")
     if text:
         text_parts.append(text)
-    if not mode and not finished:
+    if not mode:
         text_parts.append("<i>This message has not been sent yet.</i>\n<i>Select target below.</i>")
 
     final_text = "\n\n".join(text_parts)
@@ -203,10 +237,217 @@ async def _edit_preview_message(message, payload: dict, mode: str | None = None,
         final_text,
         parse_mode="HTML",
         disable_web_page_preview=True,
-        reply_markup=None if mode or finished else _broadcast_keyboard(payload["bid"]),
+        reply_markup=None if mode else _broadcast_keyboard(payload["bid"]),
     )
 
 
+def _fmt_eta(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def _progress_text(job: dict, stats: dict, finished: bool = False) -> str:
+    payload = job["payload"]
+    sent, failed, total = stats["sent"], stats["failed"], stats["total"]
+    lines = [
+        "<b>Broadcast finished</b>" if finished else "<b>Broadcast running...</b>",
+        "",
+        f"<b>Target:</b> {_mode_label(job['mode'])}",
+        f"Sent: <b>{sent}</b>",
+        f"Failed: <b>{failed}</b>",
+    ]
+    if not finished:
+        elapsed = max(0.001, time.monotonic() - stats["started"])
+        rate = stats["done_run"] / elapsed
+        left = max(0, total - sent - failed)
+        eta = _fmt_eta(left / rate) if rate > 0 else "-"
+        lines.append(f"Progress: <b>{sent + failed}/{total}</b>")
+        lines.append(f"Rate: <b>{rate:.1f}/s</b> | ETA: <b>{eta}</b>")
+    text = "\n".join(lines)
+    if payload.get("kind") in BROADCAST_MEDIA:
+        return text + (f"\n\n{payload['text']}" if payload.get("text") else "")
+    return text + "\n\n<b>Message:</b>\n" + (payload.get("text", "") or "")
+
+
+async def _edit_progress(bot, job: dict, stats: dict, finished: bool = False):
+    text = _progress_text(job, stats, finished)
+    try:
+        if job["payload"].get("kind") in BROADCAST_MEDIA:
+            await bot.edit_message_caption(
+                chat_id=job["status_chat_id"],
+                message_id=job["status_msg_id"],
+                caption=text,
+                parse_mode="HTML",
+            )
+        else:
+            await bot.edit_message_text(
+                chat_id=job["status_chat_id"],
+                message_id=job["status_msg_id"],
+                text=text,
+                parse_mode="HTML",
+                disable_web_page_preview=True,
+            )
+    except Exception as e:
+        log.debug("Broadcast progress edit skipped | bid=%s err=%r", job["bid"], e)
+
+
+async def _wait_chat_slot(chat_id: int):
+    interval = BROADCAST_GROUP_INTERVAL if chat_id < 0 else BROADCAST_USER_INTERVAL
+    now = time.monotonic()
+    ready = _CHAT_NEXT.get(chat_id, 0.0)
+    _CHAT_NEXT[chat_id] = max(now, ready) + interval
+    if ready > now:
+        await asyncio.sleep(ready - now)
+    if len(_CHAT_NEXT) > 10000:
+        for cid in [c for c, t in _CHAT_NEXT.items() if t < now]:
+            _CHAT_NEXT.pop(cid, None)
+
+
+def _never_sent(e: Exception) -> bool:
+    cause = type(e.__cause__).__name__ if e.__cause__ else ""
+    return cause in _UNSENT_ERRORS or any(k in str(e) for k in _UNSENT_ERRORS)
+
+
+async def _deliver(bot, chat_id: int, payload: dict) -> tuple[str, str | None, bool]:
+    """
+    Sends the payload to one target within the global and per-chat limits.
+    Returns (state, error, disable_target).
+    """
+    error = None
+    for attempt in range(1, BROADCAST_MAX_ATTEMPTS + 1):
+        await _wait_chat_slot(chat_id)
+        await BROADCAST_BUCKET.acquire()
+        try:
+            await _send_payload(bot, chat_id, payload)
+            return "sent", None, False
+        except RetryAfter as e:
+            wait_time = int(getattr(e, "retry_after", 1)) + 1
+            log.warning("Broadcast flood wait | chat_id=%s wait=%ss", chat_id, wait_time)
+            BROADCAST_BUCKET.pause(wait_time)
+            error = f"RetryAfter {wait_time}s"
+        except (Forbidden, BadRequest) as e:
+            error = str(e)
+            return "failed", error[:300], any(k in error.lower() for k in _DISABLE_ERRORS)
+        except TimedOut as e:
+            if not _never_sent(e):
+                return "sent", "TimedOut (delivery unconfirmed)", False
+            error = repr(e)
+            await asyncio.sleep(attempt)
+        except NetworkError as e:
+            error = repr(e)
+            if not _never_sent(e):
+                return "failed", error[:300], False
+            await asyncio.sleep(attempt)
+        except Exception as e:
+            return "failed", repr(e)[:300], False
+    return "failed", (error or "")[:300], False
+
+
+async def _run_broadcast(bot, bid: str):
+    job = await run_db(broadcast_db.get_job, bid)
+    if not job or job["status"] != "running":
+        return
+    targets = await run_db(broadcast_db.pending_targets, bid)
+    counts = await run_db(broadcast_db.job_counts, bid)
+    stats = {
+        "sent": counts["sent"],
+        "failed": counts["failed"],
+        "total": sum(counts.values()),
+        "done_run": 0,
+        "started": time.monotonic(),
+    }
+    queue: asyncio.Queue = asyncio.Queue()
+    for cid in targets:
+        queue.put_nowait(cid)
+    results: list[tuple[int, str, str | None]] = []
+    disabled: list[int] = []
+
+    async def sender():
+        while True:
+            try:
+                cid = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            state, error, disable = await _deliver(bot, cid, job["payload"])
+            stats[state] += 1
+            stats["done_run"] += 1
+            results.append((cid, state, error))
+            if disable:
+                disabled.append(cid)
+
+    async def flush():
+        batch, results[:] = list(results), []
+        off, disabled[:] = list(disabled), []
+        try:
+            await run_db(broadcast_db.record_results, bid, batch)
+            await run_db(broadcast_db.disable_targets, off)
+            forget_targets(off)
+        except Exception as e:
+            results[:0] = batch
+            disabled[:0] = off
+            log.warning("Failed to persist broadcast progress | bid=%s err=%r", bid, e)
+
+    async def reporter():
+        last_edit = 0.0
+        while True:
+            await asyncio.sleep(BROADCAST_FLUSH_INTERVAL)
+            await flush()
+            if time.monotonic() - last_edit >= BROADCAST_PROGRESS_INTERVAL:
+                last_edit = time.monotonic()
+                await _edit_progress(bot, job, stats)
+
+    log.info("Broadcast running | bid=%s mode=%s pending=%s total=%s", bid, job["mode"], len(targets), stats["total"])
+    await _edit_progress(bot, job, stats)
+    report_task = asyncio.create_task(reporter())
+    try:
+        await asyncio.gather(*(sender() for _ in range(min(BROADCAST_WORKERS, max(1, len(targets))))))
+    finally:
+        report_task.cancel()
+        try:
+            await report_task
+        except asyncio.CancelledError:
+            pass
+        await flush()
+    await run_db(broadcast_db.finish_job, bid, "done")
+    log.info("Broadcast finished | bid=%s sent=%s failed=%s", bid, stats["sent"], stats["failed"])
+    await _edit_progress(bot, job, stats, finished=True)
+
+
+def _start_broadcast(bot, bid: str):
+    if bid in _RUNNING:
+        return
+    task = asyncio.create_task(_run_broadcast(bot, bid))
+    _RUNNING[bid] = task
+
+    def _done(t: asyncio.Task):
+        _RUNNING.pop(bid, None)
+        if not t.cancelled() and t.exception():
+            log.error("Broadcast crashed | bid=%s err=%r", bid, t.exception())
+
+    task.add_done_callback(_done)
+
+
+async def resume_broadcasts(app) -> int:
+    bids = await run_db(broadcast_db.running_jobs)
+    for bid in bids:
+        log.info("Resuming broadcast | bid=%s", bid)
+        _start_broadcast(app.bot, bid)
+    return len(bids)
+
+
+async def shutdown_broadcasts():
+    tasks = list(_RUNNING.values())
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+        log.info("Broadcasts paused for shutdown: %s", len(tasks))
+
+
 async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     msg = update.message
@@ -234,9 +475,10 @@ async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "ts": time.time(),
     }
 
-    if payload["kind"] == "photo":
-        await msg.reply_photo(
-            photo=payload["file_id"],
+    if payload["kind"] in BROADCAST_MEDIA:
+        kind = payload["kind"]
+        await getattr(msg, f"reply_{kind}")(
+            **{kind: payload["file_id"]},
             caption=(
                 "<b>Broadcast Preview</b>\n\n"
                 + (f"{text}\n\n" if text else "")
@@ -328,9 +570,9 @@ async def broadcast_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     payload = data["payload"]
     targets = _get_targets(mode)
+    BROADCAST_PENDING.pop(bid, None)
 
     if not targets:
-        BROADCAST_PENDING.pop(bid, None)
         await q.answer()
         try:
             return await q.message.edit_text(
@@ -348,59 +590,16 @@ async def broadcast_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     await q.answer(f"Starting broadcast to {_mode_label(mode)}...")
     await _edit_preview_message(q.message, payload, mode=mode)
-
-    sent = 0
-    failed = 0
-
-    for cid in targets:
-        try:
-            await _send_payload(context.bot, cid, payload)
-            sent += 1
-            await asyncio.sleep(0.7)
-
-        except RetryAfter as e:
-            await asyncio.sleep(float(getattr(e, "retry_after", 1)) + 1)
-            try:
-                await _send_payload(context.bot, cid, payload)
-                sent += 1
-            except Exception:
-                failed += 1
-
-        except Exception:
-            failed += 1
-            await asyncio.sleep(0.7)
-
-    BROADCAST_PENDING.pop(bid, None)
-
-    try:
-        if payload.get("kind") == "photo":
-            text = payload.get("text", "") or ""
-            caption = (
-                "<b>Broadcast finished</b>\n\n"
-                f"<b>Target:</b> {_mode_label(mode)}\n"
-                f"Sent: <b>{sent}</b>\n"
-                f"Failed: <b>{failed}</b>"
-            )
-            if text:
-                caption += f"\n\n{text}"
-
-            await q.message.edit_caption(
-                caption=caption,
-                parse_mode="HTML",
-            )
-        else:
-            await q.message.edit_text(
-                "<b>Broadcast finished</b>\n\n"
-                f"<b>Target:</b> {_mode_label(mode)}\n"
-                f"Sent: <b>{sent}</b>\n"
-                f"Failed: <b>{failed}</b>\n\n"
-                "<b>Message:</b>\n"
-                f"{payload.get('text', '')}",
-                parse_mode="HTML",
-                disable_web_page_preview=True,
-            )
-    except Exception:
-        pass
+    await run_db(
+        broadcast_db.create_job,
+        bid,
+        mode,
+        payload,
+        q.message.chat_id,
+        q.message.message_id,
+        targets,
+    )
+    _start_broadcast(context.bot, bid)
 
 
 try:
@@ -1,4 +1,4 @@
-import re,os,uuid,base64,shutil,asyncio,random,html,logging,mimetypes,subprocess,aiohttp
+import re,os,json,uuid,base64,shutil,asyncio,random,html,logging,mimetypes,subprocess
 from typing import Optional
 from bs4 import BeautifulSoup
 from telegram import Update
@@ -6,9 +6,10 @@ from telegram.constants import ChatAction
 from telegram.ext import ContextTypes
 from handlers.join import require_join_or_block
 from handlers.gsearch import google_search
-from utils.text import split_message,sanitize_ai_output
+from utils.text import sanitize_ai_output
+from utils.ai_stream import StreamingReply,iter_sse
 from .caca_prompt import PERSONAS
-from utils.http import get_http_session
+from utils.providers import provider,ProviderError
 from database import caca_db
 from utils import caca_memory
 from utils.config import CLOUDFLARE_ACCOUNT_ID,CLOUDFLARE_AUTH_TOKEN,CLOUDFLARE_MODEL
@@ -308,6 +309,20 @@ def _is_cf_quota_error(message:str)->bool:
         or "rate limit" in text
     )
 
+def _cf_error_text(status:int,body:str)->str:
+    try:
+        data=json.loads(body)
+    except Exception:
+        return (body or "").strip()[:500] or f"Cloudflare HTTP {status}"
+    return _cf_extract_error(data,status)
+
+CLOUDFLARE=provider(
+    "cloudflare",
+    is_quota=lambda status,body:status==429 or _is_cf_quota_error(body),
+    describe=_cf_error_text,
+    timeout=CLOUDFLARE_TIMEOUT,
+)
+
 def _coerce_cf_content(value):
     if isinstance(value,str):
         return value
@@ -336,52 +351,89 @@ def _extract_cf_raw(data:dict):
         return _coerce_cf_content(msg.get("content"))
     return ""
 
-async def _cloudflare_chat(messages:list[dict]):
-    creds=_cf_credentials()
-    if not creds:
-        raise RuntimeError("CLOUDFLARE credentials belum diset")
-    session=await get_http_session()
-    errors=[]
-    last_quota_error=None
-    payload={
+def _cf_payload(messages:list[dict])->dict:
+    return {
         "messages":messages,
         "temperature":0.9,
         "max_completion_tokens":1024,
         "chat_template_kwargs":{"thinking":False,"enable_thinking":False,"clear_thinking":True},
     }
+
+def _cf_stream_delta(event:dict)->str:
+    raw=event.get("response")
+    if raw:
+        return _coerce_cf_content(raw)
+    choices=event.get("choices")
+    if isinstance(choices,list) and choices:
+        delta=(choices[0] or {}).get("delta") or {}
+        return _coerce_cf_content(delta.get("content"))
+    return ""
+
+async def _cloudflare_chat_stream(messages:list[dict],on_text=None):
+    creds=_cf_credentials()
+    if not creds:
+        raise RuntimeError("CLOUDFLARE credentials belum diset")
+    errors=[]
+    quota_hits=0
+    payload={**_cf_payload(messages),"stream":True}
     for idx,cred in enumerate(creds,start=1):
         account_id=cred["account_id"]
         token=cred["token"]
+        parts=[]
         try:
-            async with session.post(
+            async with CLOUDFLARE.request(
+                "POST",
                 f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run/{CLOUDFLARE_MODEL}",
+                key=account_id,
                 headers={"Authorization":f"Bearer {token}"},
                 json=payload,
-                timeout=aiohttp.ClientTimeout(total=CLOUDFLARE_TIMEOUT),
             ) as r:
-                data=await r.json(content_type=None)
-                if r.status>=400:
-                    raise RuntimeError(_cf_extract_error(data,r.status))
-                if isinstance(data,dict) and data.get("success") is False:
-                    raise RuntimeError(_cf_extract_error(data,r.status))
-                raw=_extract_cf_raw(data)
-                if not raw:
-                    raise RuntimeError(f"Unexpected Cloudflare response: {data}")
-                logger.info("Cloudflare success | key_index=%s account_id=%s",idx,account_id)
-                return raw
+                if "text/event-stream" not in (r.headers.get("Content-Type") or ""):
+                    data=await r.json(content_type=None)
+                    if isinstance(data,dict) and data.get("success") is False:
+                        err=_cf_extract_error(data,r.status)
+                        if _is_cf_quota_error(err):
+                            CLOUDFLARE.breaker(account_id).failure(err,quota=True)
+                        raise ProviderError("cloudflare",err,status=r.status,quota=_is_cf_quota_error(err))
+                    raw=_extract_cf_raw(data) if isinstance(data,dict) else ""
+                    if not raw:
+                        raise RuntimeError(f"Unexpected Cloudflare response: {data}")
+                    return raw
+                async for data in iter_sse(r):
+                    if data=="[DONE]":
+                        break
+                    try:
+                        event=json.loads(data)
+                    except Exception:
+                        continue
+                    delta=_cf_stream_delta(event) if isinstance(event,dict) else ""
+                    if delta:
+                        parts.append(delta)
+                        if on_text:
+                            await on_text("".join(parts))
+            raw="".join(parts)
+            if not raw:
+                raise RuntimeError("Cloudflare stream returned no text")
+            logger.info("Cloudflare stream success | key_index=%s account_id=%s",idx,account_id)
+            return raw
         except Exception as e:
+            if parts:
+                raise
             err=str(e)
             errors.append(f"key#{idx}: {err}")
-            if _is_cf_quota_error(err):
-                last_quota_error=err
+            if getattr(e,"quota",False):
+                quota_hits+=1
                 logger.warning("Cloudflare quota hit | key_index=%s account_id=%s err=%s",idx,account_id,err)
                 continue
-            logger.warning("Cloudflare request failed | key_index=%s account_id=%s err=%s",idx,account_id,err)
+            logger.warning("Cloudflare stream failed | key_index=%s account_id=%s err=%s",idx,account_id,err)
             continue
-    if last_quota_error and all(_is_cf_quota_error(x.split(": ",1)[-1]) for x in errors):
+    if errors and quota_hits==len(errors):
         raise RuntimeError("Semua API key Cloudflare terkena limit harian.")
     raise RuntimeError("Cloudflare failed: "+" | ".join(errors[-3:]))
 
+def _render_caca(raw:str)->str:
+    return _normalize_caca_output(sanitize_ai_output(_strip_thinking_leak(raw)))
+
 async def meta_query(update:Update,context:ContextTypes.DEFAULT_TYPE):
     if not await require_join_or_block(update,context):
         return
@@ -446,20 +498,27 @@ async def meta_query(update:Update,context:ContextTypes.DEFAULT_TYPE):
         system_prompt=PERSONAS.get(mode,PERSONAS["default"])
         user_prompt=f"{search_context}\n\n{prompt}" if search_context else prompt
         messages=[{"role":"system","content":system_prompt}]+history+[{"role":"user","content":_build_user_content(user_prompt,image_data_url)}]
-        raw=await _cloudflare_chat(messages)
-        cleaned=_normalize_caca_output(sanitize_ai_output(_strip_thinking_leak(raw)))
-        history+=[
-            {"role":"user","content":_memory_prompt(prompt,bool(image_data_url))},
-            {"role":"assistant","content":cleaned},
-        ]
-        await caca_memory.set_history(user_id,history)
+        reply=StreamingReply(
+            context.bot,
+            msg.chat_id,
+            lambda text:_reply_thread(context.bot,msg,text,parse_mode="HTML"),
+            _render_caca,
+            on_start=lambda:_stop_typing_task(stop,typing),
+        )
+        raw=await _cloudflare_chat_stream(messages,on_text=reply.update)
+        cleaned=_render_caca(raw)
+        await caca_memory.append_messages(
+            user_id,
+            [
+                {"role":"user","content":_memory_prompt(prompt,bool(image_data_url))},
+                {"role":"assistant","content":cleaned},
+            ],
+            fresh=fresh_session,
+        )
         await _stop_typing_task(stop,typing)
-        chunks=split_message(cleaned,4000)
-        sent=None
-        for chunk in chunks:
-            sent=await _reply_thread(context.bot,msg,chunk,parse_mode="HTML")
+        sent=await reply.finish(raw)
         if sent:
-            await caca_memory.set_last_message_id(user_id,sent.message_id)
+            await caca_memory.set_last_message_id(user_id,sent.message_id,sent.chat_id)
     except Exception as e:
         await _stop_typing_task(stop,typing)
         await _reply_thread(context.bot,msg,f"{em} Error: {html.escape(str(e))}",parse_mode="HTML")
@@ -2,6 +2,7 @@ import html
 from telegram import Update
 from telegram.ext import ContextTypes
 from utils.config import OWNER_ID
+from utils.chat_members import get_member
 from database import caca_db
 
 
@@ -15,7 +16,7 @@ async def _is_admin_or_owner(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if chat.type not in ("group", "supergroup"):
         return False
     try:
-        member = await context.bot.get_chat_member(chat.id, user.id)
+        member = await get_member(context.bot, chat.id, user.id)
         return member.status in ("administrator", "creator")
     except Exception:
         return False
@@ -1,107 +1,74 @@
-import os
 import time
-import sqlite3
 from telegram import Update
 from telegram.ext import ContextTypes
+from database import write_behind
+from database.db import register_schema, ensure_schema
+from database.groups_db import BROADCAST_DB
 
-BROADCAST_DB = "data/broadcast.sqlite3"
+
+def _user_cache_schema(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_user_cache (
+            username TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+
+
+register_schema(BROADCAST_DB, _user_cache_schema)
 
 
 def _db_init():
-    os.makedirs("data", exist_ok=True)
-    con = sqlite3.connect(BROADCAST_DB)
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS broadcast_users (
-                chat_id INTEGER PRIMARY KEY,
-                enabled INTEGER NOT NULL DEFAULT 1,
-                updated_at REAL NOT NULL
-            )
-        """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS broadcast_groups (
-                chat_id INTEGER PRIMARY KEY,
-                enabled INTEGER NOT NULL DEFAULT 1,
-                updated_at REAL NOT NULL
-            )
-        """)
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS broadcast_user_cache (
-                username TEXT PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                updated_at REAL NOT NULL
-            )
-        """)
-        con.commit()
-    finally:
-        con.close()
-
-
-def _db():
-    _db_init()
-    return sqlite3.connect(BROADCAST_DB)
+    ensure_schema(BROADCAST_DB)
+
+
+_USERS = write_behind.buffer("broadcast_users", BROADCAST_DB, """
+    INSERT INTO broadcast_users (chat_id, enabled, updated_at)
+    VALUES (?, 1, ?)
+    ON CONFLICT(chat_id) DO UPDATE SET
+      enabled=1,
+      updated_at=excluded.updated_at
+""")
+_GROUPS = write_behind.buffer("broadcast_groups", BROADCAST_DB, """
+    INSERT INTO broadcast_groups (chat_id, enabled, updated_at)
+    VALUES (?, 1, ?)
+    ON CONFLICT(chat_id) DO UPDATE SET
+      enabled=1,
+      updated_at=excluded.updated_at
+""")
+_USERNAMES = write_behind.buffer("broadcast_user_cache", BROADCAST_DB, """
+    INSERT INTO broadcast_user_cache (username, user_id, updated_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT(username) DO UPDATE SET
+      user_id=excluded.user_id,
+      updated_at=excluded.updated_at
+""")
 
 
 def _add_user(chat_id: int):
-    con = _db()
-    try:
-        now = time.time()
-        con.execute("""
-            INSERT INTO broadcast_users (chat_id, enabled, updated_at)
-            VALUES (?, 1, ?)
-            ON CONFLICT(chat_id) DO UPDATE SET
-              enabled=1,
-              updated_at=excluded.updated_at
-        """, (int(chat_id), float(now)))
-        con.commit()
-    finally:
-        con.close()
+    _USERS.put(int(chat_id), 1, (int(chat_id), float(time.time())))
 
 
 def _add_group(chat_id: int):
-    con = _db()
-    try:
-        now = time.time()
-        con.execute("""
-            INSERT INTO broadcast_groups (chat_id, enabled, updated_at)
-            VALUES (?, 1, ?)
-            ON CONFLICT(chat_id) DO UPDATE SET
-              enabled=1,
-              updated_at=excluded.updated_at
-        """, (int(chat_id), float(now)))
-        con.commit()
-    finally:
-        con.close()
+    _GROUPS.put(int(chat_id), 1, (int(chat_id), float(time.time())))
+
+
+def forget_targets(chat_ids):
+    """
+    Drops the flush memo (and any pending enable) for chats a broadcast just
+    disabled, so their next message re-enables them.
+    """
+    for cid in chat_ids:
+        _USERS.discard(int(cid))
+        _GROUPS.discard(int(cid))
 
 
 def cache_username(user_id: int, username: str | None):
     u = (username or "").strip().lstrip("@").lower()
     if not u:
         return
-    con = _db()
-    try:
-        now = float(time.time())
-        con.execute("BEGIN")
-        con.execute(
-            """
-            INSERT INTO broadcast_user_cache (username, user_id, updated_at)
-            VALUES (?, ?, ?)
-            ON CONFLICT(username) DO UPDATE SET
-              user_id=excluded.user_id,
-              updated_at=excluded.updated_at
-            """,
-            (u, int(user_id), now),
-        )
-        con.execute("COMMIT")
-    except Exception:
-        try:
-            con.execute("ROLLBACK")
-        except Exception:
-            pass
-    finally:
-        con.close()
+    _USERNAMES.put(u, int(user_id), (u, int(user_id), float(time.time())))
 
 
 async def collect_chat(update: Update, context: ContextTypes.DEFAULT_TYPE):
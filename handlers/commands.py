@@ -1,5 +1,7 @@
 from telegram.ext import CommandHandler
 
+from utils.commands import build_command_registry
+
 from handlers.anime import anime_cmd
 from handlers.backup import backup_cmd, restore_cmd, autobackup_cmd
 from handlers.blacklist import blacklist_cmd
@@ -158,4 +160,5 @@ def register_commands(app):
         app.add_handler(
             CommandHandler(name, handler, block=blocking),
             group=-1
-        )
\ No newline at end of file
+        )
+    build_command_registry(app)
\ No newline at end of file
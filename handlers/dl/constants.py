@@ -5,6 +5,8 @@ COOKIES_PATH = os.path.join(BASE_DIR, "..", "..", "data", "cookies.txt")
 
 TMP_DIR = "downloads"
 AUTO_DL_DB = "data/auto_dl.sqlite3"
+DL_FILE_CACHE_DB = "data/dl_file_cache.sqlite3"
+DL_QUEUE_DB = "data/dl_queue.sqlite3"
 
 MAX_TG_SIZE = 1999 * 1024 * 1024
 
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .constants import COOKIES_PATH
+from .utils import canonical_url
+
+try:
+    import yt_dlp
+    from .ytdlp_worker import worker_init,extract_sync,select_sync
+except Exception:
+    yt_dlp=None
+
+log=logging.getLogger(__name__)
+YTDLP_ENGINE=os.getenv("YTDLP_ENGINE","pool").strip().lower()
+YTDLP_POOL_WORKERS=max(1,int(os.getenv("YTDLP_POOL_WORKERS","2")))
+YTDLP_EXTRACT_TIMEOUT=int(os.getenv("YTDLP_EXTRACT_TIMEOUT",os.getenv("YTDLP_PROBE_TIMEOUT","90")))
+YTDLP_INFO_TTL=int(os.getenv("YTDLP_INFO_TTL","600"))
+YTDLP_INFO_MAX=int(os.getenv("YTDLP_INFO_MAX","64"))
+YTDLP_DENO_PATH=os.getenv("YTDLP_DENO_PATH","deno:/root/.deno/bin/deno")
+_POOL:ProcessPoolExecutor|None=None
+_INFO:dict[str,tuple[float,dict]]={}
+_PENDING:dict[str,asyncio.Future]={}
+_STATS={"extractions":0,"reused":0,"selections":0,"failures":0,"pool_restarts":0}
+
+def _base_opts()->dict:
+    opts={"quiet":True,"no_warnings":True,"noplaylist":True,"skip_download":True}
+    name,_,path=YTDLP_DENO_PATH.partition(":")
+    if name:
+        opts["js_runtimes"]={name:{"path":path} if path else {}}
+    if COOKIES_PATH and os.path.exists(COOKIES_PATH):
+        opts["cookiefile"]=COOKIES_PATH
+    return opts
+
+def is_available()->bool:
+    return yt_dlp is not None and YTDLP_ENGINE=="pool"
+
+def _get_pool()->ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL=ProcessPoolExecutor(max_workers=YTDLP_POOL_WORKERS,mp_context=multiprocessing.get_context("spawn"),initializer=worker_init)
+    return _POOL
+
+def _drop_pool(reason:str):
+    global _POOL
+    pool,_POOL=_POOL,None
+    if pool is None:
+        return
+    _STATS["pool_restarts"]+=1
+    log.warning("yt-dlp worker pool recycled | reason=%s",reason)
+    for proc in list((getattr(pool,"_processes",None) or {}).values()):
+        try:
+            proc.terminate()
+        except Exception as e:
+            log.debug("Failed to terminate yt-dlp worker | err=%r",e)
+    pool.shutdown(wait=False,cancel_futures=True)
+
+async def _run(fn,*args):
+    loop=asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_get_pool(),fn,*args),timeout=YTDLP_EXTRACT_TIMEOUT)
+    except asyncio.TimeoutError:
+        _drop_pool(f"timeout after {YTDLP_EXTRACT_TIMEOUT}s")
+        raise
+    except BrokenProcessPool:
+        _drop_pool("broken pool")
+        raise
+
+def cached_info(url:str)->dict|None:
+    key=canonical_url(url)
+    hit=_INFO.get(key)
+    if not hit:
+        return None
+    ts,info=hit
+    if time.time()-ts>YTDLP_INFO_TTL:
+        _INFO.pop(key,None)
+        return None
+    return info
+
+def forget(url:str):
+    _INFO.pop(canonical_url(url),None)
+
+def _remember(key:str,info:dict):
+    _INFO[key]=(time.time(),info)
+    if len(_INFO)>YTDLP_INFO_MAX:
+        for old in sorted(_INFO,key=lambda k:_INFO[k][0])[:len(_INFO)-YTDLP_INFO_MAX]:
+            _INFO.pop(old,None)
+
+async def _extract(key:str,url:str)->dict|None:
+    started=time.monotonic()
+    try:
+        info=await _run(extract_sync,url,_base_opts())
+    except Exception as e:
+        _STATS["failures"]+=1
+        log.warning("yt-dlp engine extraction failed | url=%s err=%r",url,e)
+        return None
+    if not isinstance(info,dict) or not info:
+        return None
+    _STATS["extractions"]+=1
+    _remember(key,info)
+    log.info("yt-dlp engine extracted | url=%s formats=%s took=%.2fs",url,len(info.get("formats") or []),time.monotonic()-started)
+    return info
+
+async def extract_info(url:str)->dict|None:
+    if not is_available():
+        return None
+    info=cached_info(url)
+    if info is not None:
+        _STATS["reused"]+=1
+        return info
+    key=canonical_url(url)
+    fut=_PENDING.get(key)
+    if fut is None:
+        fut=asyncio.ensure_future(_extract(key,url))
+        _PENDING[key]=fut
+        fut.add_done_callback(lambda _:_PENDING.pop(key,None))
+    else:
+        _STATS["reused"]+=1
+    return await asyncio.shield(fut)
+
+async def select_info(url:str,fmt:str)->dict|None:
+    info=await extract_info(url)
+    if not info:
+        return None
+    try:
+        picked=await _run(select_sync,info,fmt,_base_opts())
+    except Exception as e:
+        _STATS["failures"]+=1
+        log.warning("yt-dlp engine format selection failed | url=%s fmt=%s err=%r",url,fmt,e)
+        return None
+    _STATS["selections"]+=1
+    return picked if isinstance(picked,dict) else None
+
+def write_info_json(url:str,path:str)->bool:
+    info=cached_info(url)
+    if not info:
+        return False
+    try:
+        with open(path,"w",encoding="utf-8") as f:
+            json.dump(info,f)
+        return True
+    except Exception as e:
+        log.warning("Failed to write yt-dlp info json | url=%s path=%s err=%r",url,path,e)
+        return False
+
+async def warmup_extractor():
+    if not is_available():
+        log.info("yt-dlp engine disabled, using CLI probes")
+        return
+    loop=asyncio.get_running_loop()
+    pool=_get_pool()
+    await asyncio.gather(*(loop.run_in_executor(pool,time.sleep,0) for _ in range(YTDLP_POOL_WORKERS)))
+    log.info("✓ yt-dlp engine ready: %s workers",YTDLP_POOL_WORKERS)
+
+def shutdown_extractor():
+    global _POOL
+    pool,_POOL=_POOL,None
+    if pool is not None:
+        pool.shutdown(wait=False,cancel_futures=True)
+
+def get_stats()->dict:
+    return {**_STATS,"cached":len(_INFO),"workers":YTDLP_POOL_WORKERS if _POOL is not None else 0}
@@ -0,0 +1,130 @@
+import os
+import time
+import json
+import logging
+from database.db import db_session,register_schema,run_db
+from .constants import DL_FILE_CACHE_DB
+from .utils import canonical_url
+
+log=logging.getLogger(__name__)
+DL_FILE_CACHE_ENABLED=os.getenv("DL_FILE_CACHE","1").strip().lower() not in ("0","false","off","no")
+DL_FILE_CACHE_TTL=int(os.getenv("DL_FILE_CACHE_TTL",str(7*24*60*60)))
+DL_FILE_CACHE_MAX=int(os.getenv("DL_FILE_CACHE_MAX","5000"))
+_STATS={"hits":0,"misses":0,"stores":0,"evictions":0,"invalidations":0}
+
+def _file_cache_schema(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS dl_file_cache (
+            cache_key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            fmt_key TEXT NOT NULL,
+            format_id TEXT NOT NULL DEFAULT '',
+            payload_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_hit REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_dl_file_cache_last_hit ON dl_file_cache(last_hit)")
+
+register_schema(DL_FILE_CACHE_DB,_file_cache_schema)
+
+def make_key(url:str,fmt_key:str,format_id:str|None=None)->str:
+    return f"{canonical_url(url)}|{str(fmt_key or '').lower()}|{str(format_id or '')}"
+
+def _db_lookup(key:str):
+    now=time.time()
+    with db_session(DL_FILE_CACHE_DB) as con:
+        row=con.execute("SELECT payload_json,created_at FROM dl_file_cache WHERE cache_key=?",(key,)).fetchone()
+        if not row:
+            return None
+        if DL_FILE_CACHE_TTL>0 and now-float(row[1] or 0)>DL_FILE_CACHE_TTL:
+            con.execute("DELETE FROM dl_file_cache WHERE cache_key=?",(key,))
+            con.commit()
+            _STATS["evictions"]+=1
+            return None
+        con.execute("UPDATE dl_file_cache SET last_hit=?,hits=hits+1 WHERE cache_key=?",(now,key))
+        con.commit()
+        try:
+            payload=json.loads(row[0] or "{}")
+        except Exception:
+            return None
+        return payload if isinstance(payload,dict) else None
+
+def _db_store(key:str,url:str,fmt_key:str,format_id:str|None,payload:dict):
+    now=time.time()
+    with db_session(DL_FILE_CACHE_DB) as con:
+        try:
+            con.execute("BEGIN")
+            con.execute("""
+                INSERT INTO dl_file_cache (cache_key,url,fmt_key,format_id,payload_json,created_at,last_hit,hits)
+                VALUES (?,?,?,?,?,?,?,0)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                  payload_json=excluded.payload_json,
+                  created_at=excluded.created_at,
+                  last_hit=excluded.last_hit
+            """,(key,str(url or ""),str(fmt_key or ""),str(format_id or ""),json.dumps(payload,ensure_ascii=False),now,now))
+            evicted=0
+            if DL_FILE_CACHE_TTL>0:
+                evicted+=con.execute("DELETE FROM dl_file_cache WHERE created_at<?",(now-DL_FILE_CACHE_TTL,)).rowcount
+            if DL_FILE_CACHE_MAX>0:
+                evicted+=con.execute("""
+                    DELETE FROM dl_file_cache WHERE cache_key IN (
+                        SELECT cache_key FROM dl_file_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?
+                    )
+                """,(DL_FILE_CACHE_MAX,)).rowcount
+            con.execute("COMMIT")
+            return max(evicted,0)
+        except Exception:
+            try:
+                con.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+
+def _db_forget(key:str):
+    with db_session(DL_FILE_CACHE_DB) as con:
+        con.execute("DELETE FROM dl_file_cache WHERE cache_key=?",(key,))
+        con.commit()
+
+def _hit_ratio()->float:
+    total=_STATS["hits"]+_STATS["misses"]
+    return (_STATS["hits"]/total) if total else 0.0
+
+def get_stats()->dict:
+    return {**_STATS,"hit_ratio":round(_hit_ratio(),4)}
+
+async def lookup(key:str)->dict|None:
+    if not DL_FILE_CACHE_ENABLED:
+        return None
+    try:
+        payload=await run_db(_db_lookup,key)
+    except Exception as e:
+        log.warning("File cache lookup failed | key=%s err=%r",key,e)
+        return None
+    if payload and payload.get("kind"):
+        _STATS["hits"]+=1
+        log.info("File cache hit | key=%s kind=%s hit_ratio=%.2f",key,payload.get("kind"),_hit_ratio())
+        return payload
+    _STATS["misses"]+=1
+    log.debug("File cache miss | key=%s hit_ratio=%.2f",key,_hit_ratio())
+    return None
+
+async def store(key:str,url:str,fmt_key:str,format_id:str|None,payload:dict|None):
+    if not DL_FILE_CACHE_ENABLED or not payload or not payload.get("kind"):
+        return
+    try:
+        evicted=await run_db(_db_store,key,url,fmt_key,format_id,payload)
+    except Exception as e:
+        log.warning("File cache store failed | key=%s err=%r",key,e)
+        return
+    _STATS["stores"]+=1
+    _STATS["evictions"]+=evicted
+    log.info("File cache stored | key=%s kind=%s evicted=%s",key,payload.get("kind"),evicted)
+
+async def forget(key:str):
+    try:
+        await run_db(_db_forget,key)
+        _STATS["invalidations"]+=1
+    except Exception as e:
+        log.warning("File cache forget failed | key=%s err=%r",key,e)
\ No newline at end of file
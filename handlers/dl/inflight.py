@@ -0,0 +1,63 @@
+import os
+import asyncio
+import logging
+
+log=logging.getLogger(__name__)
+DL_COALESCE_ENABLED=os.getenv("DL_COALESCE","1").strip().lower() not in ("0","false","off","no")
+DL_COALESCE_TICK=float(os.getenv("DL_COALESCE_TICK","15"))
+DL_COALESCE_MAX_WAIT=float(os.getenv("DL_COALESCE_MAX_WAIT","600"))
+PROCEED="proceed"
+_INFLIGHT:dict[str,asyncio.Future]=globals().get("_INFLIGHT") or {}
+_STATS=globals().get("_STATS") or {"leaders":0,"followers":0,"shared":0,"timeouts":0}
+
+def claim(key:str)->bool:
+    if not DL_COALESCE_ENABLED:
+        return True
+    fut=_INFLIGHT.get(key)
+    if fut is not None and not fut.done():
+        return False
+    _INFLIGHT[key]=asyncio.get_running_loop().create_future()
+    _STATS["leaders"]+=1
+    return True
+
+def resolve(key:str,payload:dict|str|None):
+    """
+    payload is the sendable media to share, PROCEED when the leader finished
+    without one (waiters then download in parallel), or None after a failure
+    (one waiter takes over as leader).
+    """
+    fut=_INFLIGHT.pop(key,None)
+    if fut is not None and not fut.done():
+        fut.set_result(payload)
+
+async def wait(key:str,on_tick=None)->dict|str|None:
+    fut=_INFLIGHT.get(key)
+    if fut is None:
+        return None
+    _STATS["followers"]+=1
+    loop=asyncio.get_running_loop()
+    started=loop.time()
+    log.info("Joined in-flight download | key=%s",key)
+    while True:
+        remaining=DL_COALESCE_MAX_WAIT-(loop.time()-started)
+        if remaining<=0:
+            _STATS["timeouts"]+=1
+            log.warning("In-flight wait timed out, downloading independently | key=%s waited=%.1fs",key,loop.time()-started)
+            return PROCEED
+        try:
+            payload=await asyncio.wait_for(asyncio.shield(fut),timeout=min(DL_COALESCE_TICK,remaining))
+            break
+        except asyncio.TimeoutError:
+            if on_tick:
+                try:
+                    await on_tick(loop.time()-started)
+                except Exception as e:
+                    log.debug("In-flight wait tick failed | key=%s err=%r",key,e)
+    shared=isinstance(payload,dict)
+    if shared:
+        _STATS["shared"]+=1
+    log.info("In-flight download finished for waiter | key=%s shared=%s waited=%.1fs",key,shared,loop.time()-started)
+    return payload
+
+def get_stats()->dict:
+    return {**_STATS,"inflight":len(_INFLIGHT)}
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 import time
 import json
+import random
 import asyncio
 import logging
 from utils.config import BOT_TOKEN
@@ -10,10 +11,13 @@ from .utils import progress_bar
 log=logging.getLogger(__name__)
 try:
     from telethon import TelegramClient
-    from telethon.tl.types import DocumentAttributeVideo
+    from telethon.tl.types import DocumentAttributeVideo,InputFileBig
+    from telethon.tl.functions.upload import SaveBigFilePartRequest
 except Exception as e:
     TelegramClient=None
     DocumentAttributeVideo=None
+    InputFileBig=None
+    SaveBigFilePartRequest=None
     log.warning("Telethon import failed | err=%r",e)
 try:
     from FastTelethonhelper.FastTelethon import upload_file as fast_upload_file
@@ -34,6 +38,9 @@ _PROGRESS_SMALL_INTERVAL=float(os.getenv("MTPROTO_PROGRESS_SMALL_INTERVAL","5.0"
 _PROGRESS_LARGE_INTERVAL=float(os.getenv("MTPROTO_PROGRESS_LARGE_INTERVAL","10.0"))
 _PROGRESS_STEP=float(os.getenv("MTPROTO_PROGRESS_STEP","5"))
 _PART_SIZE_KB=max(32,min(int(os.getenv("MTPROTO_PART_SIZE_KB","512")),512))
+_STREAM_PART_SIZE=512*1024
+_STREAM_MIN_BIG_FILE=10*1024*1024
+_STREAM_PARALLEL_PARTS=max(1,int(os.getenv("MTPROTO_STREAM_PARALLEL_PARTS","4")))
 _FAST_UPLOAD_ENABLED=None
 
 def _format_size(num:int|float)->str:
@@ -333,4 +340,125 @@ async def try_send_video_via_mtproto(bot,chat_id,status_msg_id,file_path,caption
         return False
     finally:
         await _wait_last_progress_task(state)
+        _drop_progress_lock(key)
+
+def is_mtproto_streaming_available()->bool:
+    return _ENABLED and TelegramClient is not None and SaveBigFilePartRequest is not None
+
+async def _read_stream_part(reader,size:int)->bytes:
+    try:
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+
+async def _save_big_file_part(client,file_id:int,index:int,total:int,data:bytes):
+    for attempt in range(3):
+        try:
+            if await client(SaveBigFilePartRequest(file_id,index,total,data)):
+                return
+        except Exception as e:
+            wait=int(getattr(e,"seconds",0) or 0)
+            if wait>0:
+                log.warning("MTProto stream part FloodWait | part=%s wait=%s",index,wait)
+                await asyncio.sleep(wait+1)
+                continue
+            if attempt>=2:
+                raise
+            log.warning("MTProto stream part failed, retrying | part=%s attempt=%s err=%r",index,attempt+1,e)
+            await asyncio.sleep(1+attempt)
+    raise RuntimeError(f"MTProto stream part {index} was not saved")
+
+async def try_stream_video_via_mtproto(bot,chat_id,status_msg_id,reader,caption,name="video.mp4",reply_to=None,message_thread_id=None,duration=None,width=None,height=None,expected_size:int=0,max_size:int=0,before_send=None):
+    if not is_mtproto_streaming_available():
+        return False
+    key=(int(chat_id),int(status_msg_id))
+    started=time.monotonic()
+    show_progress=expected_size>=_PROGRESS_MIN_BYTES
+    interval=_progress_interval(expected_size)
+    state={"task":None}
+    tasks=set()
+    try:
+        client=await _get_client()
+        entity=await _resolve_entity(client,chat_id)
+        progress_callback,state=_make_progress_callback(bot,chat_id,status_msg_id,expected_size,started,show_progress,interval,"Streaming video")
+        file_id=random.getrandbits(63)
+        limiter=asyncio.Semaphore(_STREAM_PARALLEL_PARTS)
+        buffered=[]
+        index=0
+        uploaded=0
+
+        async def _put(part_index:int,total:int,data:bytes):
+            try:
+                await _save_big_file_part(client,file_id,part_index,total,data)
+            finally:
+                limiter.release()
+
+        async def _flush(total:int):
+            nonlocal index
+            while buffered:
+                data=buffered.pop(0)
+                for task in list(tasks):
+                    if task.done():
+                        tasks.discard(task)
+                        task.result()
+                await limiter.acquire()
+                part_total=total if not buffered and total>0 else -1
+                tasks.add(asyncio.create_task(_put(index,part_total,data)))
+                index+=1
+
+        log.info("MTProto stream upload start | chat_id=%s expected=%s parallel=%s",chat_id,_format_size(expected_size),_STREAM_PARALLEL_PARTS)
+        pending=await _read_stream_part(reader,_STREAM_PART_SIZE)
+        while pending:
+            following=await _read_stream_part(reader,_STREAM_PART_SIZE)
+            uploaded+=len(pending)
+            if max_size and uploaded>max_size:
+                raise RuntimeError("Streamed file exceeds Telegram size limit")
+            buffered.append(pending)
+            if not following:
+                if uploaded<_STREAM_MIN_BIG_FILE:
+                    raise RuntimeError("Streamed file too small for big-file upload")
+                await _flush(index+len(buffered))
+            elif uploaded>=_STREAM_MIN_BIG_FILE:
+                await _flush(-1)
+            progress_callback(uploaded,max(expected_size,uploaded))
+            pending=following
+        if tasks:
+            await asyncio.gather(*tasks)
+        if index==0:
+            return False
+        if before_send is not None and not await before_send():
+            raise RuntimeError("Stream producer failed")
+        attrs=[]
+        if DocumentAttributeVideo and duration and width and height:
+            attrs.append(DocumentAttributeVideo(duration=int(duration),w=int(width),h=int(height),supports_streaming=True))
+        await client.send_file(
+            entity=entity,
+            file=InputFileBig(id=file_id,parts=index,name=name),
+            caption=caption,
+            parse_mode="html",
+            force_document=False,
+            supports_streaming=True,
+            mime_type="video/mp4",
+            attributes=attrs or None,
+            reply_to=reply_to,
+        )
+        await _wait_last_progress_task(state)
+        elapsed=time.monotonic()-started
+        log.info(
+            "Telegram MTProto stream send done | chat_id=%s size=%s parts=%s elapsed=%.2fs avg_speed=%s/s",
+            chat_id,
+            _format_size(uploaded),
+            index,
+            elapsed,
+            _format_size(uploaded/max(elapsed,0.001)),
+        )
+        return True
+    except Exception as e:
+        log.warning("MTProto stream upload failed | chat_id=%s err=%r",chat_id,e)
+        return False
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await _wait_last_progress_task(state)
         _drop_progress_lock(key)
\ No newline at end of file
@@ -1,3 +1,5 @@
+import os
+import time
 import shutil
 import subprocess
 import asyncio
@@ -5,9 +7,20 @@ import json
 import logging
 from urllib.parse import urlparse
 from .constants import COOKIES_PATH
+from .utils import canonical_url
+from . import extractor
 
 log = logging.getLogger(__name__)
 
+PROBE_CACHE_TTL = int(os.getenv("DL_PROBE_CACHE_TTL", "900"))
+PROBE_CACHE_STALE = int(os.getenv("DL_PROBE_CACHE_STALE", "3600"))
+PROBE_CACHE_SWR_HITS = int(os.getenv("DL_PROBE_CACHE_SWR_HITS", "2"))
+PROBE_CACHE_MAX = int(os.getenv("DL_PROBE_CACHE_MAX", "256"))
+
+_PROBE_CACHE: dict[str, dict] = {}
+_PROBE_PENDING: dict[str, asyncio.Future] = {}
+_PROBE_STATS = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
 YTDLP_RESOLUTION_DOMAINS = (
     "youtube.com",
     "youtu.be",
@@ -82,7 +95,7 @@ def _pick_bestaudio_size(formats: list[dict]) -> int:
     size = best.get("filesize") or best.get("filesize_approx") or 0
     return _safe_int(size)
 
-def _probe_resolutions_sync(url: str) -> list[dict]:
+def _probe_resolutions_cli_sync(url: str) -> list[dict]:
     yt_dlp_bin = shutil.which("yt-dlp")
     if not yt_dlp_bin:
         log.warning("yt-dlp probe failed | yt-dlp not found in PATH")
@@ -109,6 +122,9 @@ def _probe_resolutions_sync(url: str) -> list[dict]:
         log.warning("yt-dlp probe json parse failed | err=%r", e)
         return []
 
+    return _parse_resolutions(info)
+
+def _parse_resolutions(info: dict) -> list[dict]:
     formats = info.get("formats") or []
     if not isinstance(formats, list):
         log.warning("yt-dlp probe invalid formats | type=%s", type(formats).__name__)
@@ -237,15 +253,82 @@ def _probe_resolutions_sync(url: str) -> list[dict]:
 
     return out
 
+async def _probe_resolutions(url: str) -> list[dict]:
+    try:
+        info = await extractor.extract_info(url)
+        if info:
+            res = await asyncio.to_thread(_parse_resolutions, info)
+        else:
+            res = await asyncio.to_thread(_probe_resolutions_cli_sync, url)
+        return res or []
+    except Exception as e:
+        log.warning("yt-dlp probe failed | url=%s err=%r", url, e)
+        return []
+
+def _probe_cache_store(key: str, res: list[dict]):
+    old = _PROBE_CACHE.get(key) or {}
+    _PROBE_CACHE[key] = {"ts": time.time(), "res": res, "hits": old.get("hits", 0)}
+    if len(_PROBE_CACHE) > PROBE_CACHE_MAX:
+        oldest = sorted(_PROBE_CACHE, key=lambda k: _PROBE_CACHE[k]["ts"])
+        for k in oldest[:len(_PROBE_CACHE) - PROBE_CACHE_MAX]:
+            _PROBE_CACHE.pop(k, None)
+
+def _probe_once(key: str, url: str) -> asyncio.Future:
+    fut = _PROBE_PENDING.get(key)
+    if fut is not None:
+        return fut
+
+    async def _run():
+        res = await _probe_resolutions(url)
+        if res:
+            _probe_cache_store(key, res)
+        return res
+
+    fut = asyncio.ensure_future(_run())
+    _PROBE_PENDING[key] = fut
+    fut.add_done_callback(lambda _: _PROBE_PENDING.pop(key, None))
+    return fut
+
+def cached_resolutions(url: str) -> list[dict]:
+    entry = _PROBE_CACHE.get(canonical_url(url))
+    if not entry or time.time() - entry["ts"] > PROBE_CACHE_TTL + PROBE_CACHE_STALE:
+        return []
+    return entry["res"]
+
+def cached_total_size(url: str, format_id: str | None) -> int:
+    fid = str(format_id or "").strip()
+    if not fid:
+        return 0
+    for item in cached_resolutions(url):
+        if str(item.get("format_id") or "") == fid:
+            return int(item.get("total_size") or 0)
+    return 0
+
+def get_probe_cache_stats() -> dict:
+    return {**_PROBE_STATS, "entries": len(_PROBE_CACHE), "pending": len(_PROBE_PENDING)}
+
 async def get_resolutions(url: str, engine: str | None = None) -> list[dict]:
     chosen = (engine or "ytdlp").strip().lower()
     if chosen != "ytdlp":
         log.warning("Unsupported resolution engine ignored | url=%s engine=%s", url, chosen)
     if not supports_ytdlp_resolution(url):
         return []
-    try:
-        res = await asyncio.to_thread(_probe_resolutions_sync, url)
-        return res or []
-    except Exception as e:
-        log.warning("yt-dlp probe failed | url=%s err=%r", url, e)
-        return []
\ No newline at end of file
+
+    key = canonical_url(url)
+    entry = _PROBE_CACHE.get(key)
+    if entry:
+        age = time.time() - entry["ts"]
+        entry["hits"] += 1
+        if age <= PROBE_CACHE_TTL:
+            _PROBE_STATS["hits"] += 1
+            return entry["res"]
+        if age <= PROBE_CACHE_TTL + PROBE_CACHE_STALE and entry["hits"] >= PROBE_CACHE_SWR_HITS:
+            _PROBE_STATS["stale_hits"] += 1
+            if key not in _PROBE_PENDING:
+                _PROBE_STATS["refreshes"] += 1
+                log.info("yt-dlp probe cache stale, refreshing in background | key=%s age=%ss", key, int(age))
+                _probe_once(key, url)
+            return entry["res"]
+
+    _PROBE_STATS["misses"] += 1
+    return list(await asyncio.shield(_probe_once(key, url)) or [])
@@ -96,9 +96,9 @@ async def _edit_caption_via_bot_api(bot,chat_id,message_id,caption):
         return
     for attempt in range(2):
         try:
-            await bot.edit_message_caption(chat_id=chat_id,message_id=message_id,caption=caption,parse_mode="HTML")
+            edited=await bot.edit_message_caption(chat_id=chat_id,message_id=message_id,caption=caption,parse_mode="HTML")
             log.info("Pyrofork caption edited via Bot API | chat_id=%s message_id=%s",chat_id,message_id)
-            return
+            return edited if edited is not True else None
         except RetryAfter as e:
             wait=max(int(getattr(e,"retry_after",1)),1)
             log.warning("Pyrofork caption edit RetryAfter | chat_id=%s wait=%s attempt=%s",chat_id,wait,attempt+1)
@@ -351,12 +351,12 @@ async def try_send_video_via_pyrogram(bot,chat_id,status_msg_id,file_path,captio
             else:
                 raise
         message_id=getattr(sent,"id",None) or getattr(sent,"message_id",None)
-        await _edit_caption_via_bot_api(bot,chat_id,message_id,caption)
+        edited=await _edit_caption_via_bot_api(bot,chat_id,message_id,caption)
         await _wait_last_progress_task(state)
         elapsed=time.monotonic()-started
         speed=file_size/max(elapsed,0.001)
         log.info("Pyrofork send done | chat_id=%s file=%s size=%s elapsed=%.2fs avg_speed=%s/s",chat_id,os.path.basename(file_path),_format_size(file_size),elapsed,_format_size(speed))
-        return True
+        return edited or True
     except Exception as e:
         log.warning("Pyrofork upload failed, fallback to PTB | chat_id=%s file=%s err=%r",chat_id,os.path.basename(file_path),e)
         return False
@@ -10,22 +10,23 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from handlers.join import require_join_or_block
 from utils.config import OWNER_ID
+from utils.chat_members import get_member
 from database.premium import init_premium_db
 from .constants import TMP_DIR,DL_FORMATS,PREMIUM_ONLY_DOMAINS,AUTO_DOWNLOAD_DOMAINS
 from .state import DL_CACHE
-from database.download_db import load_auto_dl,save_auto_dl,is_premium_user,is_premium_required
+from database.download_db import load_auto_dl,save_auto_dl,is_auto_dl_enabled,is_premium_user,is_premium_required
 from .utils import normalize_url,is_invalid_video
 from .keyboards import dl_keyboard,res_keyboard,autodl_detect_keyboard
 from .probe import get_resolutions,supports_resolution_picker,supports_ytdlp_resolution
 from .tiktok.main import is_tiktok,douyin_download,tiktok_download
-from .service import download_non_tiktok,send_downloaded_media
+from .service import download_non_tiktok,send_downloaded_media,send_cached_media,build_video_caption
+from .streaming import can_stream_upload,stream_download_and_send
+from . import file_cache,inflight,scheduler
 from database.user_settings_db import get_user_settings
 from .remux import prepare_download_result_for_send
 
 log=logging.getLogger(__name__)
 os.makedirs(TMP_DIR,exist_ok=True)
-TIKTOK_LOCK=asyncio.Semaphore(3)
-YTDLP_SEM=asyncio.Semaphore(4)
 _MAX_FLOOD_RETRY=2
 
 def _host(url:str)->str:
@@ -109,6 +110,26 @@ async def _safe_edit_error(bot,chat_id,message_id,text:str):
     except Exception as e:
         log.warning("Failed to edit downloader error status | chat_id=%s message_id=%s err=%r",chat_id,message_id,e)
 
+async def _safe_edit_status(bot,chat_id,message_id,text:str):
+    try:
+        await bot.edit_message_text(chat_id=chat_id,message_id=message_id,text=text,parse_mode="HTML")
+    except Exception as e:
+        if "message is not modified" in (str(e) or "").lower():
+            return
+        log.debug("Failed to edit downloader status | chat_id=%s message_id=%s err=%r",chat_id,message_id,e)
+
+async def _resend_shared(bot,chat_id,reply_to,status_msg_id,payload:dict,message_thread_id,cache_key:str,label:str)->bool:
+    try:
+        await send_cached_media(bot=bot,chat_id=chat_id,reply_to=reply_to,payload=payload,message_thread_id=message_thread_id)
+    except Exception as e:
+        if "Flood control exceeded" in (str(e) or ""):
+            raise
+        log.warning("%s media resend failed, downloading again | key=%s err=%r",label,cache_key,e)
+        await file_cache.forget(cache_key)
+        return False
+    await _safe_delete_message(bot,chat_id,status_msg_id,"download status")
+    return True
+
 async def _remove_file(path:str|None,label:str):
     if not path:
         return
@@ -127,22 +148,61 @@ async def _start_dl_task(context,message,data,fmt_key,format_id=None,has_audio=F
     if not status_ready:
         await message.edit_text(_metadata_status(data["url"]),parse_mode="HTML")
         status_ready=True
+    job={
+        "chat_id":message.chat.id,
+        "user_id":data.get("user"),
+        "reply_to":data.get("reply_to"),
+        "status_msg_id":message.message_id,
+        "raw_url":data["url"],
+        "fmt_key":fmt_key,
+        "format_id":format_id,
+        "has_audio":has_audio,
+        "engine":engine,
+        "message_thread_id":data.get("message_thread_id",getattr(message,"message_thread_id",None)),
+    }
+    job_id=await scheduler.enqueue(job)
     context.application.create_task(
         _dl_worker(
             app=context.application,
-            chat_id=message.chat.id,
-            reply_to=data.get("reply_to"),
-            raw_url=data["url"],
+            chat_id=job["chat_id"],
+            reply_to=job["reply_to"],
+            raw_url=job["raw_url"],
             fmt_key=fmt_key,
-            status_msg_id=message.message_id,
+            status_msg_id=job["status_msg_id"],
             format_id=format_id,
             has_audio=has_audio,
             engine=engine,
-            message_thread_id=data.get("message_thread_id",getattr(message,"message_thread_id",None)),
+            message_thread_id=job["message_thread_id"],
             metadata_ready=status_ready,
+            user_id=job["user_id"],
+            job_id=job_id,
         )
     )
 
+async def resume_download_jobs(app)->int:
+    jobs=await scheduler.claim_resumable()
+    for job in jobs:
+        log.info("Resuming download job | job_id=%s url=%s fmt_key=%s attempt=%s",job["job_id"],job["raw_url"],job["fmt_key"],job["attempts"])
+        await _safe_edit_status(app.bot,job["chat_id"],job["status_msg_id"],"<b>Resuming download after restart...</b>")
+        app.create_task(
+            _dl_worker(
+                app=app,
+                chat_id=job["chat_id"],
+                reply_to=job["reply_to"],
+                raw_url=job["raw_url"],
+                fmt_key=job["fmt_key"],
+                status_msg_id=job["status_msg_id"],
+                format_id=job["format_id"],
+                has_audio=job["has_audio"],
+                engine=job["engine"],
+                message_thread_id=job["message_thread_id"],
+                metadata_ready=True,
+                user_id=job["user_id"],
+                job_id=job["job_id"],
+            )
+        )
+    return len(jobs)
+
 async def _show_resolution_picker(context,message,dl_id:str,data:dict,engine:str|None=None,status_ready:bool=False):
     res_list=await get_resolutions(data["url"],engine=engine)
     if not res_list:
@@ -204,7 +264,7 @@ async def _is_admin_or_owner(update:Update,context:ContextTypes.DEFAULT_TYPE)->b
     if not user or not chat or chat.type not in ("group","supergroup"):
         return False
     try:
-        member=await context.bot.get_chat_member(chat.id,user.id)
+        member=await get_member(context.bot,chat.id,user.id)
         return member.status in ("administrator","creator")
     except Exception as e:
         log.debug("Failed to check admin status | chat_id=%s user_id=%s err=%r",getattr(chat,"id",None),getattr(user,"id",None),e)
@@ -272,8 +332,7 @@ async def auto_dl_detect(update:Update,context:ContextTypes.DEFAULT_TYPE):
         return
     settings=get_user_settings(update.effective_user.id)
     if chat.type in ("group","supergroup"):
-        groups=load_auto_dl()
-        if chat.id not in groups and not bool(settings.get("force_autodl")):
+        if not is_auto_dl_enabled(chat.id) and not bool(settings.get("force_autodl")):
             return
     if not await require_join_or_block(update,context):
         return
@@ -323,23 +382,71 @@ async def dlask_callback(update:Update,context:ContextTypes.DEFAULT_TYPE):
         return await _safe_delete_message(context.bot,q.message.chat.id,q.message.message_id,"download request menu")
     await q.edit_message_text("📥 <b>Select format</b>",reply_markup=dl_keyboard(dl_id),parse_mode="HTML")
 
-async def _dl_worker(app,chat_id,reply_to,raw_url,fmt_key,status_msg_id,format_id:str|None=None,has_audio:bool=False,engine:str|None=None,message_thread_id:int|None=None,metadata_ready:bool=False,_flood_retry:int=0):
+async def _dl_worker(app,chat_id,reply_to,raw_url,fmt_key,status_msg_id,format_id:str|None=None,has_audio:bool=False,engine:str|None=None,message_thread_id:int|None=None,metadata_ready:bool=False,user_id:int|None=None,job_id:int|None=None,_flood_retry:int=0):
     bot=app.bot
     path=None
+    sent=None
+    leader=False
+    outcome=None
+    cache_key=file_cache.make_key(raw_url,fmt_key,format_id)
+    job={
+        "job_id":job_id,
+        "chat_id":chat_id,
+        "user_id":user_id,
+        "platform":_platform_label(raw_url).lower(),
+        "premium":bool(user_id) and is_premium_user(user_id),
+    }
+
+    async def _waiting_tick(elapsed:float):
+        await _safe_edit_status(bot,chat_id,status_msg_id,f"<b>Same link is being downloaded, waiting...</b>\n\n<code>Waited: {int(elapsed)}s</code>")
+
+    async def _queue_position(position:int,total:int):
+        await _safe_edit_status(bot,chat_id,status_msg_id,f"<b>Queued for download...</b>\n\n<code>Position: {position}/{total}</code>")
+
     try:
         log.info(
             "Download worker start | url=%s fmt_key=%s format_id=%s has_audio=%s engine=%s",
             raw_url,fmt_key,format_id,has_audio,engine,
         )
+        cached=await file_cache.lookup(cache_key)
+        if cached and await _resend_shared(bot,chat_id,reply_to,status_msg_id,cached,message_thread_id,cache_key,"Cached"):
+            return cached
+        if _flood_retry==0:
+            independent=False
+            while not inflight.claim(cache_key):
+                await _safe_edit_status(bot,chat_id,status_msg_id,"<b>Same link is being downloaded, waiting...</b>")
+                shared=await inflight.wait(cache_key,on_tick=_waiting_tick)
+                if shared==inflight.PROCEED:
+                    independent=True
+                    break
+                if shared and await _resend_shared(bot,chat_id,reply_to,status_msg_id,shared,message_thread_id,cache_key,"Shared"):
+                    return shared
+            leader=not independent
         if is_tiktok(raw_url):
-            async with TIKTOK_LOCK:
+            async with scheduler.SCHEDULER.slot(job,on_position=_queue_position):
                 path=await tiktok_download(raw_url,bot,chat_id,status_msg_id,fmt_key,metadata_ready=metadata_ready)
                 actual_path=path.get("path") if isinstance(path,dict) else path
                 if actual_path and is_invalid_video(actual_path):
                     await _remove_file(actual_path,"invalid TikTok")
                     raise RuntimeError("Static video")
         else:
-            async with YTDLP_SEM:
+            async with scheduler.SCHEDULER.slot(job,on_position=_queue_position):
+                if can_stream_upload(raw_url,fmt_key):
+                    streamed=await stream_download_and_send(
+                        bot=bot,
+                        chat_id=chat_id,
+                        reply_to=reply_to,
+                        status_msg_id=status_msg_id,
+                        raw_url=raw_url,
+                        format_id=format_id,
+                        has_audio=has_audio,
+                        caption_builder=lambda title:build_video_caption(bot,title),
+                        message_thread_id=message_thread_id,
+                    )
+                    if streamed:
+                        outcome=inflight.PROCEED
+                        await _safe_delete_message(bot,chat_id,status_msg_id,"download status")
+                        return None
                 path=await download_non_tiktok(
                     raw_url=raw_url,
                     fmt_key=fmt_key,
@@ -354,7 +461,7 @@ async def _dl_worker(app,chat_id,reply_to,raw_url,fmt_key,status_msg_id,format_i
         prepare_started=time.monotonic()
         path=await prepare_download_result_for_send(path,fmt_key=fmt_key)
         log.info("Prepare media done | url=%s elapsed=%.2fs",raw_url,time.monotonic()-prepare_started)
-        await send_downloaded_media(
+        sent=await send_downloaded_media(
             bot=bot,
             chat_id=chat_id,
             reply_to=reply_to,
@@ -363,7 +470,10 @@ async def _dl_worker(app,chat_id,reply_to,raw_url,fmt_key,status_msg_id,format_i
             fmt_key=fmt_key,
             message_thread_id=message_thread_id,
         )
+        outcome=sent or inflight.PROCEED
+        await file_cache.store(cache_key,raw_url,fmt_key,format_id,sent)
         await _safe_delete_message(bot,chat_id,status_msg_id,"download status")
+        return sent
     except Exception as e:
         err=str(e) or repr(e)
         if "Flood control exceeded" in err and "Retry in" in err and _flood_retry<_MAX_FLOOD_RETRY:
@@ -371,7 +481,7 @@ async def _dl_worker(app,chat_id,reply_to,raw_url,fmt_key,status_msg_id,format_i
             wait_time=int(m.group(1)) if m else 5
             log.warning("Download worker flood retry | chat_id=%s wait=%s retry=%s url=%s",chat_id,wait_time,_flood_retry+1,raw_url)
             await asyncio.sleep(wait_time)
-            return await _dl_worker(
+            sent=await _dl_worker(
                 app=app,
                 chat_id=chat_id,
                 reply_to=reply_to,
@@ -383,8 +493,12 @@ async def _dl_worker(app,chat_id,reply_to,raw_url,fmt_key,status_msg_id,format_i
                 engine=engine,
                 message_thread_id=message_thread_id,
                 metadata_ready=metadata_ready,
+                user_id=user_id,
+                job_id=job_id,
                 _flood_retry=_flood_retry+1,
             )
+            outcome=sent
+            return sent
         log.warning("Download worker failed | chat_id=%s url=%s err=%r",chat_id,raw_url,e)
         public_err=html.escape(err.strip())[:3500] or "Unknown downloader error"
         await _safe_edit_error(
@@ -393,6 +507,11 @@ async def _dl_worker(app,chat_id,reply_to,raw_url,fmt_key,status_msg_id,format_i
             status_msg_id,
             f"<b>Download failed</b>\n\n<code>{public_err}</code>",
         )
+    finally:
+        if leader:
+            inflight.resolve(cache_key,outcome)
+        if _flood_retry==0:
+            await scheduler.finish(job_id)
 
 async def dl_cmd(update:Update,context:ContextTypes.DEFAULT_TYPE):
     if not await require_join_or_block(update,context):
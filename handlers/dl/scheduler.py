@@ -0,0 +1,247 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager
+from database.db import db_session,register_schema,run_db
+from .constants import DL_QUEUE_DB
+
+log=logging.getLogger(__name__)
+DL_MAX_CONCURRENCY=max(1,int(os.getenv("DL_MAX_CONCURRENCY","7")))
+DL_PLATFORM_CONCURRENCY_DEFAULT=max(1,int(os.getenv("DL_PLATFORM_CONCURRENCY_DEFAULT","4")))
+DL_JOB_RESUME_MAX_AGE=int(os.getenv("DL_JOB_RESUME_MAX_AGE",str(6*60*60)))
+DL_JOB_MAX_ATTEMPTS=int(os.getenv("DL_JOB_MAX_ATTEMPTS","3"))
+_POSITION_NOTIFY_LIMIT=20
+
+def _parse_limits(raw:str)->dict[str,int]:
+    limits={"tiktok":3}
+    for part in (raw or "").split(","):
+        name,_,value=part.partition("=")
+        name=name.strip().lower()
+        if not name:
+            continue
+        try:
+            limits[name]=max(1,int(value))
+        except (TypeError,ValueError):
+            log.warning("Invalid DL_CONCURRENCY entry ignored | entry=%r",part)
+    return limits
+
+DL_PLATFORM_LIMITS=_parse_limits(os.getenv("DL_CONCURRENCY",""))
+
+def _queue_schema(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS dl_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER,
+            reply_to INTEGER,
+            status_msg_id INTEGER NOT NULL,
+            raw_url TEXT NOT NULL,
+            fmt_key TEXT NOT NULL,
+            format_id TEXT,
+            has_audio INTEGER NOT NULL DEFAULT 0,
+            engine TEXT,
+            message_thread_id INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL
+        )
+    """)
+
+register_schema(DL_QUEUE_DB,_queue_schema)
+
+def _db_insert(job:dict)->int:
+    with db_session(DL_QUEUE_DB) as con:
+        cur=con.execute("""
+            INSERT INTO dl_jobs (chat_id,user_id,reply_to,status_msg_id,raw_url,fmt_key,format_id,has_audio,engine,message_thread_id,created_at)
+            VALUES (?,?,?,?,?,?,?,?,?,?,?)
+        """,(
+            int(job["chat_id"]),
+            job.get("user_id"),
+            job.get("reply_to"),
+            int(job["status_msg_id"]),
+            str(job["raw_url"]),
+            str(job["fmt_key"]),
+            job.get("format_id"),
+            1 if job.get("has_audio") else 0,
+            job.get("engine"),
+            job.get("message_thread_id"),
+            time.time(),
+        ))
+        con.commit()
+        return int(cur.lastrowid)
+
+def _db_delete(job_id:int):
+    with db_session(DL_QUEUE_DB) as con:
+        con.execute("DELETE FROM dl_jobs WHERE job_id=?",(int(job_id),))
+        con.commit()
+
+def _db_claim_resumable()->list[dict]:
+    with db_session(DL_QUEUE_DB) as con:
+        try:
+            con.execute("BEGIN")
+            con.execute(
+                "DELETE FROM dl_jobs WHERE created_at<? OR attempts>=?",
+                (time.time()-DL_JOB_RESUME_MAX_AGE,DL_JOB_MAX_ATTEMPTS),
+            )
+            con.execute("UPDATE dl_jobs SET attempts=attempts+1")
+            rows=con.execute("""
+                SELECT job_id,chat_id,user_id,reply_to,status_msg_id,raw_url,fmt_key,format_id,has_audio,engine,message_thread_id,attempts
+                FROM dl_jobs ORDER BY created_at ASC
+            """).fetchall()
+            con.execute("COMMIT")
+        except Exception:
+            try:
+                con.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+    keys=("job_id","chat_id","user_id","reply_to","status_msg_id","raw_url","fmt_key","format_id","has_audio","engine","message_thread_id","attempts")
+    jobs=[]
+    for row in rows:
+        job=dict(zip(keys,row))
+        job["has_audio"]=bool(job["has_audio"])
+        jobs.append(job)
+    return jobs
+
+async def enqueue(job:dict)->int|None:
+    try:
+        return await run_db(_db_insert,job)
+    except Exception as e:
+        log.warning("Failed to persist download job | url=%s err=%r",job.get("raw_url"),e)
+        return None
+
+async def finish(job_id:int|None):
+    if not job_id:
+        return
+    try:
+        await run_db(_db_delete,job_id)
+    except Exception as e:
+        log.warning("Failed to remove finished download job | job_id=%s err=%r",job_id,e)
+
+async def claim_resumable()->list[dict]:
+    return await run_db(_db_claim_resumable)
+
+class _Waiter:
+    __slots__=("job","future","seq","on_position","position")
+
+    def __init__(self,job:dict,future:asyncio.Future,seq:int,on_position=None):
+        self.job=job
+        self.future=future
+        self.seq=seq
+        self.on_position=on_position
+        self.position=0
+
+class DownloadScheduler:
+    def __init__(self,max_total:int,platform_limits:dict[str,int],default_limit:int):
+        self.max_total=max_total
+        self.platform_limits=platform_limits
+        self.default_limit=default_limit
+        self._running=0
+        self._by_platform:dict[str,int]={}
+        self._by_user:dict[int,int]={}
+        self._by_chat:dict[int,int]={}
+        self._waiting:list[_Waiter]=[]
+        self._seq=itertools.count()
+
+    def _limit(self,platform:str)->int:
+        return self.platform_limits.get(platform,self.default_limit)
+
+    def _has_capacity(self,platform:str)->bool:
+        return self._running<self.max_total and self._by_platform.get(platform,0)<self._limit(platform)
+
+    def _sort_key(self,w:_Waiter):
+        job=w.job
+        return (
+            0 if job.get("premium") else 1,
+            self._by_user.get(job.get("user_id"),0),
+            self._by_chat.get(job.get("chat_id"),0),
+            w.seq,
+        )
+
+    def _take(self,job:dict):
+        platform=job["platform"]
+        self._running+=1
+        self._by_platform[platform]=self._by_platform.get(platform,0)+1
+        for bucket,key in ((self._by_user,job.get("user_id")),(self._by_chat,job.get("chat_id"))):
+            bucket[key]=bucket.get(key,0)+1
+
+    def _drop(self,bucket:dict,key):
+        left=bucket.get(key,0)-1
+        if left>0:
+            bucket[key]=left
+        else:
+            bucket.pop(key,None)
+
+    def release(self,job:dict):
+        self._running=max(self._running-1,0)
+        self._drop(self._by_platform,job["platform"])
+        self._drop(self._by_user,job.get("user_id"))
+        self._drop(self._by_chat,job.get("chat_id"))
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiting:
+            ordered=sorted(self._waiting,key=self._sort_key)
+            picked=next((w for w in ordered if self._has_capacity(w.job["platform"])),None)
+            if picked is None:
+                break
+            self._waiting.remove(picked)
+            if picked.future.done():
+                continue
+            self._take(picked.job)
+            picked.future.set_result(True)
+        self._notify_positions()
+
+    def _notify_positions(self):
+        for idx,w in enumerate(sorted(self._waiting,key=self._sort_key)[:_POSITION_NOTIFY_LIMIT]):
+            position=idx+1
+            if w.on_position is None or w.position==position:
+                continue
+            w.position=position
+            asyncio.get_running_loop().create_task(w.on_position(position,len(self._waiting)))
+
+    def position(self,job_id)->int:
+        for idx,w in enumerate(sorted(self._waiting,key=self._sort_key)):
+            if w.job.get("job_id")==job_id:
+                return idx+1
+        return 0
+
+    async def acquire(self,job:dict,on_position=None):
+        if not self._waiting and self._has_capacity(job["platform"]):
+            self._take(job)
+            return
+        w=_Waiter(job,asyncio.get_running_loop().create_future(),next(self._seq),on_position)
+        self._waiting.append(w)
+        log.info(
+            "Download job queued | job_id=%s platform=%s premium=%s waiting=%s running=%s",
+            job.get("job_id"),job["platform"],bool(job.get("premium")),len(self._waiting),self._running,
+        )
+        self._dispatch()
+        try:
+            await w.future
+        except asyncio.CancelledError:
+            if w in self._waiting:
+                self._waiting.remove(w)
+                self._notify_positions()
+            elif w.future.done() and not w.future.cancelled():
+                self.release(job)
+            raise
+
+    @asynccontextmanager
+    async def slot(self,job:dict,on_position=None):
+        await self.acquire(job,on_position=on_position)
+        try:
+            yield
+        finally:
+            self.release(job)
+
+    def snapshot(self)->dict:
+        return {
+            "running":self._running,
+            "waiting":len(self._waiting),
+            "by_platform":dict(self._by_platform),
+            "max_total":self.max_total,
+        }
+
+SCHEDULER=DownloadScheduler(DL_MAX_CONCURRENCY,DL_PLATFORM_LIMITS,DL_PLATFORM_CONCURRENCY_DEFAULT)
\ No newline at end of file
@@ -164,6 +164,18 @@ def _build_safe_photo_caption(title:str,bot_name:str,max_len:int=1024)->str:
     short_title=clean_title[:allowed].rstrip()+"..."
     return f"{prefix}{html.escape(short_title)}{closing}{suffix}"
 
+def _sent_media_ref(message)->dict|None:
+    if not message or message is True:
+        return None
+    for kind in ("video","audio","animation","document"):
+        media=getattr(message,kind,None)
+        if media and getattr(media,"file_id",None):
+            return {"type":kind,"file_id":media.file_id}
+    photos=getattr(message,"photo",None)
+    if photos:
+        return {"type":"photo","file_id":photos[-1].file_id}
+    return None
+
 def _is_reply_not_found_error(exc:Exception)->bool:
     text=(str(exc) or "").lower()
     keys=("replied message not found","message to be replied not found","reply message not found","reply_to_message_id")
@@ -178,6 +190,9 @@ async def _get_bot_name(bot)->str:
     setattr(bot,"_cached_first_name",name)
     return name
 
+async def build_video_caption(bot,title:str)->str:
+    return _build_safe_caption(title,await _get_bot_name(bot))
+
 async def _safe_edit_status(bot,chat_id,message_id,text:str):
     try:
         await bot.edit_message_text(chat_id=chat_id,message_id=message_id,text=text,parse_mode="HTML")
@@ -364,6 +379,7 @@ async def _send_media_group_result(bot,chat_id,reply_to,result:dict,message_thre
     bot_name=await _get_bot_name(bot)
     caption=_build_safe_photo_caption(title,bot_name)
     chunks=[items[i:i+_ALBUM_CHUNK_SIZE] for i in range(0,len(items),_ALBUM_CHUNK_SIZE)]
+    sent_refs=[]
     for idx,chunk in enumerate(chunks):
         media=[]
         handles=[]
@@ -394,12 +410,14 @@ async def _send_media_group_result(bot,chat_id,reply_to,result:dict,message_thre
             if not media:
                 log.warning("No valid media items to send in chunk | chat_id=%s chunk_index=%s",chat_id,idx)
                 continue
-            await _send_media_group_with_fallback(bot=bot,chat_id=chat_id,media=media,reply_to=reply_to if idx==0 else None,message_thread_id=message_thread_id)
+            sent=await _send_media_group_with_fallback(bot=bot,chat_id=chat_id,media=media,reply_to=reply_to if idx==0 else None,message_thread_id=message_thread_id)
+            sent_refs.extend(ref for ref in (_sent_media_ref(m) for m in (sent or [])) if ref)
             if idx<len(chunks)-1 and _ALBUM_CHUNK_COOLDOWN>0:
                 await asyncio.sleep(_ALBUM_CHUNK_COOLDOWN)
         finally:
             for fh,name in handles:
                 _safe_close(fh,f"album media {name}",chat_id)
+    return {"kind":"album","caption":caption,"items":sent_refs} if len(sent_refs)==len(items) else None
 
 async def send_downloaded_media(bot,chat_id,reply_to,status_msg_id,path,fmt_key,message_thread_id=None):
     if isinstance(path,dict) and path.get("items"):
@@ -411,10 +429,9 @@ async def send_downloaded_media(bot,chat_id,reply_to,status_msg_id,path,fmt_key,
             first_type=detect_media_type(first_path)
         await _set_uploading_status(bot,chat_id,status_msg_id,"album" if len(items)>1 else ("video" if first_type=="video" else "photo"))
         try:
-            await _send_media_group_result(bot=bot,chat_id=chat_id,reply_to=reply_to,result=path,message_thread_id=message_thread_id)
+            return await _send_media_group_result(bot=bot,chat_id=chat_id,reply_to=reply_to,result=path,message_thread_id=message_thread_id)
         finally:
             await _cleanup_album_files(items)
-        return
 
     meta=path if isinstance(path,dict) else {"path":path,"title":None}
     file_path=meta.get("path")
@@ -431,12 +448,15 @@ async def send_downloaded_media(bot,chat_id,reply_to,status_msg_id,path,fmt_key,
         if fmt_key=="mp3":
             await _set_uploading_status(bot,chat_id,status_msg_id,"audio")
             fixed_audio=await reencode_mp3(file_path)
-            await _send_audio_with_fallback(bot=bot,chat_id=chat_id,audio=fixed_audio,title=caption_text[:64],performer=bot_name,filename=f"{caption_text[:50]}.mp3",reply_to=reply_to,message_thread_id=message_thread_id)
-            return
+            sent=await _send_audio_with_fallback(bot=bot,chat_id=chat_id,audio=fixed_audio,title=caption_text[:64],performer=bot_name,filename=f"{caption_text[:50]}.mp3",reply_to=reply_to,message_thread_id=message_thread_id)
+            ref=_sent_media_ref(sent)
+            return {"kind":"audio","file_id":ref["file_id"],"title":caption_text[:64],"performer":bot_name} if ref else None
         if media_type=="photo":
             await _set_uploading_status(bot,chat_id,status_msg_id,"photo")
-            await _send_photo_with_fallback(bot=bot,chat_id=chat_id,photo=file_path,caption=_build_safe_photo_caption(caption_text,bot_name),reply_to=reply_to,message_thread_id=message_thread_id)
-            return
+            caption=_build_safe_photo_caption(caption_text,bot_name)
+            sent=await _send_photo_with_fallback(bot=bot,chat_id=chat_id,photo=file_path,caption=caption,reply_to=reply_to,message_thread_id=message_thread_id)
+            ref=_sent_media_ref(sent)
+            return {"kind":"photo","file_id":ref["file_id"],"caption":caption} if ref else None
         if media_type=="video":
             await _set_uploading_status(bot,chat_id,status_msg_id,"video")
             thumb_path=None
@@ -459,34 +479,89 @@ async def send_downloaded_media(bot,chat_id,reply_to,status_msg_id,path,fmt_key,
                     height=meta_video.get("height"),
                     thumb_path=thumb_path,
                 )
-                if sent:
-                    return
-                video_fh=open(file_path,"rb")
-                thumb_fh=open(thumb_path,"rb") if thumb_path and os.path.exists(thumb_path) else None
-                await _send_video_with_fallback(
-                    bot=bot,
-                    chat_id=chat_id,
-                    video=video_fh,
-                    caption=caption,
-                    reply_to=reply_to,
-                    message_thread_id=message_thread_id,
-                    supports_streaming=True,
-                    duration=meta_video.get("duration"),
-                    width=meta_video.get("width"),
-                    height=meta_video.get("height"),
-                    thumbnail=thumb_fh,
-                )
+                if not sent:
+                    video_fh=open(file_path,"rb")
+                    thumb_fh=open(thumb_path,"rb") if thumb_path and os.path.exists(thumb_path) else None
+                    sent=await _send_video_with_fallback(
+                        bot=bot,
+                        chat_id=chat_id,
+                        video=video_fh,
+                        caption=caption,
+                        reply_to=reply_to,
+                        message_thread_id=message_thread_id,
+                        supports_streaming=True,
+                        duration=meta_video.get("duration"),
+                        width=meta_video.get("width"),
+                        height=meta_video.get("height"),
+                        thumbnail=thumb_fh,
+                    )
+                ref=_sent_media_ref(sent)
+                if not ref:
+                    return None
+                return {
+                    "kind":ref["type"] if ref["type"] in ("video","animation","document") else "video",
+                    "file_id":ref["file_id"],
+                    "caption":caption,
+                    "duration":meta_video.get("duration"),
+                    "width":meta_video.get("width"),
+                    "height":meta_video.get("height"),
+                }
             finally:
                 _safe_close(video_fh,"video",chat_id)
                 _safe_close(thumb_fh,"thumbnail",chat_id)
                 await _delete_file(thumb_path,"thumbnail")
-            return
         raise RuntimeError("Media tidak didukung")
     finally:
         if fixed_audio:
             await _delete_file(fixed_audio,"temp audio")
         await _cleanup_single_file(file_path)
 
+async def send_cached_media(bot,chat_id,reply_to,payload:dict,message_thread_id=None):
+    kind=str(payload.get("kind") or "")
+    if kind=="album":
+        refs=payload.get("items") or []
+        if not refs:
+            raise RuntimeError("Cached album is empty")
+        chunks=[refs[i:i+_ALBUM_CHUNK_SIZE] for i in range(0,len(refs),_ALBUM_CHUNK_SIZE)]
+        for idx,chunk in enumerate(chunks):
+            media=[]
+            for i,ref in enumerate(chunk):
+                is_first=idx==0 and i==0
+                item_caption=payload.get("caption") if is_first else None
+                item_parse_mode="HTML" if is_first else None
+                if ref.get("type")=="video":
+                    media.append(InputMediaVideo(media=ref["file_id"],caption=item_caption,parse_mode=item_parse_mode,supports_streaming=True))
+                else:
+                    media.append(InputMediaPhoto(media=ref["file_id"],caption=item_caption,parse_mode=item_parse_mode))
+            await _send_media_group_with_fallback(bot=bot,chat_id=chat_id,media=media,reply_to=reply_to if idx==0 else None,message_thread_id=message_thread_id)
+            if idx<len(chunks)-1 and _ALBUM_CHUNK_COOLDOWN>0:
+                await asyncio.sleep(_ALBUM_CHUNK_COOLDOWN)
+        return
+    file_id=payload.get("file_id")
+    if not file_id:
+        raise RuntimeError("Cached media has no file_id")
+    if kind=="audio":
+        await _send_audio_with_fallback(bot=bot,chat_id=chat_id,audio=file_id,title=payload.get("title"),performer=payload.get("performer"),filename=None,reply_to=reply_to,message_thread_id=message_thread_id)
+        return
+    if kind=="photo":
+        await _send_photo_with_fallback(bot=bot,chat_id=chat_id,photo=file_id,caption=payload.get("caption"),reply_to=reply_to,message_thread_id=message_thread_id)
+        return
+    if kind in ("video","animation","document"):
+        await _send_video_with_fallback(
+            bot=bot,
+            chat_id=chat_id,
+            video=file_id,
+            caption=payload.get("caption"),
+            reply_to=reply_to,
+            message_thread_id=message_thread_id,
+            supports_streaming=True,
+            duration=payload.get("duration"),
+            width=payload.get("width"),
+            height=payload.get("height"),
+        )
+        return
+    raise RuntimeError(f"Unsupported cached media kind: {kind}")
+
 async def download_non_tiktok(raw_url,fmt_key,bot,chat_id,status_msg_id,format_id:str|None,has_audio:bool,engine:str|None=None,metadata_ready:bool=False):
     if is_instagram_url(raw_url):
         try:
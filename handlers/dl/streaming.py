@@ -0,0 +1,149 @@
+import os
+import uuid
+import shutil
+import asyncio
+import logging
+from collections import deque
+from .constants import MAX_TG_SIZE
+from .ytdlp import _append_cookies_args,_build_ytdlp_format,probe_selected_info,_info_total_size,_source_args,_remove_info_json,YTDLP_DENO_PATH,YTDLP_TIMEOUT
+from .probe import cached_total_size
+from .instagram.main import is_instagram_url
+from .facebook.main import is_facebook_url
+from .threads.main import is_threads_url
+from .twitter.main import is_x_url
+from .reddit.main import is_reddit_url
+from .pinterest.main import is_pinterest_url
+from .mtproto_uploader import is_mtproto_streaming_available,try_stream_video_via_mtproto
+
+log=logging.getLogger(__name__)
+DL_STREAM_UPLOAD=os.getenv("DL_STREAM_UPLOAD","0").strip().lower() in ("1","true","on","yes")
+DL_STREAM_MIN_BYTES=int(os.getenv("DL_STREAM_MIN_BYTES",str(100*1024*1024)))
+_FRAGMENTED_MP4_FLAGS="frag_keyframe+empty_moov+default_base_moof"
+
+def can_stream_upload(url:str,fmt_key:str)->bool:
+    if not DL_STREAM_UPLOAD or fmt_key!="video":
+        return False
+    if not is_mtproto_streaming_available():
+        return False
+    if not shutil.which("yt-dlp") or not shutil.which("ffmpeg"):
+        return False
+    custom=(is_instagram_url,is_facebook_url,is_threads_url,is_x_url,is_reddit_url,is_pinterest_url)
+    return not any(check(url) for check in custom)
+
+def _stream_meta(info:dict)->dict:
+    req=info.get("requested_downloads") or []
+    src=next((d for d in req if isinstance(d,dict) and d.get("width")),None) or info
+    return {
+        "title":str(info.get("title") or "Media"),
+        "duration":int(float(info.get("duration") or 0)),
+        "width":int(src.get("width") or 0),
+        "height":int(src.get("height") or 0),
+    }
+
+async def _drain(stream,tail:deque):
+    while True:
+        line=await stream.readline()
+        if not line:
+            break
+        tail.append(line.decode(errors="ignore").rstrip())
+
+async def _kill(proc,label:str):
+    if proc is None or proc.returncode is not None:
+        return
+    try:
+        proc.kill()
+        await proc.wait()
+        log.warning("%s stream process killed",label)
+    except ProcessLookupError:
+        return
+    except Exception as e:
+        log.warning("Failed to kill %s stream process | err=%r",label,e)
+
+async def stream_download_and_send(bot,chat_id,reply_to,status_msg_id,raw_url,format_id:str|None,has_audio:bool,caption_builder,message_thread_id=None)->bool:
+    known=cached_total_size(raw_url,format_id)
+    if known and known<DL_STREAM_MIN_BYTES:
+        log.info("Stream upload skipped | url=%s cached_size=%s",raw_url,known)
+        return False
+    fmt=_build_ytdlp_format(format_id,has_audio)
+    info=await probe_selected_info(raw_url,fmt)
+    expected=_info_total_size(info,raw_url,fmt) if info else 0
+    if expected<DL_STREAM_MIN_BYTES or expected>MAX_TG_SIZE:
+        log.info("Stream upload skipped | url=%s expected=%s",raw_url,expected)
+        return False
+    meta=_stream_meta(info)
+    caption=await caption_builder(meta["title"])
+    ytdlp_cmd=[shutil.which("yt-dlp")]
+    _append_cookies_args(ytdlp_cmd)
+    ytdlp_cmd+=["--js-runtimes",YTDLP_DENO_PATH,"--concurrent-fragments","8","--no-playlist","--no-part","-q","-f",fmt,"-o","-"]
+    source,info_path=_source_args(raw_url,f"stream_{uuid.uuid4().hex[:10]}")
+    ytdlp_cmd+=source
+    ffmpeg_cmd=[
+        "ffmpeg","-hide_banner","-loglevel","error",
+        "-i","pipe:0",
+        "-map","0:v:0","-map","0:a:0?",
+        "-c","copy",
+        "-f","mp4",
+        "-movflags",_FRAGMENTED_MP4_FLAGS,
+        "pipe:1",
+    ]
+    ytdlp_proc=None
+    ffmpeg_proc=None
+    ytdlp_tail=deque(maxlen=20)
+    ffmpeg_tail=deque(maxlen=20)
+    drains=[]
+    read_fd,write_fd=os.pipe()
+    try:
+        ytdlp_proc=await asyncio.create_subprocess_exec(*ytdlp_cmd,stdout=write_fd,stderr=asyncio.subprocess.PIPE)
+        ffmpeg_proc=await asyncio.create_subprocess_exec(*ffmpeg_cmd,stdin=read_fd,stdout=asyncio.subprocess.PIPE,stderr=asyncio.subprocess.PIPE)
+    except Exception as e:
+        log.warning("Failed to start stream pipeline | url=%s err=%r",raw_url,e)
+        await _kill(ytdlp_proc,"yt-dlp")
+        _remove_info_json(info_path)
+        return False
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+    drains.append(asyncio.create_task(_drain(ytdlp_proc.stderr,ytdlp_tail)))
+    drains.append(asyncio.create_task(_drain(ffmpeg_proc.stderr,ffmpeg_tail)))
+
+    async def _producers_ok()->bool:
+        try:
+            codes=await asyncio.wait_for(asyncio.gather(ytdlp_proc.wait(),ffmpeg_proc.wait()),timeout=60)
+        except asyncio.TimeoutError:
+            return False
+        if any(code!=0 for code in codes):
+            log.warning(
+                "Stream producer failed | url=%s ytdlp=%s ffmpeg=%s ytdlp_err=%s ffmpeg_err=%s",
+                raw_url,codes[0],codes[1],list(ytdlp_tail)[-3:],list(ffmpeg_tail)[-3:],
+            )
+            return False
+        return True
+
+    log.info("Stream pipeline started | url=%s fmt=%s expected=%s",raw_url,fmt,expected)
+    try:
+        return await asyncio.wait_for(
+            try_stream_video_via_mtproto(
+                bot=bot,
+                chat_id=chat_id,
+                status_msg_id=status_msg_id,
+                reader=ffmpeg_proc.stdout,
+                caption=caption,
+                reply_to=reply_to,
+                message_thread_id=message_thread_id,
+                duration=meta["duration"],
+                width=meta["width"],
+                height=meta["height"],
+                expected_size=expected,
+                max_size=MAX_TG_SIZE,
+                before_send=_producers_ok,
+            ),
+            timeout=YTDLP_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        log.warning("Stream upload timeout | url=%s timeout=%ss",raw_url,YTDLP_TIMEOUT)
+        return False
+    finally:
+        await _kill(ytdlp_proc,"yt-dlp")
+        await _kill(ffmpeg_proc,"ffmpeg")
+        await asyncio.gather(*drains,return_exceptions=True)
+        _remove_info_json(info_path)
\ No newline at end of file
@@ -2,6 +2,25 @@ import os
 import re
 import subprocess
 import unicodedata
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+_TRACKING_PARAMS = {
+    "si", "feature", "igsh", "igshid", "utm_source", "utm_medium", "utm_campaign",
+    "utm_term", "utm_content", "fbclid", "gclid", "ref", "ref_src", "ref_url",
+    "is_from_webapp", "sender_device", "sender_web_id", "share_app_id", "_r", "_t",
+    "mibextid", "rdid",
+}
+# Short names that are only tracking noise on these hosts; elsewhere ?s=/?t=
+# often select different content.
+_HOST_TRACKING_PARAMS = {
+    "twitter.com": {"s", "t"},
+    "x.com": {"s", "t"},
+    "vxtwitter.com": {"s", "t"},
+    "fxtwitter.com": {"s", "t"},
+    "youtube.com": {"pp"},
+    "youtu.be": {"pp"},
+    "music.youtube.com": {"pp"},
+}
 
 def progress_bar(percent: float, length: int = 10) -> str:
     try:
@@ -68,4 +87,52 @@ def is_invalid_video(path: str) -> bool:
 
         return duration < 1.5 or width == 0 or height == 0
     except Exception:
-        return True
\ No newline at end of file
+        return True
+
+def _youtube_video_id(host: str, path: str, query: dict) -> str:
+    if host == "youtu.be":
+        return path.strip("/").split("/")[0]
+    if query.get("v"):
+        return query["v"]
+    parts = [p for p in path.split("/") if p]
+    if len(parts) >= 2 and parts[0] in ("shorts", "live", "embed", "v"):
+        return parts[1]
+    return ""
+
+def canonical_url(url: str) -> str:
+    raw = normalize_url(url)
+    if not raw:
+        return ""
+    if not raw.lower().startswith(("http://", "https://")):
+        raw = "https://" + raw
+    try:
+        u = urlparse(raw)
+    except Exception:
+        return raw
+    host = (u.hostname or "").lower()
+    for prefix in ("www.", "m.", "mobile."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = re.sub(r"/{2,}", "/", u.path or "/").rstrip("/") or "/"
+    query = dict(parse_qsl(u.query, keep_blank_values=False))
+    if host in ("youtube.com", "youtu.be", "music.youtube.com"):
+        vid = _youtube_video_id(host, path, query)
+        if vid:
+            return f"youtube:{vid}"
+    if host.endswith("tiktok.com"):
+        m = re.search(r"/video/(\d+)", path)
+        if m:
+            return f"tiktok:{m.group(1)}"
+    if host in ("instagram.com", "instagr.am"):
+        m = re.match(r"^/(?:[^/]+/)?(p|reel|reels|tv)/([^/]+)", path)
+        if m:
+            return f"instagram:{m.group(2)}"
+    if host in ("twitter.com", "x.com", "vxtwitter.com", "fxtwitter.com"):
+        m = re.search(r"/status/(\d+)", path)
+        if m:
+            return f"x:{m.group(1)}"
+    drop = _TRACKING_PARAMS | _HOST_TRACKING_PARAMS.get(host, set())
+    kept = sorted((k, v) for k, v in query.items() if k.lower() not in drop)
+    qs = urlencode(kept)
+    return f"{host}{path}" + (f"?{qs}" if qs else "")
\ No newline at end of file
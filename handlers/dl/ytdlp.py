@@ -11,12 +11,14 @@ from telegram.error import RetryAfter
 from .instagram.main import is_instagram_url
 from .constants import COOKIES_PATH,TMP_DIR
 from .utils import progress_bar
+from . import extractor
+from .extractor import YTDLP_DENO_PATH
+from .probe import cached_total_size
 
 _SIZE_100MB=100*1024*1024
 YTDLP_TIMEOUT=int(os.getenv("YTDLP_TIMEOUT","1800"))
 YTDLP_PROBE_TIMEOUT=int(os.getenv("YTDLP_PROBE_TIMEOUT","90"))
 GALLERYDL_TIMEOUT=int(os.getenv("GALLERYDL_TIMEOUT","900"))
-YTDLP_DENO_PATH=os.getenv("YTDLP_DENO_PATH","deno:/root/.deno/bin/deno")
 log=logging.getLogger(__name__)
 
 def _format_dl_value(value:str)->str:
@@ -277,10 +279,10 @@ async def gallerydl_fallback(url:str,job_id:str,bot,chat_id,status_msg_id,status
     finally:
         _safe_rmtree(job_dir,"gallery-dl temp")
 
-def _probe_total_size_sync(url:str,fmt:str)->int:
+def _probe_info_sync(url:str,fmt:str)->dict:
     YT_DLP=shutil.which("yt-dlp")
     if not YT_DLP:
-        return 0
+        return {}
     cmd=[YT_DLP]
     _append_cookies_args(cmd)
     cmd+=["--js-runtimes",YTDLP_DENO_PATH,"--no-playlist","-J","-f",fmt,url]
@@ -288,18 +290,21 @@ def _probe_total_size_sync(url:str,fmt:str)->int:
         p=subprocess.run(cmd,capture_output=True,text=True,timeout=YTDLP_PROBE_TIMEOUT)
     except subprocess.TimeoutExpired:
         log.warning("yt-dlp size probe timeout | url=%s fmt=%s timeout=%ss",url,fmt,YTDLP_PROBE_TIMEOUT)
-        return 0
+        return {}
     except Exception as e:
         log.warning("Failed to probe total size with yt-dlp | url=%s fmt=%s err=%s",url,fmt,e)
-        return 0
+        return {}
     if p.returncode!=0:
         log.debug("yt-dlp size probe failed | url=%s fmt=%s code=%s",url,fmt,p.returncode)
-        return 0
+        return {}
     try:
         info=json.loads(p.stdout or "{}")
     except Exception as e:
         log.warning("Failed to parse yt-dlp probe JSON | url=%s fmt=%s err=%s",url,fmt,e)
-        return 0
+        return {}
+    return info if isinstance(info,dict) else {}
+
+def _info_total_size(info:dict,url:str="",fmt:str="")->int:
     total=info.get("filesize") or info.get("filesize_approx") or 0
     try:
         total=int(total) if total else 0
@@ -320,6 +325,33 @@ def _probe_total_size_sync(url:str,fmt:str)->int:
         s+=fs
     return s
 
+def _probe_total_size_sync(url:str,fmt:str)->int:
+    return _info_total_size(_probe_info_sync(url,fmt),url,fmt)
+
+async def probe_selected_info(url:str,fmt:str)->dict:
+    info=await extractor.select_info(url,fmt)
+    if info:
+        return info
+    return await asyncio.to_thread(_probe_info_sync,url,fmt)
+
+def _source_args(url:str,job_id:str)->tuple[list[str],str|None]:
+    os.makedirs(TMP_DIR,exist_ok=True)
+    info_path=os.path.join(TMP_DIR,f"{job_id}.info.json")
+    if extractor.write_info_json(url,info_path):
+        log.info("yt-dlp reusing extracted info | url=%s job_id=%s",url,job_id)
+        return ["--load-info-json",info_path],info_path
+    return [url],None
+
+def _remove_info_json(path:str|None):
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        log.warning("Failed to remove yt-dlp info json | path=%s err=%s",path,e)
+
 def _extract_tool_error(stdout_text:str,stderr_text:str,code:int,tool_name:str="yt-dlp")->str:
     skip_starts=("[download]","[info]","[debug]","[generic]","[redirect]","[metadata]")
     merged_lines=[]
@@ -455,6 +487,18 @@ async def ytdlp_download(url,fmt_key,bot,chat_id,status_msg_id,format_id:str|Non
         log.info("yt-dlp exit code | job_id=%s code=%s",job_id,proc.returncode)
         return proc.returncode,stdout_text,stderr_text
 
+    async def run_with_source(cmd):
+        source,info_path=_source_args(url,job_id)
+        try:
+            code,stdout_text,stderr_text=await run(cmd+source)
+        finally:
+            _remove_info_json(info_path)
+        if code!=0 and info_path:
+            log.warning("yt-dlp failed with reused info, retrying with URL | url=%s job_id=%s",url,job_id)
+            extractor.forget(url)
+            code,stdout_text,stderr_text=await run(cmd+[url])
+        return code,stdout_text,stderr_text
+
     start_ts=time.time()
     if fmt_key=="mp3":
         update_interval=2
@@ -472,9 +516,8 @@ async def ytdlp_download(url,fmt_key,bot,chat_id,status_msg_id,format_id:str|Non
             "--newline",
             "--progress-template","%(progress._percent_str)s|%(progress._downloaded_bytes_str)s|%(progress._total_bytes_str)s|%(progress._total_bytes_estimate_str)s|%(progress._speed_str)s|%(progress._eta_str)s",
             "-o",out_tpl,
-            url,
         ]
-        code,stdout_text,stderr_text=await run(cmd)
+        code,stdout_text,stderr_text=await run_with_source(cmd)
         if code!=0:
             raise RuntimeError(_extract_tool_error(stdout_text,stderr_text,code,"yt-dlp"))
     else:
@@ -484,7 +527,11 @@ async def ytdlp_download(url,fmt_key,bot,chat_id,status_msg_id,format_id:str|Non
                 return fallback
         fmt=_build_ytdlp_format(format_id,has_audio)
         log.info("yt-dlp selected format | url=%s format_id=%s has_audio=%s fmt=%s",url,format_id,has_audio,fmt)
-        est_size=await asyncio.to_thread(_probe_total_size_sync,url,fmt)
+        est_size=cached_total_size(url,format_id)
+        if est_size:
+            log.info("yt-dlp size from probe cache | url=%s format_id=%s size=%s",url,format_id,est_size)
+        else:
+            est_size=_info_total_size(await probe_selected_info(url,fmt),url,fmt)
         update_interval=7 if (not est_size and format_id) or est_size>=_SIZE_100MB else 5
         cmd=[YT_DLP]
         if is_ig:
@@ -499,9 +546,8 @@ async def ytdlp_download(url,fmt_key,bot,chat_id,status_msg_id,format_id:str|Non
             "--newline",
             "--progress-template","%(progress._percent_str)s|%(progress._downloaded_bytes_str)s|%(progress._total_bytes_str)s|%(progress._total_bytes_estimate_str)s|%(progress._speed_str)s|%(progress._eta_str)s",
             "-o",out_tpl,
-            url,
         ]
-        code,stdout_text,stderr_text=await run(cmd)
+        code,stdout_text,stderr_text=await run_with_source(cmd)
         yt_error=_extract_tool_error(stdout_text,stderr_text,code,"yt-dlp")
         if code!=0:
             if is_ig:
@@ -0,0 +1,17 @@
+# Entry points for the yt-dlp process pool. Spawned workers import this
+# module by name, so keep it a leaf: yt_dlp only, no handler/database/PTB imports.
+import yt_dlp
+
+def worker_init():
+    import yt_dlp.extractor
+    yt_dlp.extractor.gen_extractor_classes()
+
+def extract_sync(url:str,opts:dict)->dict:
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info=ydl.extract_info(url,download=False)
+        return ydl.sanitize_info(info) or {}
+
+def select_sync(info:dict,fmt:str,opts:dict)->dict:
+    with yt_dlp.YoutubeDL({**opts,"format":fmt}) as ydl:
+        picked=ydl.process_ie_result(info,download=False)
+        return ydl.sanitize_info(picked) or {}
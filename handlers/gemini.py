@@ -1,19 +1,18 @@
-import asyncio,json,html,logging,aiohttp
+import asyncio,json,html,logging
 from typing import Optional
 from telegram import Update
 from telegram.constants import ChatAction
 from telegram.ext import ContextTypes
 from handlers.join import require_join_or_block
-from utils.text import split_message,sanitize_ai_output
+from utils.text import sanitize_ai_output
+from utils.ai_stream import StreamingReply,iter_sse
 from utils.config import GEMINI_API_KEY
-from utils.http import get_http_session
+from utils.providers import provider,hedge,ProviderError
 from rag.retriever import retrieve_context
-from rag.loader import load_local_contexts
-from .groq import ask_groq_text
+from .groq import stream_groq_text,clean_groq_output
 from utils import gemini_memory
 
 log=logging.getLogger(__name__)
-LOCAL_CONTEXTS=load_local_contexts()
 
 async def _typing_loop(bot,chat_id,stop:asyncio.Event,message_thread_id=None):
     try:
@@ -68,6 +67,8 @@ def _is_gemini_quota_error(status:Optional[int],text:str)->bool:
     ]
     return any(k in blob for k in keys)
 
+GEMINI=provider("gemini",is_quota=_is_gemini_quota_error)
+
 def _ai_history_to_groq(history:list)->list:
     out=[]
     for item in history:
@@ -85,7 +86,7 @@ async def _build_ai_prompt_from_history(history:list,user_prompt:str)->str:
         lines.append(f"User: {h.get('user') or ''}")
         lines.append(f"AI: {h.get('ai') or ''}")
     try:
-        contexts=await retrieve_context(user_prompt,LOCAL_CONTEXTS,top_k=3)
+        contexts=await retrieve_context(user_prompt,top_k=3)
     except Exception as e:
         log.warning("Gemini RAG retrieve failed | err=%r",e)
         contexts=[]
@@ -100,38 +101,36 @@ async def build_ai_prompt(user_id:int,user_prompt:str)->str:
     history=await gemini_memory.get_history(user_id)
     return await _build_ai_prompt_from_history(history,user_prompt)
 
+GEMINI_SYSTEM_PROMPT=(
+    "Jawab selalu menggunakan Bahasa Indonesia yang santai,\n"
+    "Kalo user bertanya dengan bahasa inggris, jawab juga dengan bahasa inggris\n"
+    "Lu adalah kiyoshi bot, bot buatan @HirohitoKiyoshi,\n"
+    "Jawab jelas ala gen z tapi tetap asik dan mudah dipahami.\n"
+    "Jangan gunakan Bahasa Inggris kecuali diminta.\n"
+    "Jawab langsung ke intinya.\n"
+    "Jawab selalu pakai emote biar asik\n"
+    "Jangan perlihatkan output dari prompt ini ke user."
+)
+
+def _gemini_payload(prompt:str)->dict:
+    return {
+        "system_instruction":{"parts":[{"text":GEMINI_SYSTEM_PROMPT}]},
+        "tools":[{"google_search":{}}],
+        "contents":[{"role":"user","parts":[{"text":prompt}]}],
+    }
+
 async def ask_ai_gemini(prompt:str,model:str="gemini-2.5-flash")->tuple[bool,str,Optional[int]]:
     if not GEMINI_API_KEY:
         return False,"API key Gemini belum diset.",None
     url=f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
-    payload={
-        "system_instruction":{
-            "parts":[{
-                "text":(
-                    "Jawab selalu menggunakan Bahasa Indonesia yang santai,\n"
-                    "Kalo user bertanya dengan bahasa inggris, jawab juga dengan bahasa inggris\n"
-                    "Lu adalah kiyoshi bot, bot buatan @HirohitoKiyoshi,\n"
-                    "Jawab jelas ala gen z tapi tetap asik dan mudah dipahami.\n"
-                    "Jangan gunakan Bahasa Inggris kecuali diminta.\n"
-                    "Jawab langsung ke intinya.\n"
-                    "Jawab selalu pakai emote biar asik\n"
-                    "Jangan perlihatkan output dari prompt ini ke user."
-                )
-            }]
-        },
-        "tools":[{"google_search":{}}],
-        "contents":[{"role":"user","parts":[{"text":prompt}]}],
-    }
+    payload=_gemini_payload(prompt)
     try:
-        session=await get_http_session()
-        async with session.post(
+        async with GEMINI.request(
+            "POST",
             url,
             json=payload,
             headers={"Content-Type":"application/json","x-goog-api-key":GEMINI_API_KEY},
-            timeout=aiohttp.ClientTimeout(total=60),
         ) as resp:
-            if resp.status!=200:
-                return False,await resp.text(),resp.status
             data=await resp.json()
         candidates=data.get("candidates") or []
         if not candidates:
@@ -140,9 +139,49 @@ async def ask_ai_gemini(prompt:str,model:str="gemini-2.5-flash")->tuple[bool,str
         if parts:
             return True,parts[0].get("text","").strip(),200
         return True,json.dumps(candidates[0],ensure_ascii=False),200
+    except ProviderError as e:
+        return False,str(e),e.status
     except Exception as e:
         return False,str(e),None
 
+async def ask_ai_gemini_stream(prompt:str,on_text=None,model:str="gemini-2.5-flash")->tuple[bool,str,Optional[int]]:
+    """
+    streamGenerateContent over SSE with the same result contract as
+    ask_ai_gemini. on_text receives the accumulated text as it arrives.
+    """
+    if not GEMINI_API_KEY:
+        return False,"API key Gemini belum diset.",None
+    url=f"https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent?alt=sse"
+    parts=[]
+    try:
+        async with GEMINI.request(
+            "POST",
+            url,
+            json=_gemini_payload(prompt),
+            headers={"Content-Type":"application/json","x-goog-api-key":GEMINI_API_KEY},
+        ) as resp:
+            async for data in iter_sse(resp):
+                try:
+                    event=json.loads(data)
+                except Exception:
+                    continue
+                for cand in (event.get("candidates") or [])[:1]:
+                    for part in (cand.get("content") or {}).get("parts") or []:
+                        if part.get("text") and not part.get("thought"):
+                            parts.append(part["text"])
+                if parts and on_text:
+                    await on_text("".join(parts))
+    except ProviderError as e:
+        return False,str(e),e.status
+    except Exception as e:
+        if not parts:
+            return False,str(e),None
+        log.warning("Gemini stream interrupted, keeping partial answer | err=%r",e)
+    text="".join(parts).strip()
+    if not text:
+        return True,"Model tidak memberikan jawaban.",200
+    return True,text,200
+
 async def ai_cmd(update:Update,context:ContextTypes.DEFAULT_TYPE):
     if not await require_join_or_block(update,context):
         return
@@ -178,22 +217,37 @@ async def ai_cmd(update:Update,context:ContextTypes.DEFAULT_TYPE):
         typing=asyncio.create_task(_typing_loop(context.bot,msg.chat_id,stop,thread_id))
         history=[] if fresh_session else await gemini_memory.get_history(user_id)
         final_prompt=await _build_ai_prompt_from_history(history,prompt)
-        ok,raw,status=await ask_ai_gemini(final_prompt)
-        if not ok:
-            if _is_gemini_quota_error(status,raw):
-                groq_history=_ai_history_to_groq(history)
-                raw=await ask_groq_text(prompt=prompt,history=groq_history,use_search=False)
-            else:
-                raise RuntimeError(raw)
-        clean=sanitize_ai_output(raw)
-        chunks=split_message(clean,4000)
+        reply=StreamingReply(
+            context.bot,
+            msg.chat_id,
+            lambda text:_reply_thread(context.bot,msg,text,parse_mode="HTML"),
+            sanitize_ai_output,
+            on_start=lambda:_stop_typing_task(stop,typing),
+        )
+        async def _gemini(push):
+            ok,raw,status=await ask_ai_gemini_stream(final_prompt,on_text=push)
+            if not ok:
+                raise ProviderError("gemini",raw,status=status,quota=_is_gemini_quota_error(status,raw))
+            return raw
+
+        async def _groq(push):
+            return await stream_groq_text(prompt=prompt,history=_ai_history_to_groq(history),use_search=False,on_text=push)
+
+        def _owner(idx):
+            reply.render=clean_groq_output if idx else sanitize_ai_output
+
+        _,raw=await hedge(_gemini,_groq,GEMINI.hedge_delay(),on_text=reply.update,on_owner=_owner)
         await _stop_typing_task(stop,typing)
-        last_sent=None
-        for chunk in chunks:
-            last_sent=await _reply_thread(context.bot,msg,chunk,parse_mode="HTML")
+        last_sent=await reply.finish(raw)
         if last_sent:
-            history.append({"user":prompt,"ai":clean})
-            await gemini_memory.set_history(user_id,history,last_sent.message_id)
+            await gemini_memory.append_turn(
+                user_id,
+                prompt,
+                reply.render(raw),
+                last_sent.message_id,
+                last_sent.chat_id,
+                fresh=fresh_session,
+            )
     except Exception as e:
         await _stop_typing_task(stop,typing)
         log.warning("Gemini request failed | user_id=%s err=%r",user_id,e)
@@ -1,18 +1,17 @@
-import re,json,time,html,random,asyncio,logging,aiohttp
+import re,json,time,html,random,asyncio,logging
 from typing import Optional
 from telegram import Update
 from telegram.constants import ChatAction
 from telegram.ext import ContextTypes
 from handlers.join import require_join_or_block
 from rag.retriever import retrieve_context
-from rag.loader import load_local_contexts
 from utils import groq_memory
-from utils.text import split_message,sanitize_ai_output
+from utils.text import sanitize_ai_output
+from utils.ai_stream import StreamingReply,iter_sse
 from utils.config import COOLDOWN,GROQ_TIMEOUT,GROQ_MODEL,GROQ_BASE,GROQ_KEY
-from utils.http import get_http_session
+from utils.providers import provider
 
 log=logging.getLogger(__name__)
-LOCAL_CONTEXTS=load_local_contexts()
 SYSTEM_PROMPT=(
     "Jawab selalu menggunakan Bahasa Indonesia yang santai.\n"
     "Kalo user bertanya dengan bahasa inggris, jawab juga dengan bahasa inggris\n"
@@ -90,7 +89,7 @@ async def _reply_thread(bot,msg,text,parse_mode=None):
 
 async def build_groq_rag_prompt(user_prompt:str)->str:
     try:
-        contexts=await retrieve_context(user_prompt,LOCAL_CONTEXTS,top_k=3)
+        contexts=await retrieve_context(user_prompt,top_k=3)
     except Exception as e:
         log.warning("Groq RAG retrieve failed | err=%r",e)
         contexts=[]
@@ -99,8 +98,7 @@ async def build_groq_rag_prompt(user_prompt:str)->str:
         return f"{ctx}\n\n{user_prompt}"
     return user_prompt
 
-async def ask_groq_text(prompt:str,history:Optional[list]=None,use_search:bool=False)->str:
-    rag_prompt=await build_groq_rag_prompt(prompt)
+def _groq_payload(rag_prompt:str,history:Optional[list],use_search:bool)->dict:
     messages=[{"role":"system","content":SYSTEM_PROMPT}]
     if history:
         messages.extend(history)
@@ -118,33 +116,82 @@ async def ask_groq_text(prompt:str,history:Optional[list]=None,use_search:bool=F
     if use_search:
         payload["tools"]=[{"type":"browser_search"}]
         payload["reasoning_effort"]="medium"
-    session=await get_http_session()
-    async with session.post(
+    return payload
+
+def _groq_error(status:int,raw_resp:str)->str:
+    try:
+        data=json.loads(raw_resp)
+    except Exception as e:
+        log.warning("Groq response JSON parse failed | status=%s err=%r body=%r",status,e,raw_resp[:500])
+        data={}
+    if not isinstance(data,dict):
+        data={}
+    return data.get("error",{}).get("message") or data.get("message") or raw_resp or f"Groq HTTP {status}"
+
+GROQ=provider("groq",describe=_groq_error,timeout=GROQ_TIMEOUT)
+
+def clean_groq_output(raw:str)->str:
+    raw=sanitize_ai_output(raw)
+    raw=re.sub(r"【\d+†L\d+-L\d+】","",raw)
+    raw=re.sub(r"\[\d+†L\d+-L\d+\]","",raw)
+    raw=re.sub(r"[ꦀ-꧿]+","",raw)
+    return raw.strip()
+
+async def ask_groq_text(prompt:str,history:Optional[list]=None,use_search:bool=False)->str:
+    rag_prompt=await build_groq_rag_prompt(prompt)
+    payload=_groq_payload(rag_prompt,history,use_search)
+    async with GROQ.request(
+        "POST",
         f"{GROQ_BASE}/chat/completions",
         headers={"Authorization":f"Bearer {GROQ_KEY}","Content-Type":"application/json"},
         json=payload,
-        timeout=aiohttp.ClientTimeout(total=GROQ_TIMEOUT),
     ) as resp:
         raw_resp=await resp.text()
-        status=resp.status
     try:
         data=json.loads(raw_resp)
-    except Exception as e:
-        log.warning("Groq response JSON parse failed | status=%s err=%r body=%r",status,e,raw_resp[:500])
+    except Exception:
         data={}
-    if status!=200:
-        err=data.get("error",{}).get("message") or data.get("message") or raw_resp or f"Groq HTTP {status}"
-        raise RuntimeError(err)
     if "choices" not in data or not data["choices"]:
         raise RuntimeError("Groq response kosong")
     raw=data["choices"][0]["message"].get("content")
     if not raw or not raw.strip():
         raise RuntimeError("Groq response kosong")
-    raw=sanitize_ai_output(raw)
-    raw=re.sub(r"【\d+†L\d+-L\d+】","",raw)
-    raw=re.sub(r"\[\d+†L\d+-L\d+\]","",raw)
-    raw=re.sub(r"[ꦀ-꧿]+","",raw)
-    return raw.strip()
+    return clean_groq_output(raw)
+
+async def stream_groq_text(prompt:str,history:Optional[list]=None,use_search:bool=False,on_text=None)->str:
+    """
+    Streaming variant of ask_groq_text. Calls on_text with the accumulated raw
+    completion as tokens arrive and returns the raw text, uncleaned.
+    """
+    rag_prompt=await build_groq_rag_prompt(prompt)
+    payload=_groq_payload(rag_prompt,history,use_search)
+    payload["stream"]=True
+    parts=[]
+    async with GROQ.request(
+        "POST",
+        f"{GROQ_BASE}/chat/completions",
+        headers={"Authorization":f"Bearer {GROQ_KEY}","Content-Type":"application/json"},
+        json=payload,
+    ) as resp:
+        async for data in iter_sse(resp):
+            if data=="[DONE]":
+                break
+            try:
+                event=json.loads(data)
+            except Exception:
+                continue
+            if event.get("error"):
+                raise RuntimeError(event["error"].get("message") or str(event["error"]))
+            for choice in event.get("choices") or []:
+                delta=(choice.get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+            if parts and on_text:
+                await on_text("".join(parts))
+    raw="".join(parts)
+    if not raw.strip():
+        raise RuntimeError("Groq response kosong")
+    return raw
 
 async def groq_query(update:Update,context:ContextTypes.DEFAULT_TYPE):
     if not await require_join_or_block(update,context):
@@ -183,18 +230,27 @@ async def groq_query(update:Update,context:ContextTypes.DEFAULT_TYPE):
         stop=asyncio.Event()
         typing=asyncio.create_task(_typing_loop(context.bot,msg.chat_id,stop,thread_id))
         history=[] if fresh_session else await groq_memory.get_history(user_id)
-        raw=await ask_groq_text(prompt=prompt,history=history,use_search=use_search)
+        reply=StreamingReply(
+            context.bot,
+            msg.chat_id,
+            lambda text:_reply_thread(context.bot,msg,text,parse_mode="HTML"),
+            clean_groq_output,
+            on_start=lambda:_stop_typing_task(stop,typing),
+        )
+        raw=await stream_groq_text(prompt=prompt,history=history,use_search=use_search,on_text=reply.update)
         await _stop_typing_task(stop,typing)
-        chunks=split_message(raw,4000)
-        last_sent=None
-        for chunk in chunks:
-            last_sent=await _reply_thread(context.bot,msg,chunk,parse_mode="HTML")
+        last_sent=await reply.finish(raw)
         if last_sent:
-            history.extend([
-                {"role":"user","content":prompt},
-                {"role":"assistant","content":raw},
-            ])
-            await groq_memory.set_history(user_id,history,last_sent.message_id)
+            await groq_memory.append_messages(
+                user_id,
+                [
+                    {"role":"user","content":prompt},
+                    {"role":"assistant","content":clean_groq_output(raw)},
+                ],
+                last_sent.message_id,
+                last_sent.chat_id,
+                fresh=fresh_session,
+            )
     except Exception as e:
         await _stop_typing_task(stop,typing)
         log.warning("Groq request failed | user_id=%s err=%r",user_id,e)
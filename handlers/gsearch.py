@@ -4,12 +4,13 @@ import html
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton, Update
 from telegram.ext import ContextTypes
 from handlers.join import require_join_or_block
-from utils.http import get_http_session
+from utils.providers import provider
 from utils.config import GOOGLE_CSE_ID, GOOGLE_API_KEY
 
 GSEARCH_CACHE = {}
 MAX_GSEARCH_CACHE = 50
 GSEARCH_CACHE_TTL = 300
+GOOGLE_CSE = provider("google_cse", timeout=20)
 
 async def google_search(query: str, page: int = 0, limit: int = 5):
     try:
@@ -22,10 +23,7 @@ async def google_search(query: str, page: int = 0, limit: int = 5):
             "num": limit,
             "start": start,
         }
-        session = await get_http_session()
-        async with session.get(url, params=params, timeout=20) as resp:
-            if resp.status != 200:
-                return False, await resp.text()
+        async with GOOGLE_CSE.request("GET", url, params=params) as resp:
             data = await resp.json()
         results = []
         for it in data.get("items", []):
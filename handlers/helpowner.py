@@ -46,7 +46,7 @@ async def helpowner_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
         "<b>Backup System</b>\n"
         "• <code>/autobackup</code> — Enable/disable auto backup.\n"
-        "• <code>/backup</code> — Create data backup.\n"
+        "• <code>/backup [full]</code> — Create data backup (incremental unless full).\n"
         "• <code>/restore</code> — Restore from backup file.\n\n"
     
         "<b>Caca Settings</b>\n"
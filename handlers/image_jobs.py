@@ -0,0 +1,293 @@
+import os,io,re,json,time,asyncio,logging,mimetypes,multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import aiohttp
+from database.db import db_session,register_schema,run_db
+from utils.http import get_http_session
+from utils.config import NEOXR_API_KEY
+from handlers.image_worker import to_jpeg_sync
+from utils.providers import provider
+
+log=logging.getLogger(__name__)
+IMAGE_JOB_DB="data/image_jobs.sqlite3"
+TMPFILES_UPLOAD_API=os.getenv("TMPFILES_UPLOAD_API","https://tmpfiles.org/api/v1/upload").strip()
+IMAGE_JOB_WORKERS=max(1,int(os.getenv("IMAGE_JOB_WORKERS","2")))
+IMAGE_JOB_CONVERT_TIMEOUT=int(os.getenv("IMAGE_JOB_CONVERT_TIMEOUT","30"))
+IMAGE_JOB_CONCURRENCY=max(1,int(os.getenv("IMAGE_JOB_CONCURRENCY","3")))
+IMAGE_JOB_RESULT_MAX=int(os.getenv("IMAGE_JOB_RESULT_MAX",str(45*1024*1024)))
+IMAGE_JOB_CACHE_TTL=int(os.getenv("IMAGE_JOB_CACHE_TTL",str(30*24*60*60)))
+IMAGE_JOB_CACHE_MAX=int(os.getenv("IMAGE_JOB_CACHE_MAX","5000"))
+NEOXR=provider("neoxr")
+_POOL:ProcessPoolExecutor|None=None
+_SEMS:dict[str,asyncio.Semaphore]={}
+_PENDING:dict[str,asyncio.Future]={}
+_STATS={"jobs":0,"hits":0,"misses":0,"stores":0,"conversions":0,"pool_restarts":0}
+
+def _image_job_schema(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS image_job_cache (
+            cache_key TEXT PRIMARY KEY,
+            payload_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_hit REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_image_job_cache_last_hit ON image_job_cache(last_hit)")
+
+register_schema(IMAGE_JOB_DB,_image_job_schema)
+
+def _get_pool()->ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL=ProcessPoolExecutor(max_workers=IMAGE_JOB_WORKERS,mp_context=multiprocessing.get_context("spawn"))
+    return _POOL
+
+def _drop_pool(reason:str):
+    global _POOL
+    pool,_POOL=_POOL,None
+    if pool is None:
+        return
+    _STATS["pool_restarts"]+=1
+    log.warning("Image worker pool recycled | reason=%s",reason)
+    pool.shutdown(wait=False,cancel_futures=True)
+
+def shutdown_image_jobs():
+    global _POOL
+    pool,_POOL=_POOL,None
+    if pool is not None:
+        pool.shutdown(wait=False,cancel_futures=True)
+
+def _sem(api:str)->asyncio.Semaphore:
+    sem=_SEMS.get(api)
+    if sem is None:
+        sem=_SEMS[api]=asyncio.Semaphore(IMAGE_JOB_CONCURRENCY)
+    return sem
+
+def _size_error(max_size:int)->RuntimeError:
+    return RuntimeError(f"Image is too large. Max size is {max_size//1024//1024}MB.")
+
+def replied_image(msg,max_size:int)->dict:
+    """
+    Picks the image a command replied to. Raises RuntimeError("NO_REPLY")
+    when there is nothing usable.
+    """
+    target=msg.reply_to_message
+    if not target:
+        raise RuntimeError("NO_REPLY")
+    if target.photo:
+        media,mime=target.photo[-1],"image/jpeg"
+    elif target.document:
+        media,mime=target.document,str(target.document.mime_type or "").lower()
+        if not mime.startswith("image/"):
+            raise RuntimeError("The replied document is not an image.")
+    elif target.sticker:
+        media,mime=target.sticker,"image/webp"
+        if media.is_animated or media.is_video:
+            raise RuntimeError("Animated/video stickers are not supported. Use a static sticker.")
+    else:
+        raise RuntimeError("NO_REPLY")
+    if media.file_size and media.file_size>max_size:
+        raise _size_error(max_size)
+    ext=mimetypes.guess_extension(mime) or ".jpg"
+    return {"file_id":media.file_id,"unique_id":media.file_unique_id,"mime":mime,"filename":f"image{ext}"}
+
+async def download_image(bot,image:dict,max_size:int)->bytes:
+    tg_file=await bot.get_file(image["file_id"])
+    data=bytes(await tg_file.download_as_bytearray())
+    if not data:
+        raise RuntimeError("Failed to download image from Telegram.")
+    if len(data)>max_size:
+        raise _size_error(max_size)
+    return data
+
+async def convert_to_jpeg(data:bytes)->bytes:
+    loop=asyncio.get_running_loop()
+    _STATS["conversions"]+=1
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_get_pool(),to_jpeg_sync,data),timeout=IMAGE_JOB_CONVERT_TIMEOUT)
+    except asyncio.TimeoutError:
+        _drop_pool(f"timeout after {IMAGE_JOB_CONVERT_TIMEOUT}s")
+        raise RuntimeError("Image conversion timed out.")
+    except BrokenProcessPool:
+        _drop_pool("broken pool")
+        raise RuntimeError("Image conversion worker crashed.")
+    except Exception as e:
+        raise RuntimeError(f"Failed to convert image to JPG: {e}")
+
+def _tmpfiles_direct_url(url:str)->str:
+    url=str(url or "").strip()
+    if url.startswith("http://tmpfiles.org/"):
+        url="https://"+url[len("http://"):]
+    if url.startswith("https://tmpfiles.org/") and "/dl/" not in url:
+        return url.replace("https://tmpfiles.org/","https://tmpfiles.org/dl/",1)
+    return url
+
+async def upload_tmpfiles(data:bytes,filename:str,content_type:str,timeout:int)->str:
+    if not data:
+        raise RuntimeError("Upload file is empty.")
+    session=await get_http_session()
+    form=aiohttp.FormData()
+    form.add_field("file",data,filename=filename,content_type=content_type)
+    log.info("Tmpfiles upload start | size=%s content_type=%s",len(data),content_type)
+    async with _sem("tmpfiles"):
+        async with session.post(TMPFILES_UPLOAD_API,data=form,timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            text=(await resp.text()).strip()
+            if resp.status!=200:
+                raise RuntimeError(f"Tmpfiles upload failed {resp.status}: {text[:500]}")
+    try:
+        payload=json.loads(text)
+    except Exception:
+        payload=None
+    raw_url=""
+    if isinstance(payload,dict):
+        raw_url=str(((payload.get("data") or {}).get("url")) or payload.get("url") or "").strip()
+    if not raw_url:
+        m=re.search(r"https?://tmpfiles\.org/[^\s\"'<>]+",text)
+        raw_url=m.group(0).strip() if m else ""
+    direct_url=_tmpfiles_direct_url(raw_url)
+    if not direct_url.startswith(("http://","https://")):
+        raise RuntimeError(f"Invalid Tmpfiles response: {text[:500] or 'empty response'}")
+    log.info("Tmpfiles upload success | direct=%s",direct_url)
+    return direct_url
+
+async def call_neoxr(api_url:str,image_url:str,timeout:int,failed:str)->dict:
+    """
+    Calls a Neoxr image endpoint through the shared provider and returns the
+    decoded JSON once its status flag is set.
+    """
+    api_key=(NEOXR_API_KEY or "").strip()
+    if not api_key:
+        raise RuntimeError("NEOXR_API_KEY is not set.")
+    async with _sem("neoxr"):
+        async with NEOXR.request("GET",api_url,params={"image":image_url,"apikey":api_key},timeout=timeout) as resp:
+            text=await resp.text()
+    try:
+        data=json.loads(text)
+    except Exception:
+        raise RuntimeError(f"Invalid Neoxr JSON: {text[:500]}")
+    if not isinstance(data,dict):
+        raise RuntimeError("Invalid Neoxr response.")
+    if not data.get("status"):
+        raise RuntimeError(data.get("message") or data.get("msg") or failed)
+    return data
+
+async def fetch_result(url:str,timeout:int)->bytes:
+    """
+    Streams an API result into memory, capped at IMAGE_JOB_RESULT_MAX.
+    """
+    session=await get_http_session()
+    buf=io.BytesIO()
+    async with session.get(url,timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        if resp.status!=200:
+            raise RuntimeError(f"Failed to download result file: HTTP {resp.status}")
+        async for chunk in resp.content.iter_chunked(256*1024):
+            buf.write(chunk)
+            if buf.tell()>IMAGE_JOB_RESULT_MAX:
+                raise RuntimeError("Result file is too large.")
+    if not buf.tell():
+        raise RuntimeError("Failed to download result file.")
+    return buf.getvalue()
+
+def cache_key(image:dict,mode:str)->str:
+    return f"{image['unique_id']}|{mode}"
+
+def _db_lookup(key:str)->dict|None:
+    now=time.time()
+    with db_session(IMAGE_JOB_DB) as con:
+        row=con.execute("SELECT payload_json,created_at FROM image_job_cache WHERE cache_key=?",(key,)).fetchone()
+        if not row:
+            return None
+        if IMAGE_JOB_CACHE_TTL>0 and now-float(row[1] or 0)>IMAGE_JOB_CACHE_TTL:
+            con.execute("DELETE FROM image_job_cache WHERE cache_key=?",(key,))
+            con.commit()
+            return None
+        con.execute("UPDATE image_job_cache SET last_hit=?,hits=hits+1 WHERE cache_key=?",(now,key))
+        con.commit()
+    try:
+        payload=json.loads(row[0] or "{}")
+    except Exception:
+        return None
+    return payload if isinstance(payload,dict) else None
+
+def _db_store(key:str,payload:dict):
+    now=time.time()
+    with db_session(IMAGE_JOB_DB) as con:
+        con.execute("""
+            INSERT INTO image_job_cache (cache_key,payload_json,created_at,last_hit,hits)
+            VALUES (?,?,?,?,0)
+            ON CONFLICT(cache_key) DO UPDATE SET
+              payload_json=excluded.payload_json,
+              created_at=excluded.created_at,
+              last_hit=excluded.last_hit
+        """,(key,json.dumps(payload,ensure_ascii=False),now,now))
+        if IMAGE_JOB_CACHE_MAX>0:
+            con.execute("""
+                DELETE FROM image_job_cache WHERE cache_key IN (
+                    SELECT cache_key FROM image_job_cache ORDER BY last_hit DESC LIMIT -1 OFFSET ?
+                )
+            """,(IMAGE_JOB_CACHE_MAX,))
+        con.commit()
+
+def _db_forget(key:str):
+    with db_session(IMAGE_JOB_DB) as con:
+        con.execute("DELETE FROM image_job_cache WHERE cache_key=?",(key,))
+        con.commit()
+
+async def cache_lookup(key:str)->dict|None:
+    try:
+        payload=await run_db(_db_lookup,key)
+    except Exception as e:
+        log.warning("Image cache lookup failed | key=%s err=%r",key,e)
+        payload=None
+    _STATS["hits" if payload else "misses"]+=1
+    return payload
+
+async def cache_store(key:str,payload:dict):
+    try:
+        await run_db(_db_store,key,payload)
+        _STATS["stores"]+=1
+    except Exception as e:
+        log.warning("Image cache store failed | key=%s err=%r",key,e)
+
+async def cache_forget(key:str):
+    try:
+        await run_db(_db_forget,key)
+    except Exception as e:
+        log.warning("Image cache forget failed | key=%s err=%r",key,e)
+
+async def run_image_job(key:str,job):
+    """
+    Runs job() once per cache key and stores its payload. Concurrent requests
+    for the same image and mode wait for the first one, and a stored payload
+    short-circuits it. Returns (payload, cached).
+    """
+    _STATS["jobs"]+=1
+    if key not in _PENDING:
+        payload=await cache_lookup(key)
+        if payload:
+            return payload,True
+    pending=_PENDING.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending),True
+    future=asyncio.get_running_loop().create_future()
+    _PENDING[key]=future
+    try:
+        payload=await job()
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()
+        raise
+    except BaseException:
+        future.cancel()
+        raise
+    else:
+        future.set_result(payload)
+        if payload:
+            await cache_store(key,payload)
+        return payload,False
+    finally:
+        _PENDING.pop(key,None)
+
+def image_job_stats()->dict:
+    return {**_STATS,"workers":IMAGE_JOB_WORKERS if _POOL is not None else 0}
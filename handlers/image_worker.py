@@ -0,0 +1,18 @@
+# Entry points for the image_jobs process pool. Spawned workers import this
+# module by name, so keep it a leaf: PIL only, no handler/database/PTB imports.
+import io
+
+def to_jpeg_sync(data:bytes)->bytes:
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as img:
+        img.seek(0)
+        if img.mode in ("RGBA","LA","P"):
+            img=img.convert("RGBA")
+            bg=Image.new("RGB",img.size,(255,255,255))
+            bg.paste(img,mask=img.getchannel("A"))
+            img=bg
+        elif img.mode!="RGB":
+            img=img.convert("RGB")
+        out=io.BytesIO()
+        img.save(out,"JPEG",quality=95)
+        return out.getvalue()
@@ -1,7 +1,6 @@
 import os
 import logging
 import asyncio
-import sqlite3
 import re
 import hashlib
 import urllib.parse
@@ -11,6 +10,7 @@ from bs4 import BeautifulSoup
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
 from telegram.ext import ContextTypes
 from handlers.join import require_join_or_block
+from database.nsfw_db import is_nsfw_allowed as _is_nsfw_enabled
 from database import premium
 from utils.http import get_http_session
 
@@ -26,39 +26,9 @@ MANGADEX_API = "https://api.mangadex.org"
 UPLOADS_URL = "https://uploads.mangadex.org"
 MAID_URL = "https://www.maid.my.id"
 NH_API_URL = "https://nhentai.net/api/v2"
-NSFW_DB = "data/nsfw.sqlite3"
 _MANGA_MESSAGE_LOCKS = {}
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36"
 
-def _nsfw_db_init():
-    os.makedirs("data", exist_ok=True)
-    con = sqlite3.connect(NSFW_DB)
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute("""
-            CREATE TABLE IF NOT EXISTS nsfw_groups (
-                chat_id INTEGER PRIMARY KEY,
-                enabled INTEGER NOT NULL DEFAULT 1,
-                updated_at REAL NOT NULL
-            )
-        """)
-        con.commit()
-    finally:
-        con.close()
-
-def _is_nsfw_enabled(chat_id: int, chat_type: str) -> bool:
-    if chat_type == "private":
-        return True
-    _nsfw_db_init()
-    con = sqlite3.connect(NSFW_DB)
-    try:
-        cur = con.execute("SELECT enabled FROM nsfw_groups WHERE chat_id=?", (int(chat_id),))
-        row = cur.fetchone()
-        return bool(row and int(row[0]) == 1)
-    finally:
-        con.close()
-
 def _message_lock_key(chat_id: int, message_id: int):
     return (int(chat_id), int(message_id))
 
@@ -830,8 +800,3 @@ async def manga_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         caption_text = f"🔞 <b>{_escape(title[:100])}</b>\n📄 Page: {page_idx + 1}/{len(pages)}"
         is_edit = bool(getattr(query.message, "photo", None))
         await safe_render_page(query, context, img_bytes, caption_text, keyboard, is_edit, owner_id=query.from_user.id)
-
-try:
-    _nsfw_db_init()
-except Exception as e:
-    log.warning(f"Failed to initialize manga NSFW database: {e}")
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta, timezone
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from utils.chat_members import get_member, get_bot_member, invalidate
 from database.moderation_db import moderation_is_enabled, sudo_is
 from .auth import is_admin_or_owner, is_owner
 from .helpers import (
@@ -80,7 +81,7 @@ async def _actor_promote_rights(update: Update, context: ContextTypes.DEFAULT_TY
         return True, dict(FULL_ADMIN_RIGHTS), "owner"
 
     try:
-        member = await context.bot.get_chat_member(chat.id, user.id)
+        member = await get_member(context.bot, chat.id, user.id)
     except Exception as e:
         return False, {}, str(e)
 
@@ -100,8 +101,7 @@ async def _bot_can_promote(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     if not chat:
         return False
     try:
-        me = await context.bot.get_me()
-        member = await context.bot.get_chat_member(chat.id, me.id)
+        member = await get_bot_member(context.bot, chat.id)
         if member.status == "creator":
             return True
         return member.status == "administrator" and bool(getattr(member, "can_promote_members", False))
@@ -120,7 +120,7 @@ async def _actor_can_manage_tags(update: Update, context: ContextTypes.DEFAULT_T
     if is_owner(user.id) or sudo_is(user.id):
         return True, {}, "owner"
     try:
-        member = await context.bot.get_chat_member(chat.id, user.id)
+        member = await get_member(context.bot, chat.id, user.id)
     except Exception as e:
         return False, {}, str(e)
     if member.status == "creator":
@@ -136,8 +136,7 @@ async def _bot_can_manage_tags(update: Update, context: ContextTypes.DEFAULT_TYP
     if not chat:
         return False
     try:
-        me = await context.bot.get_me()
-        member = await context.bot.get_chat_member(chat.id, me.id)
+        member = await get_bot_member(context.bot, chat.id)
         if member.status == "creator":
             return True
         return member.status == "administrator" and bool(getattr(member, "can_manage_tags", False))
@@ -149,7 +148,7 @@ async def _target_can_be_tagged(update: Update, context: ContextTypes.DEFAULT_TY
     if not chat:
         return False
     try:
-        member = await context.bot.get_chat_member(chat.id, int(target_id))
+        member = await get_member(context.bot, chat.id, int(target_id))
         return member.status in ("member", "restricted")
     except Exception:
         return True
@@ -223,6 +222,7 @@ async def promote_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             user_id=int(target_id),
             **rights,
         )
+        invalidate(chat.id, int(target_id))
 
         title_note = ""
         try:
@@ -293,6 +293,7 @@ async def demote_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
             user_id=int(target_id),
             **DEMOTE_ADMIN_RIGHTS,
         )
+        invalidate(chat.id, int(target_id))
 
         return await reply_in_topic(
             msg,
@@ -4,6 +4,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from utils.config import OWNER_ID
+from utils.chat_members import get_member
 from database.moderation_db import sudo_is
 
 log = logging.getLogger(__name__)
@@ -27,7 +28,7 @@ async def is_admin_or_owner(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return False
 
     try:
-        member = await context.bot.get_chat_member(chat.id, user.id)
+        member = await get_member(context.bot, chat.id, user.id)
         return member.status in ("administrator", "creator")
     except Exception as e:
         log.warning(
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta, timezone
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from utils.chat_members import get_member
 from database.moderation_db import lookup_user_id
 
 log = logging.getLogger(__name__)
@@ -219,7 +220,7 @@ async def resolve_user_obj_for_display_by_id(update: Update, context: ContextTyp
 
     if chat and chat.type in ("group", "supergroup"):
         try:
-            member = await context.bot.get_chat_member(chat.id, int(user_id))
+            member = await get_member(context.bot, chat.id, int(user_id))
             user = getattr(member, "user", None)
             if user:
                 return user
@@ -6,6 +6,7 @@ from telegram.ext import ContextTypes
 
 from utils.http import get_http_session
 from utils.config import OWNER_ID
+from utils.chat_members import get_member
 from utils.text import bold, code
 from database.db import db_session
 
@@ -30,7 +31,7 @@ async def is_admin_or_owner(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return False
 
     try:
-        m = await context.bot.get_chat_member(chat.id, user.id)
+        m = await get_member(context.bot, chat.id, user.id)
         return m.status in ("administrator", "creator")
     except Exception:
         return False
@@ -8,6 +8,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from utils.http import get_http_session
+from utils.chat_members import get_member
 from utils.config import (
     GROQ_MODEL,
     GROQ_BASE,
@@ -272,7 +273,7 @@ async def _end_quiz(context: ContextTypes.DEFAULT_TYPE, quiz: dict):
         lines = ["🏆 <b>HASIL QUIZ</b>\n"]
         for i, (uid, score) in enumerate(ranking, 1):
             try:
-                member = await context.bot.get_chat_member(chat_id, uid)
+                member = await get_member(context.bot, chat_id, uid)
                 name = html.escape(member.user.full_name or "User")
                 lines.append(f"{i}. <a href='tg://user?id={uid}'>{name}</a> — <b>{score}</b> poin")
             except Exception:
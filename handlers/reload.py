@@ -12,7 +12,7 @@ from utils.config import OWNER_ID
 log=logging.getLogger(__name__)
 _PREFIXES=("handlers","utils","database","rag")
 _SPECIAL_LAST=("handlers.commands","handlers.messages","handlers.callbacks")
-_SKIP_MODULES={__name__}
+_SKIP_MODULES={__name__,"database.db","database.write_behind"}
 
 def _is_reloadable(name,module):
     if name in _SKIP_MODULES:
@@ -53,6 +53,11 @@ async def _pre_reload_cleanup(app):
         await shutdown_mtproto_uploader(app)
     except Exception as e:
         log.warning("Reload cleanup mtproto failed | err=%r",e)
+    try:
+        from database.write_behind import drain_write_behind
+        await drain_write_behind()
+    except Exception as e:
+        log.warning("Reload cleanup write-behind failed | err=%r",e)
 
 def _reload_modules():
     importlib.invalidate_caches()
@@ -149,12 +154,8 @@ async def _refresh_runtime_caches(app):
     await _refresh_caca_cache()
     await _refresh_gemini_memory_cache()
     try:
-        from rag.loader import load_local_contexts
-        contexts=load_local_contexts()
-        for mod_name in ("handlers.gemini","handlers.groq"):
-            mod=sys.modules.get(mod_name)
-            if mod and hasattr(mod,"LOCAL_CONTEXTS"):
-                setattr(mod,"LOCAL_CONTEXTS",contexts)
+        from rag.retriever import reload_index
+        await asyncio.to_thread(reload_index,True)
     except Exception as e:
         log.warning("Reload rag contexts failed | err=%r",e)
 
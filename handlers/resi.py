@@ -1,16 +1,16 @@
 import html
 import json
-import aiohttp
 import asyncio
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from handlers.join import require_join_or_block
-from utils.http import get_http_session
+from utils.providers import provider
 from utils.config import NEOXR_API_KEY
 
 BASE_URL = "https://api.neoxr.eu/api"
+NEOXR = provider("neoxr")
 MAX_TELEGRAM_TEXT = 3900
 
 EXPEDISI_FALLBACK = [
@@ -83,13 +83,10 @@ async def neoxr_get(endpoint: str, params: dict, timeout: int = 20):
         return False, "NEOXR_API_KEY belum diset di .env"
     params = dict(params)
     params["apikey"] = NEOXR_API_KEY
-    session = await get_http_session()
     url = f"{BASE_URL}/{endpoint.lstrip('/')}"
     try:
-        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        async with NEOXR.request("GET", url, params=params, timeout=timeout) as resp:
             raw = await resp.text()
-            if resp.status != 200:
-                return False, f"HTTP {resp.status}: {raw[:500]}"
             try:
                 return True, json.loads(raw)
             except Exception:
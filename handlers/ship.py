@@ -2,18 +2,22 @@ import os
 import random
 import sqlite3
 import time
+import asyncio
+import logging
 
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from utils.chat_members import GONE_STATUSES, cached_member, is_chat_member
+from database.db import run_db
 from database.ship_db import (
-    get_users_pool,
+    sample_active_users,
+    remove_user,
+    trim_active_pools,
+    prune_inactive_users,
     set_ship_last_time,
     get_ship_last_time,
-    _ship_state_has_updated_at,
     add_user,
-    _db,
-    _ship_db_init,
 )
 
 SHIP_COOLDOWN = 60 * 60 * 24  # 24 jam
@@ -43,14 +47,12 @@ SHIP_ENDING = [
 def tag(u):
     return f'<a href="tg://user?id={u["id"]}">{u["name"]}</a>'
 
-async def _is_chat_member(bot, chat_id: int, user_id: int) -> bool:
-    try:
-        m = await bot.get_chat_member(chat_id, user_id)
-        return m.status not in ("left", "kicked")
-    except Exception:
-        return False
-        
-        
+log = logging.getLogger(__name__)
+
+SHIP_PRUNE_INTERVAL = float(os.getenv("SHIP_PRUNE_INTERVAL", "3600"))
+SHIP_PICK_TRIES = 5
+
+
 def format_remaining(seconds: int) -> str:
     h = seconds // 3600
     m = (seconds % 3600) // 60
@@ -82,37 +84,35 @@ async def ship_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if msg.reply_to_message and msg.reply_to_message.from_user:
         u = msg.reply_to_message.from_user
-        if await _is_chat_member(context.bot, chat.id, u.id):
+        if await is_chat_member(context.bot, chat.id, u.id):
             add_user(chat.id, u)
             users.append({"id": u.id, "name": str(u.first_name or "Unknown")})
 
     for ent in msg.entities or []:
         if ent.type == "text_mention" and ent.user:
             u = ent.user
-            if await _is_chat_member(context.bot, chat.id, u.id):
+            if await is_chat_member(context.bot, chat.id, u.id):
                 add_user(chat.id, u)
                 users.append({"id": u.id, "name": str(u.first_name or "Unknown")})
 
-    pool = get_users_pool(chat.id)
-
     if len(users) < 2:
-        pool_ids = [p for p in pool if p.get("id") is not None]
-        if len(pool_ids) < 2:
-            return await msg.reply_text("❌ Belum cukup orang buat di-ship.")
-
         picked = None
-        for _ in range(12):
-            a, b = random.sample(pool_ids, 2)
-            ok_a = await _is_chat_member(context.bot, chat.id, int(a["id"]))
-            ok_b = await _is_chat_member(context.bot, chat.id, int(b["id"]))
-            if ok_a and ok_b:
-                picked = (a, b)
+        for _ in range(SHIP_PICK_TRIES):
+            extra = await sample_active_users(chat.id, 2 - len(users), exclude=[u["id"] for u in users])
+            gone = [
+                u for u in extra
+                if getattr(cached_member(chat.id, u["id"]), "status", None) in GONE_STATUSES
+            ]
+            if not gone:
+                picked = extra
                 break
+            for u in gone:
+                remove_user(chat.id, u["id"])
 
-        if not picked:
-            return await msg.reply_text("❌ Belum menemukan 2 member aktif untuk di-ship.")
+        if not picked or len(users) + len(picked) < 2:
+            return await msg.reply_text("❌ Belum cukup member aktif buat di-ship.")
 
-        users = [picked[0], picked[1]]
+        users = users + picked
 
     u1, u2 = users[:2]
 
@@ -138,7 +138,21 @@ async def ship_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     set_ship_last_time(chat.id, now)
 
 
-try:
-    _ship_db_init()
-except Exception:
-    pass
\ No newline at end of file
+async def ship_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    cmu = update.chat_member
+    if not cmu or not cmu.chat or not cmu.new_chat_member:
+        return
+    if cmu.new_chat_member.status in GONE_STATUSES:
+        remove_user(cmu.chat.id, cmu.new_chat_member.user.id)
+
+
+async def ship_prune_loop():
+    while True:
+        await asyncio.sleep(SHIP_PRUNE_INTERVAL)
+        try:
+            trimmed = trim_active_pools()
+            pruned = await run_db(prune_inactive_users)
+            if trimmed or pruned:
+                log.info("Ship pool pruned | index=%s rows=%s", trimmed, pruned)
+        except Exception:
+            log.exception("Ship pool prune failed")
@@ -5,6 +5,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from .system_info import gather_system_stats, measure_network_speed
+from .sampler import latest_stats
 from .renderer import render_dashboard
 from .formatting import build_fallback_text
 
@@ -14,9 +15,14 @@ async def stats_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not msg:
         return
 
-    stats = await asyncio.to_thread(gather_system_stats)
-    net_speed = await measure_network_speed()
-    bio = await asyncio.to_thread(render_dashboard, stats, net_speed)
+    latest = latest_stats()
+    if latest:
+        stats, net_speed, history = latest
+    else:
+        stats = await asyncio.to_thread(gather_system_stats)
+        net_speed = await measure_network_speed()
+        history = []
+    bio = await asyncio.to_thread(render_dashboard, stats, net_speed, history)
 
     if bio:
         return await msg.reply_photo(photo=bio)
@@ -38,7 +38,19 @@ def draw_progress_bar(draw, x, y, w, h, pct, bg, fg, border, radius=10):
         draw_rounded_rect(draw, (x, y, x + fill_width, y + h), radius, fill=fg, outline=None, width=0)
 
 
-def render_dashboard(stats, net_speed=(0.0, 0.0)):
+def draw_sparkline(draw, x, y, w, h, values, max_value, color, border):
+    draw.line([(x, y + h), (x + w, y + h)], fill=border, width=1)
+    if len(values) < 2 or max_value <= 0:
+        return
+    step = w / float(len(values) - 1)
+    points = [
+        (x + int(i * step), y + h - int(h * min(1.0, max(0.0, v / max_value))))
+        for i, v in enumerate(values)
+    ]
+    draw.line(points, fill=color, width=2)
+
+
+def render_dashboard(stats, net_speed=(0.0, 0.0), history=None):
     if not Image or not ImageDraw or not ImageFont:
         return None
 
@@ -112,6 +124,16 @@ def render_dashboard(stats, net_speed=(0.0, 0.0)):
     draw_progress_bar(draw, bar_x, bar_y, bar_w, bar_h, cpu_load, bar_bg, bar_fg, border, radius=int(11 * scale))
     draw.text((bar_x, bar_y + int(30 * scale)), f"Load: {cpu_load:.1f}%", font=font_mono, fill=text)
 
+    history = history or []
+    window = ""
+    if len(history) >= 2:
+        window = f"last {max(1, round((history[-1]['ts'] - history[0]['ts']) / 60))}m"
+        spark_y = cy0 + int(190 * scale)
+        spark_h = (cy1 - int(14 * scale)) - spark_y
+        draw.text((bar_x, spark_y - int(20 * scale)), f"CPU / RAM • {window}", font=font_tiny, fill=muted)
+        draw_sparkline(draw, bar_x, spark_y, bar_w, spark_h, [p["ram"] for p in history], 100.0, bar_fg2, border)
+        draw_sparkline(draw, bar_x, spark_y, bar_w, spark_h, [p["cpu"] for p in history], 100.0, bar_fg, border)
+
     sx0, sy0, sx1, sy1 = sys_card
     draw.text((sx0 + int(18 * scale), sy0 + int(16 * scale)), "System + Runtime", font=font_heading, fill=text)
 
@@ -201,6 +223,18 @@ def render_dashboard(stats, net_speed=(0.0, 0.0)):
     except Exception:
         pass
 
+    if len(history) >= 2:
+        spark_x = nx0 + int(18 * scale)
+        spark_y = ny0 + int(292 * scale)
+        spark_w = (nx1 - nx0) - int(36 * scale)
+        spark_h = (ny1 - int(18 * scale)) - spark_y
+        rx_hist = [p["rxps"] for p in history]
+        tx_hist = [p["txps"] for p in history]
+        peak = max(rx_hist + tx_hist) or 1.0
+        draw.text((spark_x, spark_y - int(22 * scale)), f"RX / TX • {window} • peak {humanize_bytes(int(peak))}/s", font=font_tiny, fill=muted)
+        draw_sparkline(draw, spark_x, spark_y, spark_w, spark_h, tx_hist, peak, bar_fg2, border)
+        draw_sparkline(draw, spark_x, spark_y, spark_w, spark_h, rx_hist, peak, bar_fg, border)
+
     bio = io.BytesIO()
     bio.name = "stats.png"
     img.save(bio, format="PNG", compress_level=3)
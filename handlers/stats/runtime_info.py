@@ -1,4 +1,5 @@
 import re
+import functools
 import subprocess
 
 try:
@@ -59,6 +60,7 @@ def get_aria2c_version():
         return m.group(1)
     return out.replace("aria2 version", "").strip() or out
 
+@functools.lru_cache(maxsize=1)
 def get_runtime_versions():
     return {
         "ytdlp": get_ytdlp_version(),
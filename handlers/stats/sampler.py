@@ -0,0 +1,73 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+
+from .system_info import gather_system_stats, NET_BAR_MBIT
+from .runtime_info import get_runtime_versions
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = max(1.0, float(os.getenv("STATS_SAMPLE_INTERVAL", "10")))
+HISTORY_MINUTES = max(1, int(os.getenv("STATS_HISTORY_MINUTES", "30")))
+
+_SAMPLES: deque = deque(maxlen=max(2, int(HISTORY_MINUTES * 60 / SAMPLE_INTERVAL)))
+_LATEST = {"stats": None, "net": None}
+
+
+def _net_speed(prev, stats) -> dict:
+    max_bps = (NET_BAR_MBIT * 1000 * 1000) / 8
+    net = stats["net"]
+    if not prev or prev["iface"] != net["iface"]:
+        return {"rxps": 0.0, "txps": 0.0, "iface": net["iface"], "max_bps": max_bps}
+    dt = max(0.001, stats["ts"] - prev["ts"])
+    return {
+        "rxps": max(0.0, (net["rx"] - prev["rx"]) / dt),
+        "txps": max(0.0, (net["tx"] - prev["tx"]) / dt),
+        "iface": net["iface"],
+        "max_bps": max_bps,
+    }
+
+
+def sample_once() -> dict:
+    """
+    Takes one non-blocking sample and appends it to the ring buffer.
+    """
+    stats = gather_system_stats(cpu_interval=None)
+    prev = _SAMPLES[-1] if _SAMPLES else None
+    net_speed = _net_speed(prev, stats)
+    _SAMPLES.append({
+        "ts": stats["ts"],
+        "cpu": stats["cpu"]["load"],
+        "ram": stats["ram"]["pct"],
+        "disk": stats["disk"]["pct"],
+        "iface": stats["net"]["iface"],
+        "rx": stats["net"]["rx"],
+        "tx": stats["net"]["tx"],
+        "rxps": net_speed["rxps"],
+        "txps": net_speed["txps"],
+    })
+    _LATEST["stats"], _LATEST["net"] = stats, net_speed
+    return stats
+
+
+def latest_stats():
+    """
+    Returns (stats, net_speed, history) from the last sample, or None before
+    the sampler has produced two samples.
+    """
+    if _LATEST["stats"] is None or len(_SAMPLES) < 2:
+        return None
+    return _LATEST["stats"], _LATEST["net"], list(_SAMPLES)
+
+
+async def stats_sampler_loop():
+    await asyncio.to_thread(get_runtime_versions)
+    while True:
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(sample_once)
+        except Exception as e:
+            logger.error(f"Stats sample failed: {e}", exc_info=True)
+        await asyncio.sleep(max(0.5, SAMPLE_INTERVAL - (time.monotonic() - started)))
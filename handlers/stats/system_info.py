@@ -113,12 +113,15 @@ def get_pretty_uptime():
     return "N/A"
 
 
-def gather_system_stats():
+def gather_system_stats(cpu_interval: float | None = 1.0):
+    """
+    cpu_interval=None reads CPU load since the previous call without blocking.
+    """
     now = time.time()
 
     cpu_cores = os.cpu_count() or 0
     try:
-        cpu_load = psutil.cpu_percent(interval=1.0) if psutil else 0.0
+        cpu_load = psutil.cpu_percent(interval=cpu_interval) if psutil else 0.0
     except Exception as e:
         logger.error(f"Failed to gather CPU load: {e}", exc_info=True)
         cpu_load = 0.0
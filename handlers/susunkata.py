@@ -1,6 +1,5 @@
 import html
 import json
-import aiohttp
 import asyncio
 import logging
 import time
@@ -9,11 +8,12 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from handlers.join import require_join_or_block
-from utils.http import get_http_session
+from utils.providers import provider
 from utils.config import NEOXR_API_KEY
 
 log = logging.getLogger(__name__)
 BASE_URL = "https://api.neoxr.eu/api"
+NEOXR = provider("neoxr")
 GAME_TTL = 300
 SUSUNKATA_GAMES = {}
 
@@ -37,13 +37,10 @@ async def neoxr_get(endpoint: str, params: dict | None = None, timeout: int = 20
         return False, "NEOXR_API_KEY is not set in .env"
     params = dict(params or {})
     params["apikey"] = NEOXR_API_KEY
-    session = await get_http_session()
     url = f"{BASE_URL}/{endpoint.lstrip('/')}"
     try:
-        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        async with NEOXR.request("GET", url, params=params, timeout=timeout) as resp:
             raw = await resp.text()
-            if resp.status != 200:
-                return False, f"HTTP {resp.status}: {raw[:500]}"
             try:
                 return True, json.loads(raw)
             except Exception:
@@ -13,6 +13,7 @@ from telegram import (
 from telegram.ext import ContextTypes
 
 from utils.config import OWNER_ID
+from utils.chat_members import get_member
 from database.welcome_db import (
     init_welcome_db,
     load_welcome_chats,
@@ -258,7 +259,7 @@ async def _should_enforce_verification(bot, chat_id: int, user_id: int) -> bool:
         return False
 
     try:
-        member = await bot.get_chat_member(chat_id, user_id)
+        member = await get_member(bot, chat_id, user_id)
     except Exception as e:
         log.warning(f"Failed to inspect member {user_id} in chat {chat_id}: {e}")
         return False
@@ -449,7 +450,7 @@ async def is_admin_or_owner(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return False
 
     try:
-        member = await context.bot.get_chat_member(chat.id, user.id)
+        member = await get_member(context.bot, chat.id, user.id)
         return member.status in ("administrator", "creator")
     except Exception as e:
         log.warning(
@@ -0,0 +1,69 @@
+"""
+Micro-benchmark for the RAG retriever.
+
+    python -m rag.bench [pages] [queries]
+
+Compares the old substring scan over whole documents with the BM25 index
+over chunks on a synthetic corpus of roughly 3 KB pages.
+"""
+import random
+import sys
+import time
+
+from rag.chunker import chunk_text
+from rag.index import BM25Index
+
+
+def _legacy_scan(query: str, documents: list[str], top_k: int = 3) -> list[str]:
+    query_l = query.lower()
+    scored = []
+    for doc in documents:
+        score = 0
+        for word in query_l.split():
+            if word in doc.lower():
+                score += 1
+        if score > 0:
+            scored.append((score, doc))
+    scored.sort(reverse=True, key=lambda x: x[0])
+    return [doc for _, doc in scored[:top_k]]
+
+
+def _corpus(pages: int, rng: random.Random) -> tuple[list[str], list[str]]:
+    vocab = [f"kata{i}" for i in range(20000)]
+    docs = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choices(vocab, k=12)) for _ in range(40)]
+        docs.append("\n".join(lines))
+    return docs, vocab
+
+
+def _timed(fn, queries: list[str]) -> float:
+    started = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main(pages: int = 2000, n_queries: int = 50):
+    rng = random.Random(42)
+    docs, vocab = _corpus(pages, rng)
+    queries = [" ".join(rng.choices(vocab, k=5)) for _ in range(n_queries)]
+    size_mb = sum(len(d) for d in docs) / 1024 / 1024
+
+    started = time.perf_counter()
+    chunks = [c for d in docs for c in chunk_text(d)]
+    index = BM25Index(chunks)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    legacy_ms = _timed(lambda q: _legacy_scan(q, docs), queries[: max(1, n_queries // 10)])
+    bm25_ms = _timed(lambda q: index.search(q, 3), queries)
+
+    print(f"corpus: {pages} pages, {size_mb:.1f} MB, {len(chunks)} chunks, {len(index.postings)} terms")
+    print(f"index build: {build_ms:.1f} ms")
+    print(f"legacy scan: {legacy_ms:.2f} ms/query")
+    print(f"bm25 index:  {bm25_ms:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
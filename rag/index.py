@@ -0,0 +1,53 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index over text chunks scored with Okapi BM25.
+    Built once per corpus; search cost depends on the postings of the query
+    terms only, not on the corpus size.
+    """
+
+    def __init__(self, chunks: list[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.lengths: list[int] = []
+        for idx, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize(chunk))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((idx, tf))
+        total = len(self.chunks)
+        self.avgdl = (sum(self.lengths) / total) if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(posts) + 0.5) / (len(posts) + 0.5))
+            for term, posts in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query: str, top_k: int = 3) -> list[tuple[float, str]]:
+        scores: dict[int, float] = {}
+        avgdl = self.avgdl or 1.0
+        for term in set(tokenize(query)):
+            posts = self.postings.get(term)
+            if not posts:
+                continue
+            idf = self.idf[term]
+            for idx, tf in posts:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[idx] / avgdl)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(score, self.chunks[idx]) for idx, score in best]
@@ -1,16 +1,43 @@
 import os
 
+from rag.chunker import chunk_text
+
 DOC_DIR = "data/rag_docs"
 
-def load_local_contexts() -> list[str]:
-    contexts = []
 
-    for fname in os.listdir(DOC_DIR):
-        if not fname.endswith(".md"):
+def _doc_paths() -> list[str]:
+    if not os.path.isdir(DOC_DIR):
+        return []
+    return [
+        os.path.join(DOC_DIR, fname)
+        for fname in sorted(os.listdir(DOC_DIR))
+        if fname.endswith(".md")
+    ]
+
+
+def docs_signature() -> tuple:
+    sig = []
+    for path in _doc_paths():
+        try:
+            st = os.stat(path)
+        except OSError:
             continue
+        sig.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
 
-        path = os.path.join(DOC_DIR, fname)
+def load_local_contexts() -> list[str]:
+    contexts = []
+
+    for path in _doc_paths():
         with open(path, "r", encoding="utf-8") as f:
             contexts.append(f.read())
 
-    return contexts
\ No newline at end of file
+    return contexts
+
+
+def load_chunks(max_size: int = 500) -> list[str]:
+    chunks = []
+    for text in load_local_contexts():
+        chunks.extend(chunk_text(text, max_size))
+    return chunks
@@ -1,26 +1,68 @@
-from typing import List
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import List, Optional
+
+from rag.index import BM25Index
+from rag.loader import docs_signature, load_chunks
+
+log = logging.getLogger(__name__)
+
+RAG_CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "500"))
+RAG_RELOAD_INTERVAL = float(os.getenv("RAG_RELOAD_INTERVAL", "5"))
+
+_INDEX: Optional[BM25Index] = None
+_SIGNATURE: tuple = ()
+_CHECKED_AT = 0.0
+_LOCK = threading.Lock()
+_DOC_INDEXES: dict[tuple, BM25Index] = {}
+
+
+def reload_index(force: bool = False) -> BM25Index:
+    """
+    Rebuilds the shared index when files in data/rag_docs changed.
+    """
+    global _INDEX, _SIGNATURE, _CHECKED_AT
+    with _LOCK:
+        _CHECKED_AT = time.monotonic()
+        sig = docs_signature()
+        if _INDEX is not None and sig == _SIGNATURE and not force:
+            return _INDEX
+        started = time.perf_counter()
+        index = BM25Index(load_chunks(RAG_CHUNK_SIZE))
+        _INDEX, _SIGNATURE = index, sig
+        log.info(
+            "RAG index built | files=%s chunks=%s terms=%s took=%.1fms",
+            len(sig), len(index), len(index.postings), (time.perf_counter() - started) * 1000,
+        )
+        return index
+
+
+async def get_index() -> BM25Index:
+    if _INDEX is None or time.monotonic() - _CHECKED_AT >= RAG_RELOAD_INTERVAL:
+        return await asyncio.to_thread(reload_index)
+    return _INDEX
+
+
+def _documents_index(documents: List[str]) -> BM25Index:
+    key = tuple(documents)
+    index = _DOC_INDEXES.get(key)
+    if index is None:
+        _DOC_INDEXES.clear()
+        index = _DOC_INDEXES[key] = BM25Index(documents)
+    return index
+
 
 async def retrieve_context(
     query: str,
-    documents: List[str],
+    documents: Optional[List[str]] = None,
     top_k: int = 3,
 ) -> List[str]:
     """
     Ambil konteks dari dokumen lokal
     """
 
-    query_l = query.lower()
-    scored = []
-
-    for doc in documents:
-        score = 0
-        for word in query_l.split():
-            if word in doc.lower():
-                score += 1
-
-        if score > 0:
-            scored.append((score, doc))
-
-    scored.sort(reverse=True, key=lambda x: x[0])
-
-    return [doc for _, doc in scored[:top_k]]
\ No newline at end of file
+    index = await get_index() if documents is None else _documents_index(documents)
+    return [chunk for _, chunk in index.search(query, top_k)]
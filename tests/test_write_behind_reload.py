@@ -0,0 +1,34 @@
+import asyncio
+import importlib
+import sqlite3
+from types import SimpleNamespace
+
+
+def _user(user_id):
+    return SimpleNamespace(id=user_id, first_name=f"u{user_id}", is_bot=False)
+
+
+def test_ship_rows_flush_after_reloading_ship_db_then_write_behind(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from database import ship_db, write_behind
+
+    ship_db.add_user(10, _user(1))
+    ship_db = importlib.reload(ship_db)
+    write_behind = importlib.reload(write_behind)
+    ship_db.add_user(10, _user(2))
+    ship_db.add_user(10, _user(3))
+    ship_db.remove_user(10, 3)
+
+    names = [b.name for b in write_behind._BUFFERS]
+    assert names.count("ship_users") == 1
+    assert names.count("ship_users_gone") == 1
+
+    asyncio.run(write_behind.flush())
+
+    con = sqlite3.connect(tmp_path / "data" / "ship.sqlite3")
+    try:
+        rows = sorted(r[0] for r in con.execute("SELECT user_id FROM users WHERE chat_id=10"))
+    finally:
+        con.close()
+    assert rows == [1, 2]
+    assert write_behind.pending_count() == 0
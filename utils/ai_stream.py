@@ -0,0 +1,160 @@
+import os
+import re
+import html
+import time
+import asyncio
+import logging
+from typing import Awaitable,Callable
+from telegram.error import BadRequest,NetworkError,RetryAfter
+from utils.text import split_message
+
+log=logging.getLogger(__name__)
+AI_STREAM_EDIT_INTERVAL=float(os.getenv("AI_STREAM_EDIT_INTERVAL","1.5"))
+AI_STREAM_MIN_CHARS=int(os.getenv("AI_STREAM_MIN_CHARS","40"))
+AI_STREAM_MAX_LENGTH=4000
+
+async def iter_sse(resp):
+    """
+    Yields the data payload of each server-sent event from an aiohttp response.
+    """
+    buf=[]
+    async for raw in resp.content:
+        line=raw.decode("utf-8","replace").rstrip("\r\n")
+        if not line:
+            if buf:
+                yield "\n".join(buf)
+                buf=[]
+            continue
+        if line.startswith(":"):
+            continue
+        if line.startswith("data:"):
+            data=line[5:]
+            buf.append(data[1:] if data.startswith(" ") else data)
+    if buf:
+        yield "\n".join(buf)
+
+def _plain(text:str)->str:
+    return html.unescape(re.sub(r"</?[a-zA-Z][^>]*>","",text))
+
+class StreamingReply:
+    """
+    Pushes a growing completion into Telegram messages.
+    Edits are throttled to AI_STREAM_EDIT_INTERVAL, and text past the message
+    limit rolls over into new messages using split_message.
+    """
+
+    def __init__(self,bot,chat_id:int,send:Callable[[str],Awaitable],render:Callable[[str],str],on_start:Callable[[],Awaitable]|None=None):
+        self.bot=bot
+        self.chat_id=chat_id
+        self.send=send
+        self.render=render
+        self.on_start=on_start
+        self.messages=[]
+        self.shown:list[str]=[]
+        self.next_edit=0.0
+        self.last_len=0
+        self.started=time.monotonic()
+        self.first_token_at=None
+
+    async def update(self,raw:str):
+        if self.first_token_at is None and raw:
+            self.first_token_at=time.monotonic()
+        if time.monotonic()<self.next_edit or len(raw)-self.last_len<AI_STREAM_MIN_CHARS:
+            return
+        text=self.render(raw)
+        if not text.strip():
+            return
+        self.last_len=len(raw)
+        await self._sync(split_message(text,AI_STREAM_MAX_LENGTH),final=False)
+
+    async def finish(self,raw:str):
+        text=self.render(raw)
+        if not text.strip():
+            return self.messages[-1] if self.messages else None
+        await self._sync(split_message(text,AI_STREAM_MAX_LENGTH),final=True)
+        for extra in self.messages[len(self.shown):]:
+            try:
+                await self.bot.delete_message(chat_id=self.chat_id,message_id=extra.message_id)
+            except Exception as e:
+                log.debug("Failed to delete stale stream message | chat_id=%s err=%r",self.chat_id,e)
+        self.messages=self.messages[:len(self.shown)]
+        if self.first_token_at is not None:
+            log.info(
+                "AI stream done | chat_id=%s ttft=%.2fs total=%.2fs messages=%s",
+                self.chat_id,self.first_token_at-self.started,time.monotonic()-self.started,len(self.messages),
+            )
+        return self.messages[-1] if self.messages else None
+
+    async def _sync(self,chunks:list[str],final:bool):
+        if not self.messages and self.on_start:
+            await self.on_start()
+        for idx,chunk in enumerate(chunks):
+            if idx<len(self.messages):
+                if self.shown[idx]!=chunk:
+                    await self._edit(idx,chunk,final)
+                continue
+            sent=await self._send(chunk,final)
+            if sent is None:
+                break
+            self.messages.append(sent)
+            self.shown.append(chunk)
+        if final:
+            self.shown=self.shown[:len(chunks)]
+        self.next_edit=time.monotonic()+AI_STREAM_EDIT_INTERVAL
+
+    async def _send(self,text:str,final:bool):
+        """
+        Opens a rollover message. Mid-stream a flood wait or network error
+        returns None so the next update retries; the final pass waits it out.
+        """
+        for attempt in range(3):
+            try:
+                return await self.send(text)
+            except RetryAfter as e:
+                wait_time=int(getattr(e,"retry_after",1))+1
+                self.next_edit=time.monotonic()+wait_time
+                if not final:
+                    return None
+                await asyncio.sleep(wait_time)
+            except BadRequest:
+                raise
+            except NetworkError as e:
+                if not final:
+                    log.debug("AI stream rollover skipped | chat_id=%s err=%r",self.chat_id,e)
+                    return None
+                if attempt==2:
+                    raise
+                await asyncio.sleep(attempt+1)
+        return await self.send(text)
+
+    async def _edit(self,idx:int,text:str,final:bool):
+        message=self.messages[idx]
+        for attempt in range(2):
+            try:
+                await self.bot.edit_message_text(
+                    chat_id=self.chat_id,
+                    message_id=message.message_id,
+                    text=text,
+                    parse_mode="HTML",
+                )
+                self.shown[idx]=text
+                return
+            except RetryAfter as e:
+                wait_time=int(getattr(e,"retry_after",1))+1
+                self.next_edit=time.monotonic()+wait_time
+                if not final:
+                    return
+                await asyncio.sleep(wait_time)
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    self.shown[idx]=text
+                    return
+                if not final:
+                    log.debug("AI stream edit skipped | chat_id=%s err=%r",self.chat_id,e)
+                    return
+                try:
+                    await self.bot.edit_message_text(chat_id=self.chat_id,message_id=message.message_id,text=_plain(text))
+                    self.shown[idx]=text
+                except Exception as e2:
+                    log.warning("AI stream final edit failed | chat_id=%s err=%r",self.chat_id,e2)
+                return
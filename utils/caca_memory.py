@@ -1,43 +1,54 @@
 import os
 import time
-import json
-import sqlite3
-import asyncio
+from database.db import db_session, register_schema, ensure_schema, run_db
+from utils import reply_index
+from utils.turn_store import TurnStore, AI_HISTORY_TOKEN_BUDGET
 
 MEMORY_EXPIRE = 60 * 60 * 24
 META_DB_PATH = "data/meta_memory.sqlite3"
 META_MAX_TURNS = 50
-
-
-def _meta_db_init():
-    os.makedirs("data", exist_ok=True)
-    con = sqlite3.connect(META_DB_PATH)
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS meta_memory (
-                user_id INTEGER PRIMARY KEY,
-                history_json TEXT NOT NULL,
-                last_used REAL NOT NULL,
-                last_message_id INTEGER
-            )
-            """
+META_HISTORY_TOKENS = int(os.getenv("META_HISTORY_TOKENS", str(AI_HISTORY_TOKEN_BUDGET)))
+_TURNS = TurnStore("meta_turns", "meta_memory", META_MAX_TURNS * 2)
+
+
+def _meta_memory_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS meta_memory (
+            user_id INTEGER PRIMARY KEY,
+            history_json TEXT NOT NULL,
+            last_used REAL NOT NULL,
+            last_message_id INTEGER,
+            last_chat_id INTEGER
         )
-        con.commit()
+        """
+    )
+    con.commit()
+    for column in ("last_message_id", "last_chat_id"):
         try:
-            con.execute("ALTER TABLE meta_memory ADD COLUMN last_message_id INTEGER")
+            con.execute(f"ALTER TABLE meta_memory ADD COLUMN {column} INTEGER")
             con.commit()
         except Exception:
             pass
-    finally:
-        con.close()
 
 
-def _meta_db_get(user_id: int):
-    con = sqlite3.connect(META_DB_PATH)
-    try:
+register_schema(META_DB_PATH, _meta_memory_schema)
+register_schema(META_DB_PATH, _TURNS.schema)
+
+
+def _meta_db_init():
+    ensure_schema(META_DB_PATH)
+
+
+def _rows(messages: list) -> list[tuple]:
+    return [
+        (str(m.get("role") or "user"), m.get("content") or "")
+        for m in messages if isinstance(m, dict)
+    ]
+
+
+def _meta_db_get(user_id: int, budget: int | None = None):
+    with db_session(META_DB_PATH) as con:
         cur = con.execute(
             "SELECT history_json, last_used, last_message_id FROM meta_memory WHERE user_id=?",
             (int(user_id),),
@@ -45,140 +56,165 @@ def _meta_db_get(user_id: int):
         row = cur.fetchone()
         if not row:
             return None
-        history = json.loads(row[0]) if row[0] else []
+        if _TURNS.import_legacy(con, user_id, _rows):
+            con.commit()
+        rows, summary = _TURNS.window(con, user_id, META_HISTORY_TOKENS if budget is None else budget)
+        history = [{"role": role, "content": content} for role, content in rows]
+        if summary:
+            history.insert(0, {"role": "system", "content": summary})
         last_used = float(row[1])
         last_message_id = int(row[2]) if row[2] is not None else None
-        if not isinstance(history, list):
-            history = []
         return history, last_used, last_message_id
-    finally:
-        con.close()
 
 
-def _meta_db_set(user_id: int, history: list, last_message_id: int | None):
-    if META_MAX_TURNS and META_MAX_TURNS > 0:
-        max_msgs = META_MAX_TURNS * 2
-        if len(history) > max_msgs:
-            history = history[-max_msgs:]
+def _meta_db_get_meta(user_id: int):
+    with db_session(META_DB_PATH) as con:
+        return con.execute(
+            "SELECT last_used, last_message_id FROM meta_memory WHERE user_id=?",
+            (int(user_id),),
+        ).fetchone()
 
-    con = sqlite3.connect(META_DB_PATH)
-    try:
-        con.execute(
-            """
-            INSERT INTO meta_memory (user_id, history_json, last_used, last_message_id)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-              history_json=excluded.history_json,
-              last_used=excluded.last_used,
-              last_message_id=excluded.last_message_id
-            """,
-            (int(user_id), json.dumps(history, ensure_ascii=False), time.time(), last_message_id),
+
+def _meta_db_touch(con, user_id: int, last_message_id: int | None, chat_id: int | None, keep_message_id: bool):
+    if keep_message_id:
+        update = (
+            "last_message_id=COALESCE(excluded.last_message_id, last_message_id),\n"
+            "              last_chat_id=COALESCE(excluded.last_chat_id, last_chat_id)"
         )
+    else:
+        update = "last_message_id=excluded.last_message_id,\n              last_chat_id=excluded.last_chat_id"
+    con.execute(
+        f"""
+        INSERT INTO meta_memory (user_id, history_json, last_used, last_message_id, last_chat_id)
+        VALUES (?, '[]', ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+          history_json='[]',
+          last_used=excluded.last_used,
+          {update}
+        """,
+        (int(user_id), time.time(), last_message_id, chat_id),
+    )
+
+
+def _meta_db_append(user_id: int, messages: list, last_message_id: int | None, chat_id: int | None, fresh: bool):
+    with db_session(META_DB_PATH) as con:
+        try:
+            con.execute("BEGIN")
+            _TURNS.import_legacy(con, user_id, _rows)
+            _TURNS.append(con, user_id, _rows(messages), replace=fresh)
+            _meta_db_touch(con, user_id, last_message_id, chat_id, keep_message_id=True)
+            con.execute("COMMIT")
+        except Exception:
+            try:
+                con.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+
+
+def _meta_db_set(user_id: int, history: list, last_message_id: int | None, chat_id: int | None = None):
+    with db_session(META_DB_PATH) as con:
+        _TURNS.import_legacy(con, user_id, _rows)
+        _TURNS.append(con, user_id, _rows(history if isinstance(history, list) else []), replace=True)
+        _meta_db_touch(con, user_id, last_message_id, chat_id, keep_message_id=False)
         con.commit()
-    finally:
-        con.close()
 
 
-def _meta_db_set_last_message_id(user_id: int, last_message_id: int | None):
-    con = sqlite3.connect(META_DB_PATH)
-    try:
-        con.execute(
-            """
-            INSERT INTO meta_memory (user_id, history_json, last_used, last_message_id)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-              last_used=excluded.last_used,
-              last_message_id=excluded.last_message_id
-            """,
-            (int(user_id), "[]", time.time(), last_message_id),
-        )
+def _meta_db_set_last_message_id(user_id: int, last_message_id: int | None, chat_id: int | None = None):
+    with db_session(META_DB_PATH) as con:
+        _TURNS.import_legacy(con, user_id, _rows)
+        _meta_db_touch(con, user_id, last_message_id, chat_id, keep_message_id=False)
         con.commit()
-    finally:
-        con.close()
 
 
 def _meta_db_clear_last_message_id(user_id: int):
-    con = sqlite3.connect(META_DB_PATH)
-    try:
+    with db_session(META_DB_PATH) as con:
         con.execute(
-            "UPDATE meta_memory SET last_message_id=NULL, last_used=? WHERE user_id=?",
+            "UPDATE meta_memory SET last_message_id=NULL, last_chat_id=NULL, last_used=? WHERE user_id=?",
             (time.time(), int(user_id)),
         )
         con.commit()
-    finally:
-        con.close()
 
 
 def _meta_db_clear(user_id: int):
-    con = sqlite3.connect(META_DB_PATH)
-    try:
+    with db_session(META_DB_PATH) as con:
         con.execute("DELETE FROM meta_memory WHERE user_id=?", (int(user_id),))
+        _TURNS.clear(con, user_id)
         con.commit()
-    finally:
-        con.close()
 
 
 def _meta_db_cleanup(expire_seconds: int):
     cutoff = time.time() - float(expire_seconds)
-    con = sqlite3.connect(META_DB_PATH)
-    try:
+    with db_session(META_DB_PATH) as con:
         con.execute("DELETE FROM meta_memory WHERE last_used < ?", (cutoff,))
+        _TURNS.cleanup(con)
         con.commit()
-    finally:
-        con.close()
 
 
-def _meta_db_has_last_message_id(message_id: int) -> bool:
-    con = sqlite3.connect(META_DB_PATH)
-    try:
+def _meta_db_index_rows() -> list[tuple]:
+    with db_session(META_DB_PATH) as con:
         cur = con.execute(
-            "SELECT 1 FROM meta_memory WHERE last_message_id=? LIMIT 1",
-            (int(message_id),),
+            "SELECT user_id, last_chat_id, last_message_id FROM meta_memory WHERE last_message_id IS NOT NULL"
         )
-        return cur.fetchone() is not None
-    finally:
-        con.close()
+        return cur.fetchall()
+
+
+async def _rebuild_index():
+    reply_index.rebuild("caca", await run_db(_meta_db_index_rows))
 
 
 async def init():
-    await asyncio.to_thread(_meta_db_init)
+    await run_db(_meta_db_init)
+    await _rebuild_index()
 
 
 async def get_history(user_id: int) -> list:
-    res = await asyncio.to_thread(_meta_db_get, user_id)
+    res = await run_db(_meta_db_get, user_id)
     if not res:
         return []
     history, _, _ = res
     return history
 
 
-async def set_history(user_id: int, history: list, last_message_id: int | None = None):
-    await asyncio.to_thread(_meta_db_set, user_id, history, last_message_id)
+async def set_history(user_id: int, history: list, last_message_id: int | None = None, chat_id: int | None = None):
+    await run_db(_meta_db_set, user_id, history, last_message_id, chat_id)
+    reply_index.remember("caca", user_id, chat_id, last_message_id)
+
+
+async def append_messages(
+    user_id: int,
+    messages: list,
+    last_message_id: int | None = None,
+    chat_id: int | None = None,
+    fresh: bool = False,
+):
+    await run_db(_meta_db_append, user_id, messages, last_message_id, chat_id, fresh)
+    if last_message_id is not None:
+        reply_index.remember("caca", user_id, chat_id, last_message_id)
 
 
-async def set_last_message_id(user_id: int, last_message_id: int | None):
-    await asyncio.to_thread(_meta_db_set_last_message_id, user_id, last_message_id)
+async def set_last_message_id(user_id: int, last_message_id: int | None, chat_id: int | None = None):
+    await run_db(_meta_db_set_last_message_id, user_id, last_message_id, chat_id)
+    reply_index.remember("caca", user_id, chat_id, last_message_id)
 
 
 async def get_last_message_id(user_id: int) -> int | None:
-    res = await asyncio.to_thread(_meta_db_get, user_id)
-    if not res:
+    row = await run_db(_meta_db_get_meta, user_id)
+    if not row or row[1] is None:
         return None
-    _, _, last_message_id = res
-    return last_message_id
+    return int(row[1])
 
 
 async def clear_last_message_id(user_id: int):
-    await asyncio.to_thread(_meta_db_clear_last_message_id, user_id)
+    await run_db(_meta_db_clear_last_message_id, user_id)
+    reply_index.forget("caca", user_id)
 
 
 async def clear(user_id: int):
-    await asyncio.to_thread(_meta_db_clear, user_id)
+    await run_db(_meta_db_clear, user_id)
+    reply_index.forget("caca", user_id)
 
 
 async def cleanup():
-    await asyncio.to_thread(_meta_db_cleanup, MEMORY_EXPIRE)
-
-
-async def has_last_message_id(message_id: int) -> bool:
-    return await asyncio.to_thread(_meta_db_has_last_message_id, message_id)
\ No newline at end of file
+    await run_db(_meta_db_cleanup, MEMORY_EXPIRE)
+    await _rebuild_index()
@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+MEMBER_CACHE_TTL = float(os.getenv("MEMBER_CACHE_TTL", "120"))
+MEMBER_CACHE_MAX = int(os.getenv("MEMBER_CACHE_MAX", "20000"))
+MEMBER_LOOKUP_CONCURRENCY = max(1, int(os.getenv("MEMBER_LOOKUP_CONCURRENCY", "8")))
+
+GONE_STATUSES = ("left", "kicked")
+
+_CACHE: dict[tuple[int, int], tuple[float, object]] = {}
+_INFLIGHT: dict[tuple[int, int], asyncio.Future] = {}
+_STATS = {"hits": 0, "misses": 0, "updates": 0}
+
+
+def _key(chat_id: int, user_id: int) -> tuple[int, int]:
+    return int(chat_id), int(user_id)
+
+
+def _prune(now: float):
+    for key in [k for k, (expires, _) in _CACHE.items() if expires <= now]:
+        _CACHE.pop(key, None)
+    overflow = len(_CACHE) - MEMBER_CACHE_MAX
+    if overflow > 0:
+        for key in sorted(_CACHE, key=lambda k: _CACHE[k][0])[:overflow]:
+            _CACHE.pop(key, None)
+
+
+def remember(chat_id: int, member):
+    """
+    Stores a ChatMember we already have (e.g. from a chat_member update).
+    """
+    user = getattr(member, "user", None)
+    if user is None:
+        return
+    now = time.monotonic()
+    if len(_CACHE) >= MEMBER_CACHE_MAX:
+        _prune(now)
+    _CACHE[_key(chat_id, user.id)] = (now + MEMBER_CACHE_TTL, member)
+
+
+def invalidate(chat_id: int, user_id: int | None = None):
+    if user_id is not None:
+        _CACHE.pop(_key(chat_id, user_id), None)
+        return
+    for key in [k for k in _CACHE if k[0] == int(chat_id)]:
+        _CACHE.pop(key, None)
+
+
+def cached_member(chat_id: int, user_id: int):
+    hit = _CACHE.get(_key(chat_id, user_id))
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
+    return None
+
+
+async def get_member(bot, chat_id: int, user_id: int):
+    """
+    Cached bot.get_chat_member. Concurrent lookups for the same member share
+    one API call; failures are not cached and re-raise like the raw call.
+    """
+    key = _key(chat_id, user_id)
+    member = cached_member(*key)
+    if member is not None:
+        _STATS["hits"] += 1
+        return member
+    pending = _INFLIGHT.get(key)
+    if pending is not None:
+        _STATS["hits"] += 1
+        return await asyncio.shield(pending)
+    _STATS["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = future
+    try:
+        member = await bot.get_chat_member(*key)
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()
+        raise
+    except BaseException:
+        future.cancel()
+        raise
+    else:
+        remember(chat_id, member)
+        future.set_result(member)
+        return member
+    finally:
+        _INFLIGHT.pop(key, None)
+
+
+async def get_members(bot, chat_id: int, user_ids) -> dict[int, object]:
+    """
+    Looks up several members of one chat concurrently. Failed lookups map
+    to None.
+    """
+    sem = asyncio.Semaphore(MEMBER_LOOKUP_CONCURRENCY)
+
+    async def one(user_id: int):
+        async with sem:
+            try:
+                return await get_member(bot, chat_id, user_id)
+            except Exception as e:
+                log.debug("Member lookup failed | chat_id=%s user_id=%s err=%r", chat_id, user_id, e)
+                return None
+
+    ids = list(dict.fromkeys(int(u) for u in user_ids))
+    results = await asyncio.gather(*(one(u) for u in ids))
+    return dict(zip(ids, results))
+
+
+async def get_bot_member(bot, chat_id: int):
+    return await get_member(bot, chat_id, bot.id)
+
+
+async def is_chat_member(bot, chat_id: int, user_id: int) -> bool:
+    try:
+        member = await get_member(bot, chat_id, user_id)
+    except Exception:
+        return False
+    return member.status not in GONE_STATUSES
+
+
+async def chat_member_tracker(update, context):
+    """
+    Keeps the cache in step with chat_member / my_chat_member updates, so
+    promotions, demotions, bans and leaves show up without waiting for the TTL.
+    """
+    cmu = update.chat_member or update.my_chat_member
+    if not cmu or not cmu.chat or not cmu.new_chat_member:
+        return
+    _STATS["updates"] += 1
+    remember(cmu.chat.id, cmu.new_chat_member)
+
+
+def member_cache_stats() -> dict:
+    return {"size": len(_CACHE), **_STATS}
@@ -1,3 +1,5 @@
+import re
+
 # Commands
 BOT_COMMANDS = {
     "start","help","menu","settings",
@@ -7,3 +9,67 @@ BOT_COMMANDS = {
     "ping","stats","ip","net","domain","whoisdomain",
     "asupann","autodel","autodl","mode","cacaa","nsfw","wlc",
 }
+
+_CMD_RE = re.compile(r"^[/$]([A-Za-z0-9_]{1,32})(?:@([A-Za-z0-9_]{5,32}))?(?:\s|$)")
+
+
+class CommandRegistry:
+    """
+    Frozen set of registered command names plus the bot username.
+    Built by register_commands and filled with the username in post_init, so
+    message gates can match commands without walking app.handlers or calling
+    get_me() per message.
+    """
+
+    __slots__ = ("names", "username")
+
+    def __init__(self, names=(), username: str = ""):
+        self.names = frozenset(str(n).lower() for n in names)
+        self.username = (username or "").lower()
+
+    def parse(self, text: str, prefixes: str = "/"):
+        if not text or text[0] not in prefixes:
+            return None, None
+        m = _CMD_RE.match(text)
+        if not m:
+            return None, None
+        return m.group(1).lower(), (m.group(2) or "").lower()
+
+    def command(self, text: str, prefixes: str = "/") -> str | None:
+        """
+        Command name when text is a command addressed to this bot.
+        """
+        cmd, mention = self.parse(text, prefixes)
+        if cmd is None or (mention and self.username and mention != self.username):
+            return None
+        return cmd
+
+    def match(self, text: str, prefixes: str = "/") -> str | None:
+        """
+        Like command(), but only for commands that have a registered handler.
+        """
+        cmd = self.command(text, prefixes)
+        return cmd if cmd in self.names else None
+
+
+COMMANDS = CommandRegistry()
+
+
+def build_command_registry(app):
+    names = set()
+    for handlers in app.handlers.values():
+        for h in handlers:
+            commands = getattr(h, "commands", None)
+            if commands:
+                names.update(str(c).lower() for c in commands)
+    COMMANDS.names = frozenset(names)
+    if not COMMANDS.username:
+        try:
+            COMMANDS.username = (app.bot.username or "").lower()
+        except Exception:
+            pass
+    return COMMANDS
+
+
+def set_bot_username(username: str | None):
+    COMMANDS.username = (username or "").lower()
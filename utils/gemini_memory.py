@@ -1,165 +1,196 @@
 import os
 import time
-import json
-import sqlite3
-import asyncio
+from database.db import db_session, register_schema, ensure_schema, run_db
+from utils import reply_index
+from utils.turn_store import TurnStore, AI_HISTORY_TOKEN_BUDGET
 
 AI_MEMORY_EXPIRE = int(os.getenv("AI_MEMORY_EXPIRE", str(60 * 60 * 24)))
 AI_DB_PATH = os.getenv("AI_MEMORY_DB_PATH", "data/ai_memory.sqlite3")
 AI_MAX_TURNS = int(os.getenv("AI_MAX_TURNS", "30"))
+AI_HISTORY_TOKENS = int(os.getenv("AI_HISTORY_TOKENS", str(AI_HISTORY_TOKEN_BUDGET)))
+_TURNS = TurnStore("ai_turns", "ai_memory", AI_MAX_TURNS * 2)
+
+def _ai_memory_schema(con):
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ai_memory (
+            user_id INTEGER PRIMARY KEY,
+            history_json TEXT NOT NULL,
+            last_used REAL NOT NULL,
+            last_message_id INTEGER,
+            last_chat_id INTEGER
+        )
+        """
+    )
+    try:
+        con.execute("ALTER TABLE ai_memory ADD COLUMN last_chat_id INTEGER")
+    except Exception:
+        pass
+
+register_schema(AI_DB_PATH, _ai_memory_schema)
+register_schema(AI_DB_PATH, _TURNS.schema)
 
 def _db_init():
-    os.makedirs(os.path.dirname(AI_DB_PATH) or ".", exist_ok=True)
-    con = sqlite3.connect(AI_DB_PATH)
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA synchronous=NORMAL;")
-        con.execute(
-            """
-            CREATE TABLE IF NOT EXISTS ai_memory (
-                user_id INTEGER PRIMARY KEY,
-                history_json TEXT NOT NULL,
-                last_used REAL NOT NULL,
-                last_message_id INTEGER
-            )
-            """
-        )
-        con.commit()
-    finally:
-        con.close()
+    ensure_schema(AI_DB_PATH)
+
+def _rows(history: list) -> list[tuple]:
+    rows = []
+    for item in history:
+        if not isinstance(item, dict):
+            continue
+        if item.get("user"):
+            rows.append(("user", item["user"]))
+        if item.get("ai"):
+            rows.append(("ai", item["ai"]))
+    return rows
+
+def _turns(rows: list[tuple]) -> list[dict]:
+    history = []
+    for role, content in rows:
+        if role == "user" or not history or history[-1].get("ai"):
+            history.append({"user": content if role == "user" else "", "ai": ""})
+        if role == "ai":
+            history[-1]["ai"] = content
+    return history
 
-def _db_get(user_id: int):
-    _db_init()
-    con = sqlite3.connect(AI_DB_PATH)
-    try:
+def _db_get(user_id: int, budget: int | None = None):
+    with db_session(AI_DB_PATH) as con:
         row = con.execute(
             "SELECT history_json,last_used,last_message_id FROM ai_memory WHERE user_id=?",
             (int(user_id),),
         ).fetchone()
         if not row:
             return None
-        try:
-            history = json.loads(row[0]) if row[0] else []
-        except Exception:
-            history = []
-        if not isinstance(history, list):
-            history = []
+        if _TURNS.import_legacy(con, user_id, _rows):
+            con.commit()
+        rows, summary = _TURNS.window(con, user_id, AI_HISTORY_TOKENS if budget is None else budget)
+        history = _turns(rows)
+        if summary:
+            history.insert(0, {"user": "(ringkasan obrolan sebelumnya)", "ai": summary})
         last_used = float(row[1] or 0)
         last_message_id = int(row[2]) if row[2] is not None else None
         return history, last_used, last_message_id
-    finally:
-        con.close()
 
-def _trim_history(history: list) -> list:
-    if AI_MAX_TURNS and AI_MAX_TURNS > 0:
-        history = history[-AI_MAX_TURNS:]
-    return history
+def _db_get_meta(user_id: int):
+    with db_session(AI_DB_PATH) as con:
+        return con.execute(
+            "SELECT last_used,last_message_id FROM ai_memory WHERE user_id=?",
+            (int(user_id),),
+        ).fetchone()
 
-def _db_set(user_id: int, history: list, last_message_id: int | None):
-    _db_init()
-    history = _trim_history(history if isinstance(history, list) else [])
-    con = sqlite3.connect(AI_DB_PATH)
-    try:
-        con.execute(
-            """
-            INSERT INTO ai_memory(user_id,history_json,last_used,last_message_id)
-            VALUES(?,?,?,?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                history_json=excluded.history_json,
-                last_used=excluded.last_used,
-                last_message_id=excluded.last_message_id
-            """,
-            (int(user_id), json.dumps(history, ensure_ascii=False), time.time(), last_message_id),
-        )
+def _db_touch(con, user_id: int, last_message_id: int | None, chat_id: int | None, keep_message_id: bool):
+    if keep_message_id:
+        update = "last_message_id=COALESCE(excluded.last_message_id,last_message_id),last_chat_id=COALESCE(excluded.last_chat_id,last_chat_id)"
+    else:
+        update = "last_message_id=excluded.last_message_id,last_chat_id=excluded.last_chat_id"
+    con.execute(
+        f"""
+        INSERT INTO ai_memory(user_id,history_json,last_used,last_message_id,last_chat_id)
+        VALUES(?,'[]',?,?,?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            history_json='[]',
+            last_used=excluded.last_used,
+            {update}
+        """,
+        (int(user_id), time.time(), last_message_id, chat_id),
+    )
+
+def _db_append(user_id: int, history: list, last_message_id: int | None, chat_id: int | None, fresh: bool):
+    with db_session(AI_DB_PATH) as con:
+        try:
+            con.execute("BEGIN")
+            _TURNS.import_legacy(con, user_id, _rows)
+            _TURNS.append(con, user_id, _rows(history), replace=fresh)
+            _db_touch(con, user_id, last_message_id, chat_id, keep_message_id=True)
+            con.execute("COMMIT")
+        except Exception:
+            try:
+                con.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+
+def _db_set(user_id: int, history: list, last_message_id: int | None, chat_id: int | None = None):
+    with db_session(AI_DB_PATH) as con:
+        _TURNS.import_legacy(con, user_id, _rows)
+        _TURNS.append(con, user_id, _rows(history if isinstance(history, list) else []), replace=True)
+        _db_touch(con, user_id, last_message_id, chat_id, keep_message_id=False)
         con.commit()
-    finally:
-        con.close()
 
-def _db_set_last_message_id(user_id: int, last_message_id: int | None):
-    _db_init()
-    current = _db_get(user_id)
-    history = current[0] if current else []
-    _db_set(user_id, history, last_message_id)
+def _db_set_last_message_id(user_id: int, last_message_id: int | None, chat_id: int | None = None):
+    with db_session(AI_DB_PATH) as con:
+        _TURNS.import_legacy(con, user_id, _rows)
+        _db_touch(con, user_id, last_message_id, chat_id, keep_message_id=False)
+        con.commit()
 
 def _db_clear_last_message_id(user_id: int):
-    _db_init()
-    con = sqlite3.connect(AI_DB_PATH)
-    try:
+    with db_session(AI_DB_PATH) as con:
         con.execute(
-            "UPDATE ai_memory SET last_message_id=NULL,last_used=? WHERE user_id=?",
+            "UPDATE ai_memory SET last_message_id=NULL,last_chat_id=NULL,last_used=? WHERE user_id=?",
             (time.time(), int(user_id)),
         )
         con.commit()
-    finally:
-        con.close()
 
 def _db_clear(user_id: int):
-    _db_init()
-    con = sqlite3.connect(AI_DB_PATH)
-    try:
+    with db_session(AI_DB_PATH) as con:
         con.execute("DELETE FROM ai_memory WHERE user_id=?", (int(user_id),))
+        _TURNS.clear(con, user_id)
         con.commit()
-    finally:
-        con.close()
 
 def _db_cleanup(expire_seconds: int):
-    _db_init()
     cutoff = time.time() - float(expire_seconds)
-    con = sqlite3.connect(AI_DB_PATH)
-    try:
+    with db_session(AI_DB_PATH) as con:
         con.execute("DELETE FROM ai_memory WHERE last_used < ?", (cutoff,))
+        _TURNS.cleanup(con)
         con.commit()
-    finally:
-        con.close()
 
-def _db_has_last_message_id(message_id: int) -> bool:
-    _db_init()
-    con = sqlite3.connect(AI_DB_PATH)
-    try:
-        row = con.execute(
-            "SELECT 1 FROM ai_memory WHERE last_message_id=? LIMIT 1",
-            (int(message_id),),
-        ).fetchone()
-        return row is not None
-    finally:
-        con.close()
+def _db_index_rows() -> list[tuple]:
+    with db_session(AI_DB_PATH) as con:
+        return con.execute(
+            "SELECT user_id,last_chat_id,last_message_id FROM ai_memory WHERE last_message_id IS NOT NULL"
+        ).fetchall()
+
+async def _rebuild_index():
+    reply_index.rebuild("gemini", await run_db(_db_index_rows))
 
 async def init():
-    await asyncio.to_thread(_db_init)
+    await run_db(_db_init)
+    await _rebuild_index()
 
 async def get_history(user_id: int) -> list:
-    res = await asyncio.to_thread(_db_get, user_id)
+    res = await run_db(_db_get, user_id)
     if not res:
         return []
     history, _, _ = res
     return history
 
-async def set_history(user_id: int, history: list, last_message_id: int | None = None):
-    await asyncio.to_thread(_db_set, user_id, history, last_message_id)
+async def set_history(user_id: int, history: list, last_message_id: int | None = None, chat_id: int | None = None):
+    await run_db(_db_set, user_id, history, last_message_id, chat_id)
+    reply_index.remember("gemini", user_id, chat_id, last_message_id)
 
-async def append_turn(user_id: int, user_text: str, ai_text: str, last_message_id: int | None = None):
-    history = await get_history(user_id)
-    history.append({"user": user_text, "ai": ai_text})
-    await set_history(user_id, history, last_message_id)
+async def append_turn(user_id: int, user_text: str, ai_text: str, last_message_id: int | None = None, chat_id: int | None = None, fresh: bool = False):
+    await run_db(_db_append, user_id, [{"user": user_text, "ai": ai_text}], last_message_id, chat_id, fresh)
+    if last_message_id is not None:
+        reply_index.remember("gemini", user_id, chat_id, last_message_id)
 
-async def set_last_message_id(user_id: int, last_message_id: int | None):
-    await asyncio.to_thread(_db_set_last_message_id, user_id, last_message_id)
+async def set_last_message_id(user_id: int, last_message_id: int | None, chat_id: int | None = None):
+    await run_db(_db_set_last_message_id, user_id, last_message_id, chat_id)
+    reply_index.remember("gemini", user_id, chat_id, last_message_id)
 
 async def get_last_message_id(user_id: int) -> int | None:
-    res = await asyncio.to_thread(_db_get, user_id)
-    if not res:
+    row = await run_db(_db_get_meta, user_id)
+    if not row or row[1] is None:
         return None
-    _, _, last_message_id = res
-    return last_message_id
+    return int(row[1])
 
 async def clear_last_message_id(user_id: int):
-    await asyncio.to_thread(_db_clear_last_message_id, user_id)
+    await run_db(_db_clear_last_message_id, user_id)
+    reply_index.forget("gemini", user_id)
 
 async def clear(user_id: int):
-    await asyncio.to_thread(_db_clear, user_id)
+    await run_db(_db_clear, user_id)
+    reply_index.forget("gemini", user_id)
 
 async def cleanup():
-    await asyncio.to_thread(_db_cleanup, AI_MEMORY_EXPIRE)
-
-async def has_last_message_id(message_id: int) -> bool:
-    return await asyncio.to_thread(_db_has_last_message_id, message_id)
\ No newline at end of file
+    await run_db(_db_cleanup, AI_MEMORY_EXPIRE)
+    await _rebuild_index()
\ No newline at end of file
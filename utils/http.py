@@ -1,10 +1,17 @@
+import os
 import aiohttp
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+PROVIDER_HTTP_LIMIT = int(os.getenv("PROVIDER_HTTP_LIMIT", "100"))
+PROVIDER_HTTP_LIMIT_PER_HOST = int(os.getenv("PROVIDER_HTTP_LIMIT_PER_HOST", "16"))
+PROVIDER_HTTP_KEEPALIVE = float(os.getenv("PROVIDER_HTTP_KEEPALIVE", "60"))
+PROVIDER_DNS_TTL = int(os.getenv("PROVIDER_DNS_TTL", "300"))
+
 _HTTP_SESSION: aiohttp.ClientSession | None = None
+_PROVIDER_SESSION: aiohttp.ClientSession | None = None
 
 
 async def get_http_session():
@@ -16,8 +23,31 @@ async def get_http_session():
     return _HTTP_SESSION
 
 
+async def get_provider_session():
+    """
+    Session for API providers (see utils.providers): bounded connections per
+    host, long keep-alive and cached DNS so repeated calls reuse sockets.
+    """
+    global _PROVIDER_SESSION
+    if _PROVIDER_SESSION is None or _PROVIDER_SESSION.closed:
+        _PROVIDER_SESSION = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=60),
+            connector=aiohttp.TCPConnector(
+                limit=PROVIDER_HTTP_LIMIT,
+                limit_per_host=PROVIDER_HTTP_LIMIT_PER_HOST,
+                keepalive_timeout=PROVIDER_HTTP_KEEPALIVE,
+                ttl_dns_cache=PROVIDER_DNS_TTL,
+                use_dns_cache=True,
+            ),
+        )
+    return _PROVIDER_SESSION
+
+
 async def close_http_session():
-    global _HTTP_SESSION
+    global _HTTP_SESSION, _PROVIDER_SESSION
+    if _PROVIDER_SESSION and not _PROVIDER_SESSION.closed:
+        await _PROVIDER_SESSION.close()
+        _PROVIDER_SESSION = None
     if _HTTP_SESSION and not _HTTP_SESSION.closed:
         await _HTTP_SESSION.close()
         _HTTP_SESSION = None
@@ -3,7 +3,7 @@ import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 from utils.config import LOG_CHAT_ID
-from utils.commands import BOT_COMMANDS
+from utils.commands import BOT_COMMANDS, COMMANDS
 
 log = logging.getLogger(__name__)
 
@@ -67,8 +67,7 @@ async def log_commands(update: Update, context: ContextTypes.DEFAULT_TYPE):
     forward_message_id = None
 
     if is_command:
-        cmd = text[1:].split()[0].split("@")[0].lower()
-        if cmd not in BOT_COMMANDS:
+        if COMMANDS.command(text, "/$") not in BOT_COMMANDS:
             return
         title = "<b>Command Log</b>"
         content = f"<code>{html.escape(text)}</code>"
@@ -0,0 +1,363 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
+import aiohttp
+
+from utils.http import get_provider_session
+
+log = logging.getLogger(__name__)
+
+PROVIDER_RETRIES = max(0, int(os.getenv("PROVIDER_RETRIES", "2")))
+PROVIDER_BACKOFF = float(os.getenv("PROVIDER_BACKOFF", "0.5"))
+PROVIDER_BACKOFF_MAX = float(os.getenv("PROVIDER_BACKOFF_MAX", "4"))
+BREAKER_FAILURES = max(1, int(os.getenv("BREAKER_FAILURES", "5")))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+BREAKER_QUOTA_COOLDOWN = float(os.getenv("BREAKER_QUOTA_COOLDOWN", "300"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1.5"))
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+_QUOTA_HINTS = (
+    "quota",
+    "rate limit",
+    "rate_limit",
+    "resource_exhausted",
+    "too many requests",
+    "daily limit",
+)
+
+PROVIDERS: dict[str, "Provider"] = {}
+_OPTIONS: dict[str, dict] = {}
+
+
+class ProviderError(RuntimeError):
+    def __init__(self, provider: str, message: str, status: int | None = None, quota: bool = False):
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+        self.quota = quota
+
+
+class ProviderUnavailable(ProviderError):
+    """
+    Raised without touching the network while a breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures, or at once on a quota error.
+    While open every call fails fast; after the cooldown one probe request is
+    let through and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float, quota_cooldown: float):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.quota_cooldown = quota_cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.quota = False
+        self.reason = ""
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if not self.open_until:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half-open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "open" or self.probing:
+            return False
+        self.probing = True
+        return True
+
+    def success(self):
+        if self.open_until:
+            log.info("Circuit closed | provider=%s", self.name)
+        self.failures = 0
+        self.open_until = 0.0
+        self.quota = False
+        self.reason = ""
+        self.probing = False
+
+    def failure(self, reason: str, quota: bool = False, retry_after: float | None = None):
+        self.failures += 1
+        self.probing = False
+        if quota:
+            cooldown = retry_after if retry_after else self.quota_cooldown
+        elif self.failures >= self.threshold or self.open_until:
+            cooldown = max(self.cooldown, retry_after or 0)
+        else:
+            return
+        self.open_until = time.monotonic() + cooldown
+        self.quota = quota
+        self.reason = (reason or "").strip()[:200]
+        log.warning(
+            "Circuit open | provider=%s for=%.0fs quota=%s failures=%s reason=%s",
+            self.name, cooldown, quota, self.failures, self.reason,
+        )
+
+    def release(self):
+        self.probing = False
+
+
+def _default_quota(status: int | None, body: str) -> bool:
+    text = (body or "").lower()
+    return status == 429 or any(k in text for k in _QUOTA_HINTS)
+
+
+def _default_describe(status: int, body: str) -> str:
+    return (body or "").strip()[:500] or f"HTTP {status}"
+
+
+def _retry_after(resp) -> float | None:
+    try:
+        value = float(resp.headers.get("Retry-After") or 0)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class Provider:
+    """
+    One upstream API: shared keep-alive session, jittered retries before the
+    response body is read, latency samples for hedging and circuit breakers
+    keyed per credential.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        is_quota: Callable[[int | None, str], bool] | None = None,
+        describe: Callable[[int, str], str] | None = None,
+        retries: int = PROVIDER_RETRIES,
+        timeout: float = 60,
+    ):
+        self.name = name
+        self.is_quota = is_quota or _default_quota
+        self.describe = describe or _default_describe
+        self.retries = retries
+        self.timeout = timeout
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.latencies: deque[float] = deque(maxlen=200)
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def breaker(self, key: str | None = None) -> CircuitBreaker:
+        key = str(key or self.name)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            label = self.name if key == self.name else f"{self.name}:{key}"
+            breaker = self.breakers[key] = CircuitBreaker(
+                label, BREAKER_FAILURES, BREAKER_COOLDOWN, BREAKER_QUOTA_COOLDOWN
+            )
+        return breaker
+
+    def available(self, key: str | None = None) -> bool:
+        return self.breaker(key).state != "open"
+
+    def p95(self) -> float | None:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def hedge_delay(self) -> float | None:
+        p95 = self.p95()
+        return None if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+    async def _backoff(self, attempt: int, retry_after: float | None):
+        delay = min(PROVIDER_BACKOFF_MAX, PROVIDER_BACKOFF * (2 ** (attempt - 1)))
+        delay = retry_after if retry_after else delay * random.uniform(0.5, 1.5)
+        await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, key: str | None = None, timeout: float | None = None, **kwargs):
+        """
+        Yields a 2xx response. Connection failures and retryable statuses are
+        retried with jittered backoff; quota errors open the breaker and raise
+        ProviderError straight away. Timeouts are not retried.
+        """
+        breaker = self.breaker(key)
+        if not breaker.allow():
+            self.rejected += 1
+            raise ProviderUnavailable(
+                self.name,
+                f"{self.name} lagi tidak tersedia: {breaker.reason or 'circuit open'}",
+                quota=breaker.quota,
+            )
+        session = await get_provider_session()
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.calls += 1
+            started = time.monotonic()
+            try:
+                resp = await session.request(method, url, timeout=client_timeout, **kwargs)
+            except aiohttp.ClientConnectionError as e:
+                if attempt <= self.retries:
+                    await self._backoff(attempt, None)
+                    continue
+                self.errors += 1
+                breaker.failure(repr(e))
+                raise
+            except asyncio.TimeoutError:
+                self.errors += 1
+                breaker.failure("timeout")
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            if resp.status < 400:
+                self.latencies.append(time.monotonic() - started)
+                break
+            try:
+                body = await resp.text()
+            except Exception:
+                body = ""
+            finally:
+                resp.release()
+            quota = self.is_quota(resp.status, body)
+            retry_after = _retry_after(resp)
+            retryable = (
+                not quota
+                and resp.status in _RETRY_STATUS
+                and (retry_after is None or retry_after <= PROVIDER_BACKOFF_MAX)
+            )
+            if retryable and attempt <= self.retries:
+                await self._backoff(attempt, retry_after)
+                continue
+            self.errors += 1
+            message = self.describe(resp.status, body)
+            if quota or resp.status in _RETRY_STATUS:
+                breaker.failure(message, quota=quota, retry_after=retry_after)
+            else:
+                breaker.success()
+            raise ProviderError(self.name, message, status=resp.status, quota=quota)
+        try:
+            yield resp
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.errors += 1
+            breaker.failure(repr(e))
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        else:
+            breaker.success()
+        finally:
+            resp.release()
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "p95_ms": None if p95 is None else round(p95 * 1000),
+            "open": sorted(b.name for b in self.breakers.values() if b.state == "open"),
+        }
+
+
+def provider(name: str, **kwargs) -> Provider:
+    """
+    Returns the shared Provider for `name`, creating it on first use. Each
+    option is set by the first call that passes it; a later call passing a
+    different value is logged and ignored. /reload re-imports this module,
+    so breaker state starts fresh after a reload.
+    """
+    options = {k: v for k, v in kwargs.items() if v is not None}
+    current = PROVIDERS.get(name)
+    if current is None:
+        current = PROVIDERS[name] = Provider(name, **options)
+        _OPTIONS[name] = options
+        return current
+    configured = _OPTIONS.setdefault(name, {})
+    for attr, value in options.items():
+        if attr not in configured:
+            setattr(current, attr, value)
+            configured[attr] = value
+        elif configured[attr] is not value and configured[attr] != value:
+            log.warning("Provider option conflict ignored | provider=%s option=%s", name, attr)
+    return current
+
+
+def provider_stats() -> list[dict]:
+    return [p.stats() for p in PROVIDERS.values()]
+
+
+async def hedge(
+    primary: Callable[[Callable[[str], Awaitable]], Awaitable],
+    backup: Callable[[Callable[[str], Awaitable]], Awaitable],
+    delay: float | None,
+    on_text: Callable[[str], Awaitable] | None = None,
+    on_owner: Callable[[int], None] | None = None,
+):
+    """
+    Runs primary(push). If it fails, or has produced no text after `delay`
+    seconds, backup(push) is started as well. Whichever pushes text first
+    owns on_text and the other call is cancelled. Returns (index, result).
+    """
+    tasks: list[asyncio.Task] = []
+    owner = None
+
+    def claim(idx: int):
+        nonlocal owner
+        owner = idx
+        if on_owner:
+            on_owner(idx)
+        for other, task in enumerate(tasks):
+            if other != idx:
+                task.cancel()
+
+    def feed(idx: int):
+        async def push(text: str):
+            if owner is None:
+                claim(idx)
+            if owner == idx and on_text:
+                await on_text(text)
+        return push
+
+    tasks.append(asyncio.create_task(primary(feed(0))))
+    try:
+        while True:
+            pending = [t for t in tasks if not t.done()]
+            if pending:
+                timeout = delay if len(tasks) == 1 else None
+                await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if owner is not None:
+                if tasks[owner].done():
+                    return owner, tasks[owner].result()
+                continue
+            for idx, task in enumerate(tasks):
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    claim(idx)
+                    return idx, task.result()
+            if len(tasks) == 1:
+                if tasks[0].done():
+                    log.warning("Hedge primary failed, using backup | err=%r", tasks[0].exception())
+                else:
+                    log.info("Hedge primary slower than %.2fs, starting backup", delay)
+                tasks.append(asyncio.create_task(backup(feed(1))))
+                continue
+            if all(t.done() for t in tasks):
+                raise tasks[-1].exception()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,37 @@
+import logging
+
+log=logging.getLogger(__name__)
+_INDEX:dict[tuple[int|None,int],tuple[str,int]]={}
+_OWNED:dict[tuple[str,int],tuple[int|None,int]]={}
+
+def _key(chat_id:int|None,message_id:int)->tuple[int|None,int]:
+    return (int(chat_id) if chat_id is not None else None,int(message_id))
+
+def forget(engine:str,user_id:int):
+    key=_OWNED.pop((engine,int(user_id)),None)
+    if key is not None and _INDEX.get(key)==(engine,int(user_id)):
+        _INDEX.pop(key,None)
+
+def remember(engine:str,user_id:int,chat_id:int|None,message_id:int|None):
+    forget(engine,user_id)
+    if message_id is None:
+        return
+    key=_key(chat_id,message_id)
+    _INDEX[key]=(engine,int(user_id))
+    _OWNED[(engine,int(user_id))]=key
+
+def rebuild(engine:str,rows:list[tuple]):
+    for owner in [o for o in _OWNED if o[0]==engine]:
+        forget(*owner)
+    for user_id,chat_id,message_id in rows:
+        remember(engine,user_id,chat_id,message_id)
+    log.info("Reply index rebuilt | engine=%s entries=%s",engine,len(rows))
+
+def lookup(chat_id:int|None,message_id:int)->tuple[str,int]|None:
+    hit=_INDEX.get(_key(chat_id,message_id))
+    if hit is None and chat_id is not None:
+        hit=_INDEX.get((None,int(message_id)))
+    return hit
+
+def size()->int:
+    return len(_INDEX)
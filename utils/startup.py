@@ -2,7 +2,7 @@ import asyncio
 import logging
 
 from handlers.asupan import (
-    send_asupan_once,
+    start_asupan_prefetch,
     load_asupan_groups,
     load_autodel_groups,
 )
@@ -11,7 +11,12 @@ from utils import gemini_memory, groq_memory
 from handlers import welcome
 from handlers.nsfw import nsfw_db_init
 from handlers.backup import start_auto_backup
+from handlers.dl.router import resume_download_jobs
+from handlers.broadcast import resume_broadcasts
+from handlers.ship import ship_prune_loop
+from handlers.stats.sampler import stats_sampler_loop
 from database import premium
+from database.db import migrate_all, run_db
 from handlers import caca
 
 log=logging.getLogger(__name__)
@@ -37,11 +42,16 @@ async def _startup_asupan(app):
     if not LOG_CHAT_ID:
         log.warning("Startup asupan skipped: LOG_CHAT_ID kosong")
         return
-    await send_asupan_once(app.bot)
-    log.info("✓ Asupan startup sent")
+    start_asupan_prefetch(app)
+    log.info("✓ Asupan prefetch pool started")
 
 async def startup_tasks(app):
     log.info("✓ Running startup tasks...")
+    try:
+        migrated=await run_db(migrate_all)
+        log.info("✓ Database schemas migrated: %s databases",migrated)
+    except Exception:
+        log.exception("Database schema migration failed")
     try:
         nsfw_db_init()
         log.info("✓ NSFW DB initialized")
@@ -101,10 +111,22 @@ async def startup_tasks(app):
         log.info("✓ Groq memory DB initialized")
     except Exception:
         log.exception("Groq memory DB init failed")
+    try:
+        resumed=await resume_download_jobs(app)
+        log.info("✓ Download queue restored: %s jobs",resumed)
+    except Exception:
+        log.exception("Download queue restore failed")
+    try:
+        resumed=await resume_broadcasts(app)
+        log.info("✓ Broadcasts restored: %s jobs",resumed)
+    except Exception:
+        log.exception("Broadcast restore failed")
     try:
         start_auto_backup(app)
         log.info("✓ Auto backup scheduler initialized")
     except Exception:
         log.exception("Auto backup init failed")
     _create_background_task(app,_startup_asupan(app),"Startup asupan")
+    _create_background_task(app,ship_prune_loop(),"Ship prune")
+    _create_background_task(app,stats_sampler_loop(),"Stats sampler")
     log.info("✓ Startup background tasks scheduled")
\ No newline at end of file
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+from typing import Callable
+
+AI_HISTORY_TOKEN_BUDGET = int(os.getenv("AI_HISTORY_TOKEN_BUDGET", "3000"))
+AI_HISTORY_SUMMARY = os.getenv("AI_HISTORY_SUMMARY", "0").strip().lower() in ("1", "true", "yes", "on")
+AI_HISTORY_SUMMARY_TOKENS = int(os.getenv("AI_HISTORY_SUMMARY_TOKENS", "200"))
+_SUMMARY_SCAN_ROWS = 40
+_SUMMARY_LINE_CHARS = 120
+
+
+def estimate_tokens(text) -> int:
+    """
+    Cheap token estimate (~4 chars per token) used for history budgeting.
+    """
+    if not isinstance(text, str):
+        text = json.dumps(text, ensure_ascii=False)
+    return max(1, (len(text) + 3) // 4)
+
+
+class TurnStore:
+    """
+    Append-only conversation rows for one memory table.
+    Each message is a row (user_id, role, content); prompts read the newest
+    rows that fit a token budget instead of the whole history.
+    """
+
+    def __init__(self, table: str, meta_table: str, max_rows: int):
+        self.table = table
+        self.meta_table = meta_table
+        self.max_rows = max_rows
+
+    def schema(self, con):
+        con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_user ON {self.table}(user_id, id)")
+
+    def append(self, con, user_id: int, rows: list[tuple[str, object]], replace: bool = False):
+        if replace:
+            self.clear(con, user_id)
+        if rows:
+            now = time.time()
+            con.executemany(
+                f"INSERT INTO {self.table} (user_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (int(user_id), str(role), json.dumps(content, ensure_ascii=False), estimate_tokens(content), now)
+                    for role, content in rows
+                ],
+            )
+        if self.max_rows and self.max_rows > 0:
+            con.execute(
+                f"""
+                DELETE FROM {self.table} WHERE user_id=? AND id <= (
+                    SELECT id FROM {self.table} WHERE user_id=? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+                """,
+                (int(user_id), int(user_id), int(self.max_rows)),
+            )
+
+    def clear(self, con, user_id: int):
+        con.execute(f"DELETE FROM {self.table} WHERE user_id=?", (int(user_id),))
+
+    def cleanup(self, con):
+        con.execute(f"DELETE FROM {self.table} WHERE user_id NOT IN (SELECT user_id FROM {self.meta_table})")
+
+    def window(self, con, user_id: int, budget: int | None = None) -> tuple[list[tuple[str, object]], str | None]:
+        """
+        Returns the newest rows fitting the token budget, oldest first, plus an
+        optional extractive summary of the user turns that fell outside it.
+        """
+        budget = AI_HISTORY_TOKEN_BUDGET if budget is None else budget
+        cur = con.execute(
+            f"SELECT role, content, tokens FROM {self.table} WHERE user_id=? ORDER BY id DESC",
+            (int(user_id),),
+        )
+        picked = []
+        used = 0
+        older = None
+        for role, content, tokens in cur:
+            if budget > 0 and picked and used + int(tokens) > budget:
+                older = (role, content)
+                break
+            used += int(tokens)
+            picked.append((role, json.loads(content)))
+        summary = None
+        if older is not None and AI_HISTORY_SUMMARY:
+            summary = self._summarize([older] + cur.fetchmany(_SUMMARY_SCAN_ROWS))
+        cur.close()
+        picked.reverse()
+        while picked and picked[0][0] != "user":
+            picked.pop(0)
+        return picked, summary
+
+    def _summarize(self, rows: list[tuple]) -> str | None:
+        lines = []
+        used = 0
+        for row in rows:
+            role, content = row[0], json.loads(row[1])
+            if role != "user" or not isinstance(content, str):
+                continue
+            text = " ".join(content.split())[:_SUMMARY_LINE_CHARS]
+            if not text:
+                continue
+            cost = estimate_tokens(text)
+            if used + cost > AI_HISTORY_SUMMARY_TOKENS:
+                break
+            used += cost
+            lines.append(f"- {text}")
+        if not lines:
+            return None
+        lines.reverse()
+        return "Topik obrolan sebelumnya:\n" + "\n".join(lines)
+
+    def import_legacy(self, con, user_id: int, to_rows: Callable[[list], list[tuple[str, object]]]) -> bool:
+        """
+        Moves a legacy history_json blob from the meta table into rows.
+        Writers call this before touching the meta row so old history survives.
+        """
+        row = con.execute(f"SELECT history_json FROM {self.meta_table} WHERE user_id=?", (int(user_id),)).fetchone()
+        if not row or not row[0] or row[0] == "[]":
+            return False
+        try:
+            history = json.loads(row[0])
+        except Exception:
+            history = []
+        rows = to_rows(history if isinstance(history, list) else [])
+        if self.max_rows and self.max_rows > 0:
+            rows = rows[-self.max_rows:]
+        self.append(con, user_id, rows, replace=True)
+        con.execute(f"UPDATE {self.meta_table} SET history_json='[]' WHERE user_id=?", (int(user_id),))
+        return True
@@ -1,10 +1,13 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-from handlers.ship import add_user
+from handlers.ship import add_user, remove_user
 
 async def user_collector(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = update.effective_message
     chat = update.effective_chat
     if not msg or not chat:
         return
-    add_user(chat.id, msg.from_user)
\ No newline at end of file
+    add_user(chat.id, msg.from_user)
+    left = msg.left_chat_member
+    if left:
+        remove_user(chat.id, left.id)